@@ -0,0 +1,121 @@
+#
+# File: db_router.py
+# Purpose: Send annotated read-only views to the "replica" database while keeping
+#          read-your-writes consistency for a short window after a client's own write.
+#
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+REPLICA_ALIAS = 'replica'
+PRIMARY_ALIAS = 'default'
+PIN_COOKIE_NAME = 'db_pin_primary'
+
+# Per-request (and per-task under ASGI) routing state
+_use_replica = ContextVar('use_replica', default=False)
+_pinned_to_primary = ContextVar('pinned_to_primary', default=False)
+_wrote = ContextVar('wrote', default=False)
+
+
+def replica_configured():
+    return REPLICA_ALIAS in settings.DATABASES
+
+
+@contextmanager
+def use_replica():
+    """
+    Route ORM reads inside the block (or decorated view) to the replica.
+
+    Works both as ``with use_replica():`` and as a ``@use_replica()`` view decorator.
+    Writes always go to the primary, and reads fall back to it when no replica is
+    configured or the client is pinned after a recent write.
+    """
+    token = _use_replica.set(True)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+@contextmanager
+def pin_to_primary():
+    token = _pinned_to_primary.set(True)
+    try:
+        yield
+    finally:
+        _pinned_to_primary.reset(token)
+
+
+class ReplicaRouter:
+    """Primary/replica router driven by the ``use_replica`` context."""
+
+    def db_for_read(self, model, **hints):
+        if _use_replica.get() and not _pinned_to_primary.get() and replica_configured():
+            return REPLICA_ALIAS
+        return PRIMARY_ALIAS
+
+    def db_for_write(self, model, **hints):
+        # Anything read after a write in the same request must see that write.
+        _pinned_to_primary.set(True)
+        _wrote.set(True)
+        return PRIMARY_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data, so cross-alias relations are safe.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica receives schema changes through replication.
+        return db == PRIMARY_ALIAS
+
+
+class ReplicaPinMiddleware:
+    """
+    Keeps a client on the primary for ``REPLICA_PIN_SECONDS`` after it writes.
+
+    A short-lived cookie carries the pin between requests, so no session or
+    database write is needed to remember it.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        tokens = _pinned_to_primary.set(PIN_COOKIE_NAME in request.COOKIES), _wrote.set(False)
+        try:
+            response = self.get_response(request)
+            wrote = _wrote.get()
+        finally:
+            _pinned_to_primary.reset(tokens[0])
+            _wrote.reset(tokens[1])
+        return self._remember_write(request, response, wrote)
+
+    async def __acall__(self, request):
+        tokens = _pinned_to_primary.set(PIN_COOKIE_NAME in request.COOKIES), _wrote.set(False)
+        try:
+            response = await self.get_response(request)
+            wrote = _wrote.get()
+        finally:
+            _pinned_to_primary.reset(tokens[0])
+            _wrote.reset(tokens[1])
+        return self._remember_write(request, response, wrote)
+
+    def _remember_write(self, request, response, wrote):
+        # Every write restarts the window, including one made while already pinned
+        if replica_configured() and (wrote or request.method not in ('GET', 'HEAD', 'OPTIONS')):
+            response.set_cookie(
+                PIN_COOKIE_NAME, '1',
+                max_age=getattr(settings, 'REPLICA_PIN_SECONDS', 10),
+                httponly=True, samesite='Lax',
+            )
+        return response
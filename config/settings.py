@@ -36,10 +36,12 @@ INSTALLED_APPS = [
 # ⚙️ Middleware runs on every request
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'config.middleware.AsyncWhiteNoiseMiddleware',             # Serves compressed, fingerprinted static files
     'django.contrib.sessions.middleware.SessionMiddleware',    # Manages sessions via cookies
     'django.middleware.common.CommonMiddleware',               # Basic request/response handling
     'django.middleware.csrf.CsrfViewMiddleware',               # Cross-site request forgery protection
     'django.contrib.auth.middleware.AuthenticationMiddleware', # Handles logged-in users
+    'config.db_router.ReplicaPinMiddleware',                   # Keeps recent writers on the primary DB
     'django.contrib.messages.middleware.MessageMiddleware',    # Enables message framework
     'django.middleware.clickjacking.XFrameOptionsMiddleware',  # Prevents clickjacking
 ]
@@ -52,8 +54,14 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',  # Use Django's default engine
         'DIRS': [BASE_DIR / 'templates'],  # 🧭 Custom template folder (outside apps)
-        'APP_DIRS': True,  # 🔍 Also look inside each app's "templates" folder
         'OPTIONS': {
+            # ⚡ Compile each template once per process (filesystem first, then each app's "templates" folder)
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.request',  # Add request object to templates
                 'django.contrib.auth.context_processors.auth', # Add auth user info
@@ -63,8 +71,9 @@ TEMPLATES = [
     },
 ]
 
-# 🌀 WSGI (used for deployment)
+# 🌀 WSGI / ASGI entry points (production runs ASGI, see Procfile)
 WSGI_APPLICATION = 'config.wsgi.application'
+ASGI_APPLICATION = 'config.asgi.application'
 
 # 🗄️ Default SQLite DB (easy for dev)
 DATABASES = {
@@ -74,6 +83,46 @@ DATABASES = {
     }
 }
 
+# 📚 Optional read replica for analytics/list views (e.g. sqlite:///replica.sqlite3 or a Postgres URL)
+if os.environ.get('REPLICA_DATABASE_URL'):
+    import dj_database_url
+    DATABASES['replica'] = dj_database_url.parse(os.environ['REPLICA_DATABASE_URL'])
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+
+DATABASE_ROUTERS = ['config.db_router.ReplicaRouter']
+REPLICA_PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS', 10))  # Read-your-writes window after a POST
+
+# ⚡ Cache (Redis when REDIS_URL is set, otherwise per-process memory). Deployments need the
+# shared one: invalidations go through it (lead_management.E003 under `check --deploy`)
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# 🧩 Rendered template fragments ({% cache ... using="template_fragments" %}) stay in-process:
+# per-row lookups must be cheaper than re-rendering the row
+CACHES['template_fragments'] = {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    'LOCATION': 'template-fragments',
+    'TIMEOUT': 60 * 60 * 24,
+    'OPTIONS': {'MAX_ENTRIES': 20000},
+}
+
+# 🍪 Sessions are read from the cache and only fall back to the DB on a miss
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+# 👤 Resolve the logged-in user (and profile) from the cache on each request
+AUTHENTICATION_BACKENDS = ['lead_management.backends.CachedModelBackend']
+
 # 🔒 Password validators (security rules for creating passwords)
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -98,11 +147,35 @@ USE_TZ = True    # Use timezone-aware datetime
 
 # 🧾 Static files (CSS, JS, etc.)
 STATIC_URL = 'static/'
+STATIC_ROOT = BASE_DIR / 'staticfiles'       # collectstatic output served by WhiteNoise
+STATICFILES_DIRS = [BASE_DIR / 'static']     # Project assets, incl. static/vendor/ (see `manage.py vendor_static`)
+
+# 📦 Hashed file names + pre-built .gz/.br variants, served with far-future immutable caching
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage',
+    },
+}
 
 # 🖼️ Media files (e.g., uploaded profile pictures)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'  # Where media files will be stored locally
 
+# 🔒 Media is access-checked by lead_management.views.media.serve_media, then sent by the web server:
+#    'x-accel-redirect' (nginx: `location /protected-media/ { internal; alias <MEDIA_ROOT>/; }`),
+#    'x-sendfile' (Apache mod_xsendfile / lighttpd), or unset to stream from Python (development only)
+MEDIA_SENDFILE_BACKEND = os.environ.get('MEDIA_SENDFILE_BACKEND') or None
+MEDIA_ACCEL_REDIRECT_PREFIX = '/protected-media/'
+
+# 🗄️ Uploads are hashed as they stream in, for content-addressed screenshot/PDF storage
+FILE_UPLOAD_HANDLERS = [
+    'lead_management.upload_handlers.HashingMemoryFileUploadHandler',
+    'lead_management.upload_handlers.HashingTemporaryFileUploadHandler',
+]
+
 # 🔐 Authentication Redirects
 LOGIN_REDIRECT_URL = '/dashboard/'  # After successful login
 LOGOUT_REDIRECT_URL = '/login/'# After logging out
@@ -110,5 +183,47 @@ LOGIN_URL = '/login/'
 # Default auto primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
-# ✅ OpenAI API Key – TEMPORARILY hardcoded for testing
-# ⚠️ Switch back to .env after confirming it works
+# ✅ OpenAI API Key (loaded from .env / environment)
+OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY', '')
+
+# 🧠 LLM gateway (executive_biographer.llm_gateway); set BIOGRAPHER_LLM_BACKEND=fake to work offline
+BIOGRAPHER_LLM = {
+    'BACKEND': os.environ.get('BIOGRAPHER_LLM_BACKEND', 'openai'),
+    'TIMEOUT': 90,
+    'CONNECT_TIMEOUT': 5,
+    'MAX_RETRIES': 3,
+    'BREAKER_THRESHOLD': 5,
+    'BREAKER_RESET_SECONDS': 30,
+    'REQUESTS_PER_MINUTE': 120,
+}
+
+# 🤖 Biography generation runs in async views under ASGI; cap in-flight model calls per worker
+BIOGRAPHER_MAX_CONCURRENT_GENERATIONS = int(os.environ.get('BIOGRAPHER_MAX_CONCURRENT_GENERATIONS', 20))
+BIOGRAPHER_GENERATION_QUEUE_TIMEOUT = 10  # seconds to wait for a free slot before answering 429
+
+# 🗃️ Generation response cache (identical prompt + model settings reuse the stored answer)
+BIOGRAPHER_CACHE_MAX_AGE_DAYS = 30
+BIOGRAPHER_CACHE_MAX_ENTRIES = 5000
+
+# 🧵 Batch generation queue (`manage.py run_generation_worker`)
+BIOGRAPHER_JOB_CONCURRENCY = int(os.environ.get('BIOGRAPHER_JOB_CONCURRENCY', 5))
+BIOGRAPHER_JOB_TOKENS_PER_MINUTE = int(os.environ.get('BIOGRAPHER_JOB_TOKENS_PER_MINUTE', 40000))
+BIOGRAPHER_JOB_STALE_SECONDS = 15 * 60  # a job 'running' this long belonged to a dead worker
+BIOGRAPHER_PROFILE_EXTRACTION_STALE_SECONDS = 10 * 60  # likewise a profile PDF left 'processing'
+
+# 🧾 Token budget: pre-flight prompt sizing and daily quotas (executive_biographer.token_ledger)
+# The daily quotas are soft: concurrent generations can overshoot them by roughly
+# (BIOGRAPHER_MAX_CONCURRENT_GENERATIONS + BIOGRAPHER_JOB_CONCURRENCY) x (prompt + max_tokens).
+BIOGRAPHER_TOKEN_BUDGET = {
+    'CONTEXT_WINDOW': 8192,
+    'OVERSIZED_PROMPTS': 'trim',
+    'EDITOR_DAILY_QUOTA': int(os.environ['BIOGRAPHER_EDITOR_DAILY_TOKENS']) if os.environ.get('BIOGRAPHER_EDITOR_DAILY_TOKENS') else None,
+    'ORG_DAILY_QUOTA': int(os.environ['BIOGRAPHER_ORG_DAILY_TOKENS']) if os.environ.get('BIOGRAPHER_ORG_DAILY_TOKENS') else None,
+}
+
+# 🗜️ Draft history storage: a full snapshot every N versions, deltas in between
+BIOGRAPHER_DRAFT_SNAPSHOT_INTERVAL = 10
+BIOGRAPHER_DRAFT_TEXT_CACHE_SECONDS = 60 * 60 * 24
+
+# 🧩 Token budget for the assembled connection context (executive_biographer.context_builder)
+BIOGRAPHER_CONTEXT_TOKEN_BUDGET = 3000
@@ -0,0 +1,143 @@
+#
+# File: tests.py
+# Purpose: ReplicaRouter and ReplicaPinMiddleware against a second database alias.
+#          Without REPLICA_DATABASE_URL these tests add a "replica" alias of their own,
+#          mirroring the default test database, and remove it again when they finish.
+#
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+
+from .db_router import (
+    PIN_COOKIE_NAME, REPLICA_ALIAS, ReplicaPinMiddleware, _pinned_to_primary, pin_to_primary, use_replica,
+)
+
+User = get_user_model()
+
+
+class RouterTestCase(TestCase):
+    # Resolved in setUpClass, so it includes the replica alias added there
+    databases = '__all__'
+
+    @classmethod
+    def setUpClass(cls):
+        if REPLICA_ALIAS not in settings.DATABASES:
+            # Pointed at the default test database, as the runner does for TEST['MIRROR']
+            default = connections['default'].settings_dict
+            mirror = {**default, 'TEST': {**default['TEST'], 'MIRROR': 'default'}}
+            settings.DATABASES[REPLICA_ALIAS] = connections.settings[REPLICA_ALIAS] = mirror
+            cls.addClassCleanup(cls.remove_replica)
+        super().setUpClass()
+
+    @staticmethod
+    def remove_replica():
+        if any(conn.alias == REPLICA_ALIAS for conn in connections.all(initialized_only=True)):
+            connections[REPLICA_ALIAS].close()
+            del connections[REPLICA_ALIAS]
+        connections.settings.pop(REPLICA_ALIAS, None)
+        settings.DATABASES.pop(REPLICA_ALIAS, None)
+
+    def _should_check_constraints(self, connection):
+        # The mirror shares the primary's in-memory database, whose test transaction
+        # is still open; the primary's own check covers it.
+        return connection.alias != REPLICA_ALIAS and super()._should_check_constraints(connection)
+
+    def setUp(self):
+        replica = connections[REPLICA_ALIAS]
+        if replica.vendor == 'sqlite':
+            # Both aliases hold a test transaction on one shared-cache database; without
+            # this the mirror's read locks block the primary's writes.
+            with replica.cursor() as cursor:
+                cursor.execute('PRAGMA read_uncommitted = 1')
+        # Writes made outside a request (fixtures, other tests) pin this context
+        token = _pinned_to_primary.set(False)
+        self.addCleanup(_pinned_to_primary.reset, token)
+
+    def read_alias(self, read):
+        """The alias that ran the queries in ``read()``."""
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections[REPLICA_ALIAS]) as replica:
+            read()
+        used = {alias for alias, ctx in (('default', primary), (REPLICA_ALIAS, replica)) if len(ctx)}
+        self.assertEqual(len(used), 1, used)
+        return used.pop()
+
+
+class ReplicaRouterTests(RouterTestCase):
+
+    def test_reads_go_to_primary_by_default(self):
+        self.assertEqual(self.read_alias(lambda: list(User.objects.all())), 'default')
+
+    def test_use_replica_reads_go_to_replica(self):
+        with use_replica():
+            self.assertEqual(self.read_alias(lambda: list(User.objects.all())), REPLICA_ALIAS)
+
+    def test_use_replica_as_decorator(self):
+        @use_replica()
+        def view():
+            return list(User.objects.all())
+
+        self.assertEqual(self.read_alias(view), REPLICA_ALIAS)
+
+    def test_pinned_reads_go_to_primary(self):
+        with use_replica(), pin_to_primary():
+            self.assertEqual(self.read_alias(lambda: list(User.objects.all())), 'default')
+
+    def test_write_pins_later_reads_to_primary(self):
+        def view():
+            with use_replica():
+                User.objects.create(username='writer')
+                return self.read_alias(lambda: User.objects.get(username='writer'))
+
+        response = ReplicaPinMiddleware(lambda request: HttpResponse(view()))(RequestFactory().get('/'))
+        self.assertEqual(response.content, b'default')
+
+
+class ReplicaPinMiddlewareTests(RouterTestCase):
+
+    def run_request(self, view, method='get', pinned=False):
+        request = getattr(RequestFactory(), method)('/')
+        if pinned:
+            request.COOKIES[PIN_COOKIE_NAME] = '1'
+        return ReplicaPinMiddleware(lambda request: view() or HttpResponse())(request)
+
+    def test_write_sets_pin_cookie(self):
+        response = self.run_request(lambda: User.objects.create(username='a') and None)
+        self.assertIn(PIN_COOKIE_NAME, response.cookies)
+        self.assertEqual(response.cookies[PIN_COOKIE_NAME]['max-age'], settings.REPLICA_PIN_SECONDS)
+
+    def test_post_sets_pin_cookie_without_orm_write(self):
+        response = self.run_request(lambda: None, method='post')
+        self.assertIn(PIN_COOKIE_NAME, response.cookies)
+
+    def test_read_only_get_sets_no_cookie(self):
+        response = self.run_request(lambda: list(User.objects.all()) and None)
+        self.assertNotIn(PIN_COOKIE_NAME, response.cookies)
+
+    def test_pinned_read_only_get_does_not_extend_pin(self):
+        response = self.run_request(lambda: list(User.objects.all()) and None, pinned=True)
+        self.assertNotIn(PIN_COOKIE_NAME, response.cookies)
+
+    def test_write_while_pinned_extends_pin(self):
+        response = self.run_request(lambda: User.objects.create(username='b') and None, pinned=True)
+        self.assertIn(PIN_COOKIE_NAME, response.cookies)
+
+    def test_pin_cookie_routes_reads_to_primary(self):
+        seen = []
+
+        def view():
+            with use_replica():
+                seen.append(self.read_alias(lambda: list(User.objects.all())))
+
+        self.run_request(view, pinned=True)
+        self.run_request(view)
+        self.assertEqual(seen, ['default', REPLICA_ALIAS])
+
+    def test_state_does_not_leak_between_requests(self):
+        self.run_request(lambda: User.objects.create(username='c') and None)
+        with use_replica():
+            self.assertEqual(self.read_alias(lambda: list(User.objects.all())), REPLICA_ALIAS)
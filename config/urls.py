@@ -1,14 +1,13 @@
 from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
-from django.conf.urls.static import static
+
+from lead_management.views.media import serve_media
 
 urlpatterns = [
     path('admin/', admin.site.urls),                      # Admin panel
     path('', include('lead_management.urls')),            # Main lead management app
     path('biographer/', include('executive_biographer.urls')),  # ✅ Executive Biographer app
+    # 🔒 Uploaded media, access-checked per role in every environment
+    path(f"{settings.MEDIA_URL.strip('/')}/<path:path>", serve_media, name='serve_media'),
 ]
-
-# Serve media files in development
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ExecutiveBiographerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'executive_biographer'
+
+    def ready(self):
+        import executive_biographer.signals
@@ -0,0 +1,150 @@
+#
+# File: context_builder.py
+# Purpose: Gather everything known about a connection (profile fields, extracted resume,
+#          prior drafts, editorial comments) into prompt sections that fit a token budget.
+#          Results are memoized on a fingerprint of the connection's current state.
+#
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max
+
+from lead_management.models import Connection, ConnectionComment
+from .models import BiographyDraft, ProfileText
+from .token_ledger import estimate_tokens
+
+CONTEXT_CACHE_TIMEOUT = 60 * 60 * 24
+MIN_TRUNCATED_TOKENS = 40  # below this a truncated section isn't worth including
+TRUNCATION_MARK = " […]"
+
+# Lower ranks are filled first; within a rank, lower priorities first
+RANK_PROFILE = 0
+RANK_RESUME = 1
+RANK_DRAFT = 2
+RANK_COMMENTS = 3
+
+
+def _fingerprint(connection, profile_text, budget):
+    comments = ConnectionComment.objects.filter(connection=connection).aggregate(n=Count('id'), last=Max('timestamp'))
+    last_comment = comments['last'].timestamp() if comments['last'] else 0
+    # A context built before extraction finished has no resume; the key moves on when it does
+    extracted_at = profile_text.extracted_at.timestamp() if profile_text and profile_text.extracted_at else 0
+    extraction = f"{profile_text.status}:{extracted_at}" if profile_text else "-"
+    return (
+        f"biographer:context:{connection.pk}:{connection.updated_at.timestamp()}:"
+        f"{connection.last_draft_version}:{connection.published_draft_id}:{connection.profile_pdf_sha256}:"
+        f"{extraction}:{comments['n']}:{last_comment}:{budget}"
+    )
+
+
+def _profile_section(connection):
+    lines = [f"Name: {connection.full_name}"]
+    if connection.location:
+        lines.append(f"Location: {connection.location}")
+    lead = connection.outreach_lead
+    if lead and lead.linkedin_url:
+        lines.append(f"LinkedIn: {lead.linkedin_url}")
+    return "\n".join(lines)
+
+
+def _comment_lines(comments):
+    """Chronological comment lines, replies indented under their parent's thread."""
+    lines = []
+    for comment in comments:
+        name = comment.author.get_full_name() or comment.author.username
+        prefix = "  ↳ " if comment.parent_id else "- "
+        lines.append(f"{prefix}{name} ({comment.timestamp:%Y-%m-%d}): {comment.comment.strip()}")
+    return lines
+
+
+def _truncate(text, tokens):
+    # Proportional cut on characters; the estimate is good enough for budgeting
+    estimated = estimate_tokens(text)
+    if estimated <= tokens:
+        return text
+    return text[:max(0, len(text) * tokens // estimated - len(TRUNCATION_MARK))].rstrip() + TRUNCATION_MARK
+
+
+def _fit(candidates, budget):
+    """
+    Greedily fill ``budget`` with ``(rank, priority, title, content)`` candidates, best
+    first; the first that doesn't fit is truncated and the rest are dropped. Candidates
+    sharing a title are merged into one section, in the order they were given.
+    """
+    chosen, used, truncated = [], 0, False
+    for index, (rank, priority, title, content) in sorted(enumerate(candidates), key=lambda c: (c[1][0], c[1][1])):
+        merged = any(c[1] == title for c in chosen)
+        header = "" if merged else f"\nSection: {title}\n"
+        tokens = estimate_tokens(f"{header}{content}\n")
+        if used + tokens > budget:
+            truncated = True
+            room = budget - used - estimate_tokens(header)
+            if room < MIN_TRUNCATED_TOKENS:
+                break
+            content = _truncate(content, room)
+            tokens = estimate_tokens(f"{header}{content}\n")
+        chosen.append((index, title, content))
+        used += tokens
+        if truncated:
+            break
+
+    sections = {}
+    for index, title, content in sorted(chosen):
+        sections.setdefault(title, []).append(content)
+    return [{"title": title, "content": "\n".join(parts)} for title, parts in sections.items()], used, truncated
+
+
+def build_context(connection_id, budget=None):
+    """
+    Return ``{"sections": [...], "tokens": n, "truncated": bool}`` for a connection.
+
+    Costs up to three queries on a cache hit and five on a miss (plus rebuilding one draft's
+    text when it isn't cached), however many comments or drafts the connection has.
+    """
+    budget = budget or settings.BIOGRAPHER_CONTEXT_TOKEN_BUDGET
+    connection = Connection.objects.select_related('outreach_lead').get(pk=connection_id)
+    profile_text = None
+    if connection.profile_pdf_sha256:
+        profile_text = ProfileText.objects.filter(content_hash=connection.profile_pdf_sha256).first()
+    key = _fingerprint(connection, profile_text, budget)
+    context = cache.get(key)
+    if context is not None:
+        return context
+
+    candidates = [(RANK_PROFILE, 0, "Profile", _profile_section(connection))]
+
+    if profile_text is not None and profile_text.status == 'ready':
+        candidates += [
+            (RANK_RESUME, position, f"Resume – {section['title']}", section['content'])
+            for position, section in enumerate(profile_text.sections)
+        ]
+
+    # The published biography if there is one, otherwise the newest draft
+    draft = (
+        BiographyDraft.objects.filter(connection=connection)
+        .order_by('-is_published', '-version')
+        .only('id', 'connection_id', 'version', 'base_id', 'chain_length', 'prompt_data', 'text_data', 'is_published')
+        .first()
+    )
+    if draft is not None:
+        label = "Published biography" if draft.is_published else f"Previous draft (v{draft.version})"
+        candidates.append((RANK_DRAFT, 0, label, draft.generated_text))
+
+    comments = list(
+        ConnectionComment.objects.filter(connection=connection).select_related('author').order_by('timestamp')
+    )
+    # Newest comments are kept first when the thread has to be cut, but read in order
+    candidates += [
+        (RANK_COMMENTS, -position, "Editorial notes", line)
+        for position, line in enumerate(_comment_lines(comments))
+    ]
+
+    sections, tokens, truncated = _fit(candidates, budget)
+    context = {"sections": sections, "tokens": tokens, "truncated": truncated}
+    cache.set(key, context, CONTEXT_CACHE_TIMEOUT)
+    return context
+
+
+def context_prompt(sections):
+    """Sections rendered the way generate.html renders content blocks."""
+    return "".join(f"\nSection: {section['title']}\n{section['content']}\n" for section in sections)
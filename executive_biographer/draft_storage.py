@@ -0,0 +1,68 @@
+#
+# File: draft_storage.py
+# Purpose: Compact encoding for biography draft history. Each version's prompt and text
+#          are stored zlib-compressed, either whole (a snapshot) or as a word-level delta
+#          against the previous version of the same connection.
+#
+
+import json
+import re
+import zlib
+from difflib import SequenceMatcher
+
+FULL = b'F'
+DELTA = b'D'
+
+_TOKENS = re.compile(r'\S+|\s+')
+
+
+def tokenize(text):
+    return _TOKENS.findall(text)
+
+
+def encode_full(text):
+    return FULL + zlib.compress(text.encode('utf-8'), 9)
+
+
+def encode_delta(old_text, new_text):
+    """
+    Delta from ``old_text`` to ``new_text``: a JSON list whose [start, end] pairs copy
+    a run of the old text's tokens and whose strings are inserted verbatim.
+    """
+    old, new = tokenize(old_text), tokenize(new_text)
+    ops = []
+    for tag, i1, i2, j1, j2 in SequenceMatcher(None, old, new, autojunk=False).get_opcodes():
+        if tag == 'equal':
+            ops.append([i1, i2])
+        elif j2 > j1:
+            ops.append("".join(new[j1:j2]))
+    payload = json.dumps(ops, ensure_ascii=False, separators=(',', ':'))
+    return DELTA + zlib.compress(payload.encode('utf-8'), 9)
+
+
+def encode(old_text, new_text):
+    """The smaller of a delta against ``old_text`` (when given) and a full snapshot."""
+    full = encode_full(new_text)
+    if old_text is None:
+        return full
+    delta = encode_delta(old_text, new_text)
+    return delta if len(delta) < len(full) else full
+
+
+def is_full(blob):
+    return bytes(blob[:1]) == FULL
+
+
+def decode(blob, old_text=None):
+    """Rebuild text from ``blob``; deltas need the previous version's text."""
+    blob = bytes(blob)
+    body = zlib.decompress(blob[1:]).decode('utf-8')
+    if blob[:1] == FULL:
+        return body
+    if old_text is None:
+        raise ValueError("A delta-encoded draft needs the previous version's text to decode.")
+    old = tokenize(old_text)
+    return "".join(
+        "".join(old[op[0]:op[1]]) if isinstance(op, list) else op
+        for op in json.loads(body)
+    )
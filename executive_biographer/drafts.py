@@ -0,0 +1,41 @@
+#
+# File: drafts.py
+# Purpose: The one place biography drafts are created. Versions come from an atomic
+#          per-connection counter and publishing moves Connection.published_draft,
+#          so neither needs to count or rewrite a connection's draft history.
+#
+
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.db.models import F
+
+from lead_management.models import Connection
+from .models import BiographyDraft
+
+
+def _next_version(connection_id):
+    # The UPDATE row-locks the connection until commit, so concurrent saves queue up here
+    Connection.objects.filter(pk=connection_id).update(last_draft_version=F('last_draft_version') + 1)
+    return Connection.objects.filter(pk=connection_id).values_list('last_draft_version', flat=True).get()
+
+
+@transaction.atomic
+def create_draft(connection, publish=False, **fields):
+    """Create the connection's next draft version; with ``publish`` it replaces the published one."""
+    version = _next_version(connection.pk)
+
+    if publish:
+        # Only the current pointer can be published (partial unique index), so one UPDATE suffices
+        published_id = Connection.objects.filter(pk=connection.pk).values_list('published_draft', flat=True).get()
+        if published_id:
+            BiographyDraft.objects.filter(pk=published_id).update(is_published=False)
+
+    draft = BiographyDraft.objects.create(connection=connection, version=version, is_published=publish, **fields)
+    if publish:
+        Connection.objects.filter(pk=connection.pk).update(published_draft=draft)
+        connection.published_draft = draft
+    connection.last_draft_version = version
+    return draft
+
+
+acreate_draft = sync_to_async(create_draft)
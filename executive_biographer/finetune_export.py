@@ -0,0 +1,162 @@
+#
+# File: finetune_export.py
+# Purpose: Stream fine-tune-ready biographies as chat-format JSONL, a row at a time,
+#          with an id watermark for incremental exports, content-hash dedup and a
+#          deterministic train/validation split. Draft texts are rebuilt a chunk at a time,
+#          decoding each connection's delta chain once in version order.
+#
+
+import hashlib
+import json
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.db.models import Max, Q
+
+from .models import BiographyDraft, FineTuneExport, FineTuningSample
+
+CHUNK_SIZE = 500  # rows fetched per database round trip
+
+
+def assemble_input(input_data):
+    """Turn a FineTuningSample's stored inputs into the prompt shape generate.html sends."""
+    if isinstance(input_data, str):
+        return input_data
+    if isinstance(input_data, dict) and input_data.get('prompt'):
+        return input_data['prompt']
+    if isinstance(input_data, dict) and 'sections' in input_data:
+        prompt = f'Write a biography in the "{input_data.get("style", "thematic")}" style.\n\nHere is the content provided:\n'
+        for section in input_data['sections']:
+            prompt += f"\nSection: {section.get('title') or 'Untitled'}\n{section.get('content', '')}\n"
+        return prompt + "\nGO"
+    return json.dumps(input_data, ensure_ascii=False)
+
+
+def current_watermark():
+    """The highest ids an export started now may include."""
+    return {
+        'draft': BiographyDraft.objects.filter(is_finetune_ready=True).aggregate(m=Max('id'))['m'] or 0,
+        'sample': FineTuningSample.objects.aggregate(m=Max('id'))['m'] or 0,
+    }
+
+
+def format_watermark(watermark):
+    return f"draft={watermark['draft']};sample={watermark['sample']}"
+
+
+def parse_watermark(value):
+    """Inverse of format_watermark; an empty value means "from the beginning"."""
+    watermark = {'draft': 0, 'sample': 0}
+    for part in filter(None, value.split(';')):
+        name, _, number = part.partition('=')
+        if name not in watermark:
+            raise ValueError(f"Unknown watermark part: {name}")
+        watermark[name] = int(number)
+    return watermark
+
+
+def last_watermark():
+    last = FineTuneExport.objects.order_by('-id').first()
+    return {'draft': last.last_draft_id, 'sample': last.last_sample_id} if last else {'draft': 0, 'sample': 0}
+
+
+def _chain_texts(chunk):
+    """
+    ``{draft id: (prompt, text)}`` for the drafts in ``chunk`` and their ancestors, from one
+    query over each connection's versions back to the snapshots the chunk needs.
+    """
+    ranges = {}
+    for draft in chunk:
+        low, high = ranges.get(draft.connection_id, (draft.version, draft.version))
+        ranges[draft.connection_id] = (min(low, draft.version - draft.chain_length), max(high, draft.version))
+    versions = Q()
+    for connection_id, (low, high) in ranges.items():
+        versions |= Q(connection_id=connection_id, version__gte=low, version__lte=high)
+
+    texts = {}
+    nodes = (
+        BiographyDraft.objects.filter(versions)
+        .order_by('connection_id', 'version')
+        .only('id', 'connection_id', 'version', 'base_id', 'chain_length', 'prompt_data', 'text_data')
+    )
+    for node in nodes:
+        if node.base_id is None:
+            texts[node.pk] = node.decode_texts(("", ""))
+        elif node.base_id in texts:
+            texts[node.pk] = node.decode_texts(texts[node.base_id])
+        else:
+            # The base sits below the version range (versions were skipped); rebuild it alone
+            texts[node.pk] = node.read_texts(use_cache=False)
+    return texts
+
+
+def _iter_conversations(since, until):
+    from .views import EXECUTIVE_BIOGRAPHER_PROMPT
+
+    drafts = (
+        BiographyDraft.objects.filter(is_finetune_ready=True, id__gt=since['draft'], id__lte=until['draft'])
+        .order_by('connection_id', 'version')
+        .only('id', 'connection_id', 'version', 'chain_length')
+    )
+    iterator = drafts.iterator(chunk_size=CHUNK_SIZE)
+    while chunk := list(islice(iterator, CHUNK_SIZE)):
+        texts = _chain_texts(chunk)
+        for draft in chunk:
+            prompt, text = texts[draft.pk]
+            yield EXECUTIVE_BIOGRAPHER_PROMPT, prompt, text
+
+    samples = (
+        FineTuningSample.objects.filter(id__gt=since['sample'], id__lte=until['sample'])
+        .order_by('id')
+        .only('id', 'input_data_json', 'final_output')
+    )
+    for sample in samples.iterator(chunk_size=CHUNK_SIZE):
+        yield EXECUTIVE_BIOGRAPHER_PROMPT, assemble_input(sample.input_data_json), sample.final_output
+
+
+def iter_jsonl(since, until, validation_percent=0, dedupe=True):
+    """
+    Yield ``(split, line)`` for each exportable sample with ``since < id <= until``.
+
+    Only the digests of emitted samples are held for dedup, never the samples. Dedup
+    covers this export alone: incremental exports rely on the watermark not to repeat
+    rows, so a new row identical to one exported earlier is written again.
+    """
+    seen = set()
+    for system_prompt, prompt, output in _iter_conversations(since, until):
+        if not output.strip():
+            continue
+        line = json.dumps({"messages": [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": prompt},
+            {"role": "assistant", "content": output},
+        ]}, ensure_ascii=False) + "\n"
+
+        digest = hashlib.sha256(line.encode('utf-8')).digest()
+        if dedupe:
+            if digest in seen:
+                continue
+            seen.add(digest)
+        # Splitting on the content hash keeps a sample in the same split across exports
+        split = 'validation' if int.from_bytes(digest[:4], 'big') % 100 < validation_percent else 'train'
+        yield split, line
+
+
+def record_export(user, until, sample_count):
+    return FineTuneExport.objects.create(
+        exported_by=user,
+        last_draft_id=until['draft'],
+        last_sample_id=until['sample'],
+        sample_count=sample_count,
+    )
+
+
+async def aiter_in_batches(iterator, batch_size=CHUNK_SIZE):
+    """
+    Drive a blocking iterator from async code a batch at a time, so an ASGI streaming
+    response neither blocks the event loop nor collects the whole export in memory.
+    """
+    iterator = iter(iterator)
+    next_batch = sync_to_async(lambda: list(islice(iterator, batch_size)))
+    while batch := await next_batch():
+        yield "".join(batch)
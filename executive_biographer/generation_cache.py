@@ -0,0 +1,57 @@
+#
+# File: generation_cache.py
+# Purpose: Reuse model responses for byte-identical generation requests instead of
+#          paying full latency and tokens again.
+#
+
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from .models import GenerationCacheEntry
+
+
+def cache_key(system_prompt, prompt, model, temperature, max_tokens):
+    payload = json.dumps([system_prompt, prompt, model, temperature, max_tokens], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+async def aget_cached(key):
+    """Return a fresh entry for ``key`` (recording the hit), or None."""
+    oldest_allowed = timezone.now() - timedelta(days=settings.BIOGRAPHER_CACHE_MAX_AGE_DAYS)
+    entry = await GenerationCacheEntry.objects.filter(key=key, created_at__gte=oldest_allowed).afirst()
+    if entry is not None:
+        await GenerationCacheEntry.objects.filter(pk=entry.pk).aupdate(
+            hit_count=F('hit_count') + 1, last_used_at=timezone.now()
+        )
+    return entry
+
+
+async def astore(key, model, generated_text, usage):
+    await GenerationCacheEntry.objects.aupdate_or_create(key=key, defaults={
+        'model': model,
+        'generated_text': generated_text,
+        'input_tokens': usage.get('prompt_tokens', 0),
+        'output_tokens': usage.get('completion_tokens', 0),
+        'total_tokens': usage.get('total_tokens', 0),
+        'created_at': timezone.now(),
+        'last_used_at': timezone.now(),
+    })
+    await aprune()
+
+
+async def aprune():
+    """Drop entries past the max age, then the least recently used beyond the size cap."""
+    oldest_allowed = timezone.now() - timedelta(days=settings.BIOGRAPHER_CACHE_MAX_AGE_DAYS)
+    await GenerationCacheEntry.objects.filter(created_at__lt=oldest_allowed).adelete()
+
+    max_entries = settings.BIOGRAPHER_CACHE_MAX_ENTRIES
+    cutoff = await GenerationCacheEntry.objects.order_by('-last_used_at').values_list(
+        'last_used_at', flat=True
+    )[max_entries:max_entries + 1].afirst()
+    if cutoff is not None:
+        await GenerationCacheEntry.objects.filter(last_used_at__lte=cutoff).adelete()
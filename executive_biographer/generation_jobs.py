@@ -0,0 +1,177 @@
+#
+# File: generation_jobs.py
+# Purpose: Queue biography generations in bulk and drain them off the request path
+#          with bounded concurrency, a tokens-per-minute budget and retries.
+#
+
+import asyncio
+import random
+from datetime import datetime, time, timedelta
+
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.utils import timezone
+
+from lead_management.models import Connection
+from . import llm_gateway
+from .context_builder import build_context, context_prompt
+from .drafts import acreate_draft
+from .models import GenerationJob
+from .token_ledger import QuotaExceeded, acheck_quota, arecord, fit_prompt
+
+
+def default_prompt(connection):
+    """First-draft prompt in the same shape generate.html builds, from the budgeted connection context."""
+    context = build_context(connection.pk)
+    prompt = 'Write a biography in the "thematic" style.\n\nHere is the content provided:\n'
+    return prompt + context_prompt(context["sections"]) + "\nGO"
+
+
+def enqueue_for_editor(editor, requested_by, only_missing=True):
+    """
+    Queue one generation per connection assigned to ``editor``; returns the number queued.
+    Prompts are built by the worker, so this stays a couple of queries however big the book.
+    """
+    connections = Connection.objects.filter(assigned_editor=editor)
+    connections = connections.exclude(generation_jobs__status__in=['queued', 'running'])
+    if only_missing:
+        connections = connections.exclude(biography_drafts__isnull=False)
+
+    ids = list(connections.distinct().values_list('pk', flat=True))
+    started = timezone.now()
+    # one_active_job_per_connection drops the rows a concurrent request queued first
+    GenerationJob.objects.bulk_create(
+        [GenerationJob(connection_id=pk, requested_by=requested_by, editor=editor) for pk in ids],
+        ignore_conflicts=True,
+    )
+    return GenerationJob.objects.filter(
+        connection_id__in=ids, requested_by=requested_by, status='queued', created_at__gte=started
+    ).count()
+
+
+def claim_jobs(limit):
+    """Atomically move up to ``limit`` due jobs from queued to running and return them."""
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            GenerationJob.objects.select_for_update(skip_locked=True)
+            .filter(status='queued', run_after__lte=now)
+            .order_by('run_after', 'id')
+            .values_list('id', flat=True)[:limit]
+        )
+        # The status guard keeps a second worker (or a backend without SKIP LOCKED) from double-claiming
+        GenerationJob.objects.filter(id__in=ids, status='queued').update(status='running', started_at=now)
+    return list(
+        GenerationJob.objects.filter(id__in=ids, status='running', started_at=now)
+        .select_related('connection', 'editor')
+    )
+
+
+def requeue_stale(older_than, exclude_ids=()):
+    """
+    Put jobs left 'running' by a worker that died back on the queue. A job that already
+    wrote its draft is finished instead, so it is neither billed nor drafted twice.
+    """
+    now = timezone.now()
+    stale = GenerationJob.objects.filter(status='running', started_at__lt=now - timedelta(seconds=older_than))
+    stale = stale.exclude(id__in=exclude_ids)
+    stale.filter(draft__isnull=False).update(status='succeeded', finished_at=now)
+    return stale.filter(draft__isnull=True).update(status='queued')
+
+
+class GenerationWorker:
+    def __init__(self, concurrency, tokens_per_minute, stdout=None):
+        self.slots = asyncio.Semaphore(concurrency)
+        # Reserve the worst case (prompt estimate + max_tokens) before each call
+        self.budget = llm_gateway.TokenBucket(tokens_per_minute / 60, capacity=tokens_per_minute)
+        self.stdout = stdout
+
+    def _log(self, message):
+        if self.stdout:
+            self.stdout.write(message)
+
+    async def run_job(self, job):
+        from .views import EXECUTIVE_BIOGRAPHER_PROMPT, GENERATION_PARAMS
+
+        async with self.slots:
+            attempts = job.attempts + 1
+            try:
+                if not job.prompt:
+                    job.prompt = await sync_to_async(default_prompt)(job.connection)
+                    await GenerationJob.objects.filter(pk=job.pk).aupdate(prompt=job.prompt)
+                prompt, estimate, _ = fit_prompt(
+                    EXECUTIVE_BIOGRAPHER_PROMPT, job.prompt, GENERATION_PARAMS['model'], GENERATION_PARAMS['max_tokens']
+                )
+                await acheck_quota(job.editor, estimate + GENERATION_PARAMS['max_tokens'])
+            except QuotaExceeded as e:
+                await self._postpone_until_tomorrow(job, str(e))
+                return
+            except Exception as e:
+                await self._record_failure(job, attempts, str(e), transient=False)
+                return
+
+            await self.budget.aacquire(estimate + GENERATION_PARAMS['max_tokens'])
+            try:
+                text, usage = await llm_gateway.achat(EXECUTIVE_BIOGRAPHER_PROMPT, prompt, **GENERATION_PARAMS)
+            except llm_gateway.LLMError as e:
+                await self._record_failure(job, attempts, str(e), transient=True)
+                return
+            except Exception as e:
+                await self._record_failure(job, attempts, str(e), transient=False)
+                return
+
+            # The model call is paid for: from here on the job ends succeeded or failed, never retried
+            try:
+                draft = await acreate_draft(
+                    job.connection,
+                    author=job.editor,
+                    title="Batch Draft",
+                    prompt=prompt,
+                    generated_text=text,
+                    input_tokens=usage.get("prompt_tokens", 0),
+                    output_tokens=usage.get("completion_tokens", 0),
+                    total_tokens=usage.get("total_tokens", 0)
+                )
+            except Exception as e:
+                await self._record_failure(job, attempts, f"saving the draft: {e}", transient=False)
+                return
+            # Recorded first, so a job requeued as stale from here on is finished rather than re-run
+            await self._finish(job, draft=draft)
+            error = ''
+            try:
+                await arecord(job.editor, job.connection, draft, 'batch', GENERATION_PARAMS['model'], usage)
+            except Exception as e:
+                error = f"recording token usage: {e}"
+            await self._finish(job, status='succeeded', attempts=attempts, finished_at=timezone.now(), last_error=error)
+            self._log(f"✅ job {job.pk}: draft v{draft.version} for {job.connection.full_name}")
+
+    async def _finish(self, job, **fields):
+        # One retry, then give up: requeue_stale settles a job whose draft is recorded
+        for attempt in range(2):
+            try:
+                await GenerationJob.objects.filter(pk=job.pk).aupdate(**fields)
+                return
+            except Exception as e:
+                self._log(f"⚠ job {job.pk}: could not update ({e})")
+                await asyncio.sleep(1)
+
+    async def _postpone_until_tomorrow(self, job, reason):
+        # Quotas reset at local midnight; waiting does not count as an attempt
+        tomorrow = timezone.localdate() + timedelta(days=1)
+        run_after = timezone.make_aware(datetime.combine(tomorrow, time.min))
+        await GenerationJob.objects.filter(pk=job.pk).aupdate(status='queued', run_after=run_after, last_error=reason)
+        self._log(f"⏸ job {job.pk}: {reason}")
+
+    async def _record_failure(self, job, attempts, error, transient):
+        if transient and attempts < job.max_attempts:
+            delay = random.uniform(0, 30 * 2 ** attempts)
+            await GenerationJob.objects.filter(pk=job.pk).aupdate(
+                status='queued', attempts=attempts, last_error=error,
+                run_after=timezone.now() + timedelta(seconds=delay),
+            )
+            self._log(f"↻ job {job.pk}: attempt {attempts} failed, retrying in {delay:.0f}s ({error})")
+        else:
+            await GenerationJob.objects.filter(pk=job.pk).aupdate(
+                status='failed', attempts=attempts, last_error=error, finished_at=timezone.now()
+            )
+            self._log(f"❌ job {job.pk}: failed after {attempts} attempt(s) ({error})")
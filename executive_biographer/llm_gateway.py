@@ -0,0 +1,313 @@
+#
+# File: llm_gateway.py
+# Purpose: The single path for every model call. It holds process-wide pooled clients
+#          and applies timeouts, jittered retries, a circuit breaker and a request rate
+#          limit. A deterministic fake backend allows offline load and unit testing.
+#
+
+import asyncio
+import hashlib
+import random
+import threading
+import time
+
+import openai
+from django.conf import settings
+
+DEFAULTS = {
+    'BACKEND': 'openai',          # 'openai' or 'fake'
+    'TIMEOUT': 60.0,              # seconds for a whole request
+    'CONNECT_TIMEOUT': 5.0,
+    'MAX_RETRIES': 3,             # retries after the first attempt, on 429 / 5xx / network errors
+    'BACKOFF_BASE': 0.5,          # full-jitter exponential backoff: uniform(0, min(MAX, BASE * 2**n))
+    'BACKOFF_MAX': 8.0,
+    'BREAKER_THRESHOLD': 5,       # consecutive failures that open the circuit
+    'BREAKER_RESET_SECONDS': 30,  # how long the circuit stays open before one trial call
+    'REQUESTS_PER_MINUTE': 120,   # token bucket shared by all calls in this process
+    'FAKE_LATENCY': 1.0,          # fake backend: seconds before the first token
+    'FAKE_TOKENS_PER_SECOND': 80,
+    'FAKE_WORDS': 250,
+}
+
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.InternalServerError,
+    openai.APIConnectionError,  # includes APITimeoutError
+)
+
+
+class LLMError(Exception):
+    pass
+
+
+class LLMUnavailable(LLMError):
+    """Raised without calling the backend while the circuit breaker is open."""
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'BIOGRAPHER_LLM', {})}
+
+
+def _usage_dict(usage):
+    return {
+        "prompt_tokens": usage.prompt_tokens if usage else 0,
+        "completion_tokens": usage.completion_tokens if usage else 0,
+        "total_tokens": usage.total_tokens if usage else 0,
+    }
+
+
+def _messages(system_prompt, prompt):
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": prompt},
+    ]
+
+
+# -------------------- Resilience primitives --------------------
+
+class TokenBucket:
+    """Token bucket refilled continuously at ``rate`` tokens/second, up to ``capacity``."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _reserve(self, cost):
+        # Take the tokens now (possibly going negative) and return how long to wait for them
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= cost
+            return max(0.0, -self.tokens / self.rate)
+
+    async def aacquire(self, cost=1):
+        await asyncio.sleep(self._reserve(cost))
+
+
+class CircuitBreaker:
+    def __init__(self, threshold, reset_seconds):
+        self.threshold = threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self.lock = threading.Lock()
+
+    def before_call(self):
+        with self.lock:
+            if self.opened_at is None:
+                return
+            if time.monotonic() - self.opened_at < self.reset_seconds:
+                raise LLMUnavailable("The model provider is failing; generation is paused for a moment.")
+            # Half-open: let this call through as the trial; a failure re-opens the circuit
+            self.opened_at = time.monotonic()
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+
+
+def _backoff(config, attempt, error):
+    retry_after = None
+    response = getattr(error, 'response', None)
+    if response is not None:
+        retry_after = response.headers.get('retry-after')
+    if retry_after:
+        try:
+            return min(float(retry_after), config['BACKOFF_MAX'])
+        except ValueError:
+            pass
+    return random.uniform(0, min(config['BACKOFF_MAX'], config['BACKOFF_BASE'] * 2 ** attempt))
+
+
+# -------------------- Backends --------------------
+
+class OpenAIBackend:
+    def __init__(self, config):
+        timeout = openai.Timeout(config['TIMEOUT'], connect=config['CONNECT_TIMEOUT'])
+        # Built-in retries are off: the gateway owns retry policy. The client keeps one HTTP pool.
+        self.async_client = openai.AsyncOpenAI(api_key=settings.OPENAI_API_KEY, timeout=timeout, max_retries=0)
+
+    async def acomplete(self, system_prompt, prompt, model, temperature, max_tokens):
+        response = await self.async_client.chat.completions.create(
+            model=model, messages=_messages(system_prompt, prompt),
+            temperature=temperature, max_tokens=max_tokens,
+        )
+        return response.choices[0].message.content, _usage_dict(response.usage)
+
+    async def aopen_stream(self, system_prompt, prompt, model, temperature, max_tokens):
+        return await self.async_client.chat.completions.create(
+            model=model, messages=_messages(system_prompt, prompt),
+            temperature=temperature, max_tokens=max_tokens,
+            stream=True, stream_options={"include_usage": True},
+        )
+
+    async def aiter_stream(self, stream):
+        usage = None
+        try:
+            async for chunk in stream:
+                if chunk.usage:
+                    usage = chunk.usage
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield "token", chunk.choices[0].delta.content
+        finally:
+            await stream.close()
+        yield "usage", _usage_dict(usage)
+
+
+class FakeBackend:
+    """
+    Offline stand-in for the model: the same prompt always yields the same text and
+    usage, after FAKE_LATENCY seconds and at FAKE_TOKENS_PER_SECOND.
+    """
+
+    VOCABULARY = (
+        "leadership vision growth strategy innovation team culture mentor journey impact "
+        "industry board resilient founder transformation global market customer purpose"
+    ).split()
+
+    def __init__(self, config):
+        self.config = config
+
+    def _words(self, system_prompt, prompt, max_tokens):
+        seed = hashlib.sha256(f"{system_prompt}\x00{prompt}".encode('utf-8')).hexdigest()
+        rng = random.Random(seed)
+        count = min(self.config['FAKE_WORDS'], max_tokens)
+        return [rng.choice(self.VOCABULARY) for _ in range(count)]
+
+    def _usage(self, system_prompt, prompt, words):
+        prompt_tokens = (len(system_prompt) + len(prompt)) // 4
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": len(words),
+            "total_tokens": prompt_tokens + len(words),
+        }
+
+    def _duration(self, words):
+        return self.config['FAKE_LATENCY'] + len(words) / self.config['FAKE_TOKENS_PER_SECOND']
+
+    async def acomplete(self, system_prompt, prompt, model, temperature, max_tokens):
+        words = self._words(system_prompt, prompt, max_tokens)
+        await asyncio.sleep(self._duration(words))
+        return " ".join(words), self._usage(system_prompt, prompt, words)
+
+    async def aopen_stream(self, system_prompt, prompt, model, temperature, max_tokens):
+        await asyncio.sleep(self.config['FAKE_LATENCY'])
+        return system_prompt, prompt, self._words(system_prompt, prompt, max_tokens)
+
+    async def aiter_stream(self, stream):
+        system_prompt, prompt, words = stream
+        delay = 1 / self.config['FAKE_TOKENS_PER_SECOND']
+        for index, word in enumerate(words):
+            await asyncio.sleep(delay)
+            yield "token", word if index == 0 else " " + word
+        yield "usage", self._usage(system_prompt, prompt, words)
+
+
+BACKENDS = {'openai': OpenAIBackend, 'fake': FakeBackend}
+
+
+# -------------------- Gateway --------------------
+
+class LLMGateway:
+    def __init__(self, config):
+        self.config = config
+        self.backend = BACKENDS[config['BACKEND']](config)
+        self.breaker = CircuitBreaker(config['BREAKER_THRESHOLD'], config['BREAKER_RESET_SECONDS'])
+        rate = config['REQUESTS_PER_MINUTE'] / 60
+        self.limiter = TokenBucket(rate, capacity=max(1, config['REQUESTS_PER_MINUTE'] // 6))
+
+    async def achat(self, system_prompt, prompt, model="gpt-4", temperature=0.8, max_tokens=2048):
+        """Non-blocking completion; returns (text, usage dict)."""
+        for attempt in range(self.config['MAX_RETRIES'] + 1):
+            self.breaker.before_call()
+            await self.limiter.aacquire()
+            try:
+                result = await self.backend.acomplete(system_prompt, prompt, model, temperature, max_tokens)
+            except RETRYABLE_ERRORS as e:
+                self.breaker.record_failure()
+                if attempt == self.config['MAX_RETRIES']:
+                    raise LLMError(str(e)) from e
+                await asyncio.sleep(_backoff(self.config, attempt, e))
+            except Exception:
+                # Not worth retrying, but it still settles a half-open trial
+                self.breaker.record_failure()
+                raise
+            else:
+                self.breaker.record_success()
+                return result
+
+    async def astream(self, system_prompt, prompt, model="gpt-4", temperature=0.8, max_tokens=2048):
+        """
+        Stream one completion. Yields ("token", text) per delta and a final ("usage", dict).
+
+        Only opening the stream is retried; once tokens have been delivered a failure is
+        surfaced to the caller. Closing this generator closes the upstream stream.
+        """
+        for attempt in range(self.config['MAX_RETRIES'] + 1):
+            self.breaker.before_call()
+            await self.limiter.aacquire()
+            try:
+                stream = await self.backend.aopen_stream(system_prompt, prompt, model, temperature, max_tokens)
+            except RETRYABLE_ERRORS as e:
+                self.breaker.record_failure()
+                if attempt == self.config['MAX_RETRIES']:
+                    raise LLMError(str(e)) from e
+                await asyncio.sleep(_backoff(self.config, attempt, e))
+            except Exception:
+                self.breaker.record_failure()
+                raise
+            else:
+                break
+
+        chunks = self.backend.aiter_stream(stream)
+        try:
+            async for item in chunks:
+                yield item
+        except Exception as e:
+            self.breaker.record_failure()
+            if isinstance(e, RETRYABLE_ERRORS):
+                raise LLMError(str(e)) from e
+            raise
+        finally:
+            await chunks.aclose()
+        self.breaker.record_success()
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway():
+    """The process-wide gateway (and with it, the pooled HTTP clients)."""
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                _gateway = LLMGateway(get_config())
+    return _gateway
+
+
+def reset_gateway():
+    """Drop the process-wide gateway so the next call re-reads settings.BIOGRAPHER_LLM."""
+    global _gateway
+    _gateway = None
+
+
+async def achat(system_prompt, prompt, **params):
+    return await get_gateway().achat(system_prompt, prompt, **params)
+
+
+def astream(system_prompt, prompt, **params):
+    return get_gateway().astream(system_prompt, prompt, **params)
+
@@ -0,0 +1,46 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from executive_biographer.finetune_export import current_watermark, format_watermark, iter_jsonl, last_watermark, record_export
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream fine-tune-ready biographies to chat-format JSONL. With --since-last only samples "
+        "added after the previous export are written."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help="Training JSONL path, or - for stdout.")
+        parser.add_argument('--validation-output', help="Write a validation split to this path.")
+        parser.add_argument('--validation-percent', type=int, default=10)
+        parser.add_argument('--since-last', action='store_true', help="Continue from the last export's watermark.")
+        parser.add_argument('--no-dedupe', action='store_true', help="Keep samples with identical content.")
+
+    def handle(self, *args, **options):
+        validation_percent = options['validation_percent'] if options['validation_output'] else 0
+        if not 0 <= validation_percent < 100:
+            raise CommandError("--validation-percent must be between 0 and 99.")
+
+        since = last_watermark() if options['since_last'] else {'draft': 0, 'sample': 0}
+        until = current_watermark()
+
+        train = sys.stdout if options['output'] == '-' else open(options['output'], 'w', encoding='utf-8')
+        validation = open(options['validation_output'], 'w', encoding='utf-8') if validation_percent else None
+        counts = {'train': 0, 'validation': 0}
+        try:
+            for split, line in iter_jsonl(since, until, validation_percent, dedupe=not options['no_dedupe']):
+                (validation if split == 'validation' else train).write(line)
+                counts[split] += 1
+        finally:
+            if train is not sys.stdout:
+                train.close()
+            if validation:
+                validation.close()
+
+        record_export(None, until, counts['train'] + counts['validation'])
+        self.stderr.write(self.style.SUCCESS(
+            f"✅ Exported {counts['train']} training and {counts['validation']} validation samples "
+            f"(watermark {format_watermark(until)})"
+        ))
@@ -0,0 +1,42 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from executive_biographer.profile_text import extract_pending, hash_file, register_upload, requeue_stale
+from lead_management.models import Connection
+
+
+class Command(BaseCommand):
+    help = (
+        "Extract text from queued profile PDFs. With --backfill, first hash and queue PDFs "
+        "uploaded before extraction existed. (run_generation_worker also drains this queue.)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--backfill', action='store_true')
+
+    def handle(self, *args, **options):
+        if options['backfill']:
+            queued = 0
+            for connection in Connection.objects.exclude(profile_pdf='').exclude(profile_pdf=None).filter(
+                profile_pdf_sha256=''
+            ).iterator():
+                try:
+                    with connection.profile_pdf.open('rb') as file:
+                        digest = hash_file(file)
+                except OSError as e:
+                    self.stderr.write(f"⚠️ {connection}: {e}")
+                    continue
+                Connection.objects.filter(pk=connection.pk).update(profile_pdf_sha256=digest)
+                connection.profile_pdf_sha256 = digest
+                register_upload(connection)
+                queued += 1
+            self.stdout.write(f"Hashed {queued} existing PDF(s)")
+
+        requeued = requeue_stale(settings.BIOGRAPHER_PROFILE_EXTRACTION_STALE_SECONDS)
+        if requeued:
+            self.stdout.write(f"↻ Requeued {requeued} stale profile PDF extraction(s)")
+
+        total = 0
+        while handled := extract_pending():
+            total += handled
+        self.stdout.write(self.style.SUCCESS(f"✅ Extracted {total} PDF(s)"))
@@ -0,0 +1,109 @@
+import asyncio
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient
+from django.urls import reverse
+
+from executive_biographer import llm_gateway
+from lead_management.media_access import connection_access_q
+from lead_management.models import Connection
+
+
+class Command(BaseCommand):
+    help = (
+        "Fire N concurrent biography generations through the ASGI stack and report the latency "
+        "of another view before and while they are in flight."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('connection_id', type=int)
+        parser.add_argument('--user', help="Username to generate as (default: the connection's assigned editor).")
+        parser.add_argument('--generations', type=int, default=20)
+        parser.add_argument('--probe-url', default=reverse('login'))
+        parser.add_argument('--probe-interval', type=float, default=0.1)
+        parser.add_argument('--fake', action='store_true', help="Use the gateway's offline fake backend.")
+        parser.add_argument('--fake-latency', type=float, default=None, help="Seconds before the fake's first token.")
+
+    def handle(self, *args, **options):
+        if options['fake']:
+            overrides = {'BACKEND': 'fake', 'REQUESTS_PER_MINUTE': 6000}
+            if options['fake_latency'] is not None:
+                overrides['FAKE_LATENCY'] = options['fake_latency']
+            settings.BIOGRAPHER_LLM = {**getattr(settings, 'BIOGRAPHER_LLM', {}), **overrides}
+            llm_gateway.reset_gateway()
+        # The in-process client talks to the app as "testserver", like Django's test runner
+        settings.ALLOWED_HOSTS = [*settings.ALLOWED_HOSTS, 'testserver']
+        user = self._get_user(options['connection_id'], options['user'])
+        asyncio.run(self._run(**{**options, 'user': user}))
+
+    def _get_user(self, connection_id, username):
+        connection = Connection.objects.filter(pk=connection_id).select_related('assigned_editor').first()
+        if connection is None:
+            raise CommandError(f"Connection {connection_id} does not exist.")
+        if username:
+            user = get_user_model().objects.filter(username=username).first()
+            if user is None:
+                raise CommandError(f"User {username!r} does not exist.")
+        elif connection.assigned_editor is not None:
+            user = connection.assigned_editor
+        else:
+            raise CommandError("The connection has no assigned editor; pass --user.")
+        if not Connection.objects.filter(connection_access_q(user), pk=connection_id).exists():
+            raise CommandError(f"{user.username} has no access to connection {connection_id}.")
+        return user
+
+    async def _probe(self, client, url, interval, stop):
+        latencies = []
+        while not stop.is_set():
+            start = time.perf_counter()
+            await client.get(url)
+            latencies.append((time.perf_counter() - start) * 1000)
+            await asyncio.sleep(interval)
+        return latencies
+
+    async def _generate(self, client, url, index):
+        start = time.perf_counter()
+        response = await client.post(url, {'prompt': f"Load test generation {index}\n\nGO"})
+        return response.status_code, time.perf_counter() - start
+
+    async def _run(self, user, connection_id, generations, probe_url, probe_interval, **options):
+        # generate_biography requires login; without it every request measures the redirect
+        client = AsyncClient()
+        await client.aforce_login(user)
+        generate_url = reverse('generate_biography', args=[connection_id])
+
+        stop = asyncio.Event()
+        baseline_task = asyncio.create_task(self._probe(client, probe_url, probe_interval, stop))
+        await asyncio.sleep(2)
+        stop.set()
+        baseline = await baseline_task
+
+        stop = asyncio.Event()
+        probe_task = asyncio.create_task(self._probe(client, probe_url, probe_interval, stop))
+        results = await asyncio.gather(*(
+            self._generate(client, generate_url, i) for i in range(generations)
+        ))
+        stop.set()
+        under_load = await probe_task
+
+        statuses = {}
+        for status, _ in results:
+            statuses[status] = statuses.get(status, 0) + 1
+        durations = [duration for _, duration in results]
+
+        self.stdout.write(f"{generations} generations: statuses {statuses}, "
+                          f"median {statistics.median(durations):.2f}s, max {max(durations):.2f}s")
+        self._report("probe (idle)", baseline)
+        self._report("probe (under load)", under_load)
+        failed = generations - statuses.get(200, 0)
+        if failed:
+            raise CommandError(f"{failed} of {generations} generations did not return 200: {statuses}")
+
+    def _report(self, label, latencies):
+        latencies = sorted(latencies)
+        p95 = latencies[int(len(latencies) * 0.95) - 1] if len(latencies) >= 20 else latencies[-1]
+        self.stdout.write(f"  {label:<20} n={len(latencies):<4} p50 {statistics.median(latencies):7.1f} ms   p95 {p95:7.1f} ms")
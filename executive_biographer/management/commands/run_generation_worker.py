@@ -0,0 +1,72 @@
+import asyncio
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from executive_biographer.generation_jobs import GenerationWorker, claim_jobs, requeue_stale
+from executive_biographer import profile_text
+
+REQUEUE_INTERVAL = 60  # seconds between sweeps for jobs of dead workers
+
+
+class Command(BaseCommand):
+    help = (
+        "Drain queued biography generations with bounded concurrency and a shared "
+        "tokens-per-minute budget, and extract text from newly uploaded profile PDFs. "
+        "Run one or more of these next to the web process."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=settings.BIOGRAPHER_JOB_CONCURRENCY)
+        parser.add_argument('--tokens-per-minute', type=int, default=settings.BIOGRAPHER_JOB_TOKENS_PER_MINUTE)
+        parser.add_argument('--poll-interval', type=float, default=5.0)
+        parser.add_argument('--once', action='store_true', help="Exit when no job is due.")
+
+    def handle(self, *args, **options):
+        asyncio.run(self._run(**options))
+
+    def _log_crash(self, task):
+        if not task.cancelled() and task.exception():
+            self.stderr.write(f"❌ job task crashed: {task.exception()!r}")
+
+    async def _run(self, concurrency, tokens_per_minute, poll_interval, once, **options):
+        worker = GenerationWorker(concurrency, tokens_per_minute, stdout=self.stdout)
+        running = {}
+        extraction = None
+        last_requeue = float('-inf')
+        while True:
+            # Jobs of workers that died are put back regularly, not only when this one starts
+            if time.monotonic() - last_requeue >= REQUEUE_INTERVAL:
+                last_requeue = time.monotonic()
+                requeued = await sync_to_async(requeue_stale)(settings.BIOGRAPHER_JOB_STALE_SECONDS, list(running.values()))
+                if requeued:
+                    self.stdout.write(f"↻ Requeued {requeued} stale job(s)")
+                requeued = await sync_to_async(profile_text.requeue_stale)(settings.BIOGRAPHER_PROFILE_EXTRACTION_STALE_SECONDS)
+                if requeued:
+                    self.stdout.write(f"↻ Requeued {requeued} stale profile PDF extraction(s)")
+
+            # Profile PDFs are parsed one batch at a time on a separate thread (CPU-bound)
+            if extraction is None or extraction.done():
+                extraction = asyncio.create_task(sync_to_async(profile_text.extract_pending, thread_sensitive=False)())
+
+            # Keep at most `concurrency` jobs claimed so other workers can take the rest
+            free = concurrency - len(running)
+            jobs = await sync_to_async(claim_jobs)(free) if free else []
+            for job in jobs:
+                task = asyncio.create_task(worker.run_job(job))
+                running[task] = job.pk
+                task.add_done_callback(self._log_crash)
+                task.add_done_callback(lambda task: running.pop(task, None))
+
+            if not running:
+                if once:
+                    if await extraction:
+                        continue
+                    break
+                await asyncio.sleep(poll_interval)
+                continue
+            if not jobs or len(running) >= concurrency:
+                await asyncio.wait(running, timeout=poll_interval, return_when=asyncio.FIRST_COMPLETED)
+        self.stdout.write(self.style.SUCCESS("Queue drained."))
@@ -0,0 +1,81 @@
+# Generated by Django 5.2 on 2026-10-19 08:08
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+
+
+def roll_up_existing_drafts(apps, schema_editor):
+    """Seed the daily roll-up from drafts generated before the ledger existed."""
+    BiographyDraft = apps.get_model('executive_biographer', 'BiographyDraft')
+    DailyTokenUsage = apps.get_model('executive_biographer', 'DailyTokenUsage')
+
+    rows = (
+        BiographyDraft.objects.filter(total_tokens__isnull=False)
+        .annotate(day=TruncDate('created_at'))
+        .values('day', 'author')
+        .annotate(
+            calls=Count('id'),
+            cache_hits=Count('id', filter=Q(is_cached=True)),
+            input_tokens=Sum('input_tokens', filter=Q(is_cached=False)),
+            output_tokens=Sum('output_tokens', filter=Q(is_cached=False)),
+            tokens_spent=Sum('total_tokens', filter=Q(is_cached=False)),
+            tokens_saved=Sum('total_tokens', filter=Q(is_cached=True)),
+        )
+    )
+    DailyTokenUsage.objects.bulk_create([
+        DailyTokenUsage(
+            date=row['day'], user_id=row['author'], calls=row['calls'], cache_hits=row['cache_hits'],
+            input_tokens=row['input_tokens'] or 0, output_tokens=row['output_tokens'] or 0,
+            tokens_spent=row['tokens_spent'] or 0, tokens_saved=row['tokens_saved'] or 0,
+        )
+        for row in rows
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('executive_biographer', '0004_generationjob'),
+        ('lead_management', '0009_connection_updated_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TokenUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(choices=[('interactive', 'Interactive'), ('stream', 'Streamed'), ('batch', 'Batch Job')], max_length=20)),
+                ('model', models.CharField(max_length=50)),
+                ('input_tokens', models.IntegerField(default=0)),
+                ('output_tokens', models.IntegerField(default=0)),
+                ('total_tokens', models.IntegerField(default=0)),
+                ('is_cached', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('connection', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='lead_management.connection')),
+                ('draft', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='executive_biographer.biographydraft')),
+                ('user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='token_usage', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DailyTokenUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('calls', models.IntegerField(default=0)),
+                ('cache_hits', models.IntegerField(default=0)),
+                ('input_tokens', models.IntegerField(default=0)),
+                ('output_tokens', models.IntegerField(default=0)),
+                ('tokens_spent', models.IntegerField(default=0)),
+                ('tokens_saved', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='daily_token_usage', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('date', 'user'), name='unique_daily_token_usage')],
+            },
+        ),
+        migrations.RunPython(roll_up_existing_drafts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2 on 2026-10-19 08:10
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def renumber_drafts(apps, schema_editor):
+    """
+    Give each connection's drafts gap-free versions in creation order, keep only the
+    newest published draft published, and seed the Connection counter and pointer.
+    """
+    BiographyDraft = apps.get_model('executive_biographer', 'BiographyDraft')
+    Connection = apps.get_model('lead_management', 'Connection')
+
+    drafts_by_connection = {}
+    for draft in BiographyDraft.objects.order_by('connection_id', 'created_at', 'id').only(
+        'id', 'connection_id', 'version', 'is_published'
+    ):
+        drafts_by_connection.setdefault(draft.connection_id, []).append(draft)
+
+    for connection_id, drafts in drafts_by_connection.items():
+        published = None
+        for version, draft in enumerate(drafts, start=1):
+            draft.version = version
+            if draft.is_published:
+                if published is not None:
+                    published.is_published = False
+                published = draft
+        BiographyDraft.objects.bulk_update(drafts, ['version', 'is_published'])
+        Connection.objects.filter(pk=connection_id).update(
+            last_draft_version=len(drafts),
+            published_draft=published,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('executive_biographer', '0005_token_ledger'),
+        ('lead_management', '0010_connection_draft_pointers'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(renumber_drafts, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='biographydraft',
+            constraint=models.UniqueConstraint(fields=('connection', 'version'), name='unique_draft_version'),
+        ),
+        migrations.AddConstraint(
+            model_name='biographydraft',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_published', True)), fields=('connection',), name='one_published_draft_per_connection'),
+        ),
+    ]
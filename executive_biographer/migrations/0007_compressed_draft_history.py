@@ -0,0 +1,128 @@
+# Generated by Django 5.2 on 2026-10-19 08:12
+
+import json
+import re
+import zlib
+from difflib import SequenceMatcher
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# The encoding and interval as they were when this migration was written, frozen here so
+# later changes to executive_biographer.draft_storage or settings can't alter what it does
+SNAPSHOT_INTERVAL = 10
+
+_TOKENS = re.compile(r'\S+|\s+')
+
+
+def _encode_full(text):
+    return b'F' + zlib.compress(text.encode('utf-8'), 9)
+
+
+def _encode(old_text, new_text):
+    old, new = _TOKENS.findall(old_text), _TOKENS.findall(new_text)
+    ops = []
+    for tag, i1, i2, j1, j2 in SequenceMatcher(None, old, new, autojunk=False).get_opcodes():
+        if tag == 'equal':
+            ops.append([i1, i2])
+        elif j2 > j1:
+            ops.append("".join(new[j1:j2]))
+    payload = json.dumps(ops, ensure_ascii=False, separators=(',', ':'))
+    delta = b'D' + zlib.compress(payload.encode('utf-8'), 9)
+    full = _encode_full(new_text)
+    return delta if len(delta) < len(full) else full
+
+
+def _decode(blob, old_text):
+    blob = bytes(blob)
+    body = zlib.decompress(blob[1:]).decode('utf-8')
+    if blob[:1] == b'F':
+        return body
+    old = _TOKENS.findall(old_text)
+    return "".join("".join(old[op[0]:op[1]]) if isinstance(op, list) else op for op in json.loads(body))
+
+
+def compress_history(apps, schema_editor):
+    """Re-encode every connection's drafts as snapshots plus deltas, in version order."""
+    BiographyDraft = apps.get_model('executive_biographer', 'BiographyDraft')
+
+    connection_ids = BiographyDraft.objects.values_list('connection_id', flat=True).distinct()
+    for connection_id in connection_ids:
+        drafts = list(BiographyDraft.objects.filter(connection_id=connection_id).order_by('version'))
+        previous = None
+        for draft in drafts:
+            if previous is not None and previous.chain_length + 1 < SNAPSHOT_INTERVAL:
+                draft.base_id, draft.chain_length = previous.id, previous.chain_length + 1
+                draft.prompt_data = _encode(previous.prompt, draft.prompt)
+                draft.text_data = _encode(previous.generated_text, draft.generated_text)
+            else:
+                draft.base_id, draft.chain_length = None, 0
+                draft.prompt_data = _encode_full(draft.prompt)
+                draft.text_data = _encode_full(draft.generated_text)
+            previous = draft
+        BiographyDraft.objects.bulk_update(drafts, ['base', 'chain_length', 'prompt_data', 'text_data'])
+
+
+def expand_history(apps, schema_editor):
+    BiographyDraft = apps.get_model('executive_biographer', 'BiographyDraft')
+
+    connection_ids = BiographyDraft.objects.values_list('connection_id', flat=True).distinct()
+    for connection_id in connection_ids:
+        drafts = list(BiographyDraft.objects.filter(connection_id=connection_id).order_by('version'))
+        texts = {}
+        for draft in drafts:
+            old_prompt, old_text = texts.get(draft.base_id, (None, None))
+            draft.prompt = _decode(draft.prompt_data, old_prompt)
+            draft.generated_text = _decode(draft.text_data, old_text)
+            texts[draft.id] = (draft.prompt, draft.generated_text)
+        BiographyDraft.objects.bulk_update(drafts, ['prompt', 'generated_text'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('executive_biographer', '0006_draft_versioning'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='biographydraft',
+            name='base',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.RESTRICT, related_name='+', to='executive_biographer.biographydraft'),
+        ),
+        migrations.AddField(
+            model_name='biographydraft',
+            name='chain_length',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='biographydraft',
+            name='prompt_data',
+            field=models.BinaryField(default=b''),
+        ),
+        migrations.AddField(
+            model_name='biographydraft',
+            name='text_data',
+            field=models.BinaryField(default=b''),
+        ),
+        migrations.RunPython(compress_history, expand_history),
+        # A default lets the columns be re-added (and refilled by expand_history) on reverse
+        migrations.AlterField(
+            model_name='biographydraft',
+            name='generated_text',
+            field=models.TextField(default=''),
+        ),
+        migrations.AlterField(
+            model_name='biographydraft',
+            name='prompt',
+            field=models.TextField(default=''),
+        ),
+        migrations.RemoveField(
+            model_name='biographydraft',
+            name='generated_text',
+        ),
+        migrations.RemoveField(
+            model_name='biographydraft',
+            name='prompt',
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2 on 2026-10-19 08:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('executive_biographer', '0008_finetuneexport'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProfileText',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(max_length=64, unique=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('ready', 'Ready'), ('failed', 'Failed')], db_index=True, default='pending', max_length=20)),
+                ('text', models.TextField(blank=True)),
+                ('sections', models.JSONField(blank=True, default=list)),
+                ('page_count', models.IntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('extracted_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
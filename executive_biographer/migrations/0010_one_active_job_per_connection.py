@@ -0,0 +1,38 @@
+# Generated by Django 5.2 on 2026-10-19 08:47
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fail_duplicate_jobs(apps, schema_editor):
+    """Keep the oldest active job per connection; later duplicates could not be queued now."""
+    GenerationJob = apps.get_model('executive_biographer', 'GenerationJob')
+    seen = set()
+    duplicates = []
+    for pk, connection_id in GenerationJob.objects.filter(status__in=['queued', 'running']).order_by('id').values_list('id', 'connection_id'):
+        if connection_id in seen:
+            duplicates.append(pk)
+        seen.add(connection_id)
+    GenerationJob.objects.filter(id__in=duplicates).update(status='failed', last_error='Duplicate of an earlier job.')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('executive_biographer', '0009_profiletext'),
+        ('lead_management', '0017_connection_status_events'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(fail_duplicate_jobs, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='generationjob',
+            name='prompt',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddConstraint(
+            model_name='generationjob',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['queued', 'running'])), fields=('connection',), name='one_active_job_per_connection'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2 on 2026-10-19 08:48
+
+from django.conf import settings
+from django.db import migrations, models
+
+COUNTERS = ['calls', 'cache_hits', 'input_tokens', 'output_tokens', 'tokens_spent', 'tokens_saved']
+
+
+def merge_duplicate_days(apps, schema_editor):
+    """Fold duplicate no-user rows for a day into the first one."""
+    DailyTokenUsage = apps.get_model('executive_biographer', 'DailyTokenUsage')
+    keepers = {}
+    for row in DailyTokenUsage.objects.filter(user__isnull=True).order_by('id'):
+        keeper = keepers.setdefault(row.date, row)
+        if keeper is row:
+            continue
+        for field in COUNTERS:
+            setattr(keeper, field, getattr(keeper, field) + getattr(row, field))
+        keeper.save(update_fields=COUNTERS)
+        row.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('executive_biographer', '0010_one_active_job_per_connection'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_days, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='dailytokenusage',
+            constraint=models.UniqueConstraint(condition=models.Q(('user__isnull', True)), fields=('date',), name='unique_daily_token_usage_no_user'),
+        ),
+    ]
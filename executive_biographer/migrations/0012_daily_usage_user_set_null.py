@@ -0,0 +1,21 @@
+# Generated by Django 5.2 on 2026-10-19 09:13
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('executive_biographer', '0011_unique_daily_usage_without_user'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='dailytokenusage',
+            name='user',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='daily_token_usage', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
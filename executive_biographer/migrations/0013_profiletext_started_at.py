@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-19 09:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('executive_biographer', '0012_daily_usage_user_set_null'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profiletext',
+            name='started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -1,6 +1,18 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
 from lead_management.models import Connection
+from . import draft_storage
+
+
+class BiographyDraftQuerySet(models.QuerySet):
+
+    def delete(self):
+        # Deleting a connection cascades over all of its drafts at once, which RESTRICT allows
+        with transaction.atomic():
+            BiographyDraft.detach_dependents(self)
+            return super().delete()
 
 
 class BiographyDraft(models.Model):
@@ -8,22 +20,172 @@ class BiographyDraft(models.Model):
     author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True)
     
     title = models.CharField(max_length=200, default="Untitled Draft")
-    prompt = models.TextField()
-    generated_text = models.TextField()
+
+    # 🗜️ Prompt and text are stored compressed, as a snapshot or a delta against `base`
+    # (the previous version); read and write them through `prompt` / `generated_text`.
+    # Deleting a base first re-snapshots the drafts built on it (see detach_dependents).
+    prompt_data = models.BinaryField(default=b'')
+    text_data = models.BinaryField(default=b'')
+    base = models.ForeignKey('self', on_delete=models.RESTRICT, null=True, blank=True, related_name='+')
+    chain_length = models.IntegerField(default=0)  # deltas back to the last snapshot
     
-    version = models.IntegerField(default=1)  # incremented per connection
+    version = models.IntegerField(default=1)  # allocated from Connection.last_draft_version
     is_published = models.BooleanField(default=False)  # only one per connection
     is_finetune_ready = models.BooleanField(default=False)  # for tagging the best final versions
 
     input_tokens = models.IntegerField(null=True, blank=True)
     output_tokens = models.IntegerField(null=True, blank=True)
     total_tokens = models.IntegerField(null=True, blank=True)
+    is_cached = models.BooleanField(default=False)  # served from GenerationCacheEntry; tokens were not spent again
 
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = BiographyDraftQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['connection', 'version'], name='unique_draft_version'),
+            models.UniqueConstraint(
+                fields=['connection'], condition=models.Q(is_published=True), name='one_published_draft_per_connection'
+            ),
+        ]
+
     def __str__(self):
         return f"v{self.version} - {self.title} ({self.connection.full_name})"
 
+    # -------------------- Transparent text access --------------------
+
+    _prompt = None
+    _generated_text = None
+
+    @property
+    def prompt(self):
+        if self._prompt is None:
+            self._prompt, self._generated_text = self.read_texts()
+        return self._prompt
+
+    @prompt.setter
+    def prompt(self, value):
+        self._set_text('_prompt', value)
+
+    @property
+    def generated_text(self):
+        if self._generated_text is None:
+            self._prompt, self._generated_text = self.read_texts()
+        return self._generated_text
+
+    @generated_text.setter
+    def generated_text(self, value):
+        self._set_text('_generated_text', value)
+
+    def _set_text(self, attr, value):
+        # Later versions may be stored as deltas against this one, so saved text is frozen
+        if not self._state.adding:
+            raise AttributeError("Saved drafts are immutable; create a new version instead.")
+        setattr(self, attr, value)
+
+    @staticmethod
+    def texts_cache_key(pk):
+        return f"biographer:draft-texts:{pk}"
+
+    def read_texts(self, use_cache=True):
+        """
+        Return ``(prompt, generated_text)``, rebuilding them from the delta chain if needed.
+
+        Bulk readers such as exports pass ``use_cache=False`` so they don't flood the cache.
+        """
+        if not use_cache:
+            return self._rebuild_texts()
+        key = self.texts_cache_key(self.pk)
+        texts = cache.get(key)
+        if texts is None:
+            texts = self._rebuild_texts()
+            cache.set(key, texts, settings.BIOGRAPHER_DRAFT_TEXT_CACHE_SECONDS)
+        return texts
+
+    def _rebuild_texts(self):
+        # One query fetches the whole chain back to the snapshot; cached ancestors cut it short
+        ancestors = {
+            draft.pk: draft for draft in BiographyDraft.objects.filter(
+                connection_id=self.connection_id,
+                version__lt=self.version,
+                version__gte=self.version - self.chain_length,
+            ).only('base_id', 'prompt_data', 'text_data')
+        }
+        cached = cache.get_many([self.texts_cache_key(pk) for pk in ancestors])
+
+        chain, node, texts = [], self, ("", "")
+        while node is not None:
+            if node is not self and self.texts_cache_key(node.pk) in cached:
+                texts = cached[self.texts_cache_key(node.pk)]
+                break
+            chain.append(node)
+            if node.base_id is None:
+                break
+            node = ancestors.get(node.base_id) or BiographyDraft.objects.only(
+                'base_id', 'prompt_data', 'text_data', 'version'
+            ).get(pk=node.base_id)
+
+        for node in reversed(chain):
+            texts = node.decode_texts(texts)
+        return texts
+
+    def decode_texts(self, base_texts):
+        """``(prompt, generated_text)`` of this draft, given its base's (ignored for a snapshot)."""
+        prompt, text = base_texts
+        prompt = draft_storage.decode(self.prompt_data, prompt) if self.prompt_data else ""
+        text = draft_storage.decode(self.text_data, text) if self.text_data else ""
+        return prompt, text
+
+    def _encode_texts(self):
+        interval = settings.BIOGRAPHER_DRAFT_SNAPSHOT_INTERVAL
+        previous = BiographyDraft.objects.filter(
+            connection_id=self.connection_id, version__lt=self.version
+        ).order_by('-version').first()
+
+        prompt, text = self._prompt or "", self._generated_text or ""
+        if previous is not None and previous.chain_length + 1 < interval:
+            old_prompt, old_text = previous.read_texts()
+            self.base, self.chain_length = previous, previous.chain_length + 1
+            self.prompt_data = draft_storage.encode(old_prompt, prompt)
+            self.text_data = draft_storage.encode(old_text, text)
+        else:
+            self.base, self.chain_length = None, 0
+            self.prompt_data = draft_storage.encode_full(prompt)
+            self.text_data = draft_storage.encode_full(text)
+
+    @classmethod
+    def detach_dependents(cls, deleted):
+        """
+        Store the drafts based on any of ``deleted`` (that aren't being deleted themselves)
+        as snapshots, so the bases can go. Their texts, and any cached copy, stay the same;
+        later versions' chain_length becomes an overestimate, which readers tolerate.
+        """
+        dependents = cls.objects.filter(base__in=deleted).exclude(pk__in=deleted)
+        for draft in dependents.only('id', 'connection_id', 'version', 'base_id', 'chain_length', 'prompt_data', 'text_data'):
+            prompt, text = draft.read_texts(use_cache=False)
+            cls.objects.filter(pk=draft.pk).update(
+                base=None, chain_length=0,
+                prompt_data=draft_storage.encode_full(prompt), text_data=draft_storage.encode_full(text),
+            )
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            self.detach_dependents(BiographyDraft.objects.filter(pk=self.pk))
+            return super().delete(*args, **kwargs)
+
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        if adding:
+            self._encode_texts()
+        super().save(*args, **kwargs)
+        if adding:
+            cache.set(
+                self.texts_cache_key(self.pk),
+                (self._prompt or "", self._generated_text or ""),
+                settings.BIOGRAPHER_DRAFT_TEXT_CACHE_SECONDS,
+            )
+
 
 class FineTuningSample(models.Model):
     connection = models.ForeignKey(Connection, on_delete=models.CASCADE)
@@ -33,3 +195,147 @@ class FineTuningSample(models.Model):
 
     def __str__(self):
         return f"Training Sample for {self.connection.full_name}"
+
+
+# 📄 Text extracted once per distinct profile PDF, shared by every connection that uploads the same file
+class ProfileText(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('ready', 'Ready'),
+        ('failed', 'Failed'),
+    ]
+
+    content_hash = models.CharField(max_length=64, unique=True)  # sha256 of the PDF bytes
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', db_index=True)
+    text = models.TextField(blank=True)  # normalized full text
+    sections = models.JSONField(default=list, blank=True)  # [{"title": ..., "content": ...}]
+    page_count = models.IntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)  # when a worker claimed it ('processing')
+    extracted_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.content_hash[:12]} ({self.status})"
+
+
+# 📤 One completed fine-tune export; its last ids are the watermark for the next incremental run
+class FineTuneExport(models.Model):
+    exported_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
+    last_draft_id = models.BigIntegerField(default=0)
+    last_sample_id = models.BigIntegerField(default=0)
+    sample_count = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Export {self.id}: {self.sample_count} samples"
+
+
+# 🗃️ Content-addressed cache of model responses, keyed by a hash of everything that shapes the output
+class GenerationCacheEntry(models.Model):
+    key = models.CharField(max_length=64, unique=True)  # sha256 of (system prompt, prompt, model, temperature, max_tokens)
+    model = models.CharField(max_length=50)
+    generated_text = models.TextField()
+
+    input_tokens = models.IntegerField(default=0)
+    output_tokens = models.IntegerField(default=0)
+    total_tokens = models.IntegerField(default=0)
+
+    hit_count = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(auto_now_add=True, db_index=True)  # eviction order
+
+    def __str__(self):
+        return f"{self.key[:12]} ({self.model}, {self.hit_count} hits)"
+
+
+# 🧵 Queued biography generations, drained by `manage.py run_generation_worker`
+class GenerationJob(models.Model):
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    ]
+
+    connection = models.ForeignKey(Connection, on_delete=models.CASCADE, related_name='generation_jobs')
+    requested_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, related_name='requested_generation_jobs')
+    editor = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, related_name='generation_jobs')  # draft author
+    prompt = models.TextField(blank=True)  # empty until the worker builds it from the connection
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)  # pushed back after a transient failure
+    last_error = models.TextField(blank=True)
+    draft = models.ForeignKey(BiographyDraft, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_after']),
+        ]
+        constraints = [
+            # Two managers queueing the same book at once can't queue a connection twice
+            models.UniqueConstraint(
+                fields=['connection'], condition=models.Q(status__in=['queued', 'running']), name='one_active_job_per_connection'
+            ),
+        ]
+
+    def __str__(self):
+        return f"Job {self.id} for {self.connection_id} ({self.status})"
+
+
+# 🧾 Append-only record of every generation's token usage (never updated in place)
+class TokenUsage(models.Model):
+    SOURCE_CHOICES = [
+        ('interactive', 'Interactive'),
+        ('stream', 'Streamed'),
+        ('batch', 'Batch Job'),
+    ]
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, related_name='token_usage')
+    connection = models.ForeignKey(Connection, on_delete=models.SET_NULL, null=True, related_name='+')
+    draft = models.ForeignKey(BiographyDraft, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    source = models.CharField(max_length=20, choices=SOURCE_CHOICES)
+    model = models.CharField(max_length=50)
+
+    input_tokens = models.IntegerField(default=0)
+    output_tokens = models.IntegerField(default=0)
+    total_tokens = models.IntegerField(default=0)
+    is_cached = models.BooleanField(default=False)  # answered from the response cache; no tokens spent
+
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.total_tokens} tokens ({self.source}) by {self.user_id}"
+
+
+# 📅 Per-editor daily roll-up of TokenUsage; quotas and cost dashboards read this, not the ledger
+class DailyTokenUsage(models.Model):
+    date = models.DateField()
+    # Deleting a user first folds their rows into each day's no-user row (token_ledger.fold_user_usage)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, related_name='daily_token_usage')
+
+    calls = models.IntegerField(default=0)
+    cache_hits = models.IntegerField(default=0)
+    input_tokens = models.IntegerField(default=0)
+    output_tokens = models.IntegerField(default=0)
+    tokens_spent = models.IntegerField(default=0)
+    tokens_saved = models.IntegerField(default=0)  # what cache hits would have cost
+
+    COUNTERS = ['calls', 'cache_hits', 'input_tokens', 'output_tokens', 'tokens_spent', 'tokens_saved']
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'user'], name='unique_daily_token_usage'),
+            # NULLs never collide in the constraint above, so the no-user row needs its own
+            models.UniqueConstraint(fields=['date'], condition=models.Q(user__isnull=True), name='unique_daily_token_usage_no_user'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.user_id}: {self.tokens_spent} tokens"
@@ -0,0 +1,133 @@
+#
+# File: profile_text.py
+# Purpose: Parse each distinct profile PDF once, off the request path, into normalized
+#          text and headed sections that prompt assembly can read without touching the file.
+#
+
+import hashlib
+import re
+from datetime import timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+
+from lead_management.models import Connection
+from .models import ProfileText
+
+# Headings of LinkedIn profile exports and common resume layouts
+KNOWN_HEADINGS = {
+    'contact', 'summary', 'about', 'profile', 'experience', 'work experience', 'professional experience',
+    'education', 'skills', 'top skills', 'languages', 'certifications', 'licenses & certifications',
+    'honors-awards', 'honors & awards', 'awards', 'publications', 'patents', 'projects',
+    'volunteer experience', 'volunteering', 'interests', 'board positions', 'speaking engagements',
+}
+_PAGE_FOOTER = re.compile(r'^\s*page \d+ of \d+\s*$', re.IGNORECASE)
+
+
+def hash_file(file):
+    """sha256 of an uploaded or stored file, read in chunks."""
+    # Uploads were already hashed on the way in by lead_management.upload_handlers
+    known = getattr(getattr(file, 'file', None), 'sha256', None)
+    if known:
+        return known
+    digest = hashlib.sha256()
+    file.seek(0)
+    for chunk in file.chunks():
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def normalize(raw):
+    lines = []
+    for line in raw.replace('\r', '\n').split('\n'):
+        if _PAGE_FOOTER.match(line):
+            continue
+        line = re.sub(r'[ \t ]+', ' ', line).strip()
+        # Re-join words hyphenated across a line break
+        if lines and lines[-1].endswith('-') and line[:1].islower():
+            lines[-1] = lines[-1][:-1] + line
+        else:
+            lines.append(line)
+    return re.sub(r'\n{3,}', '\n\n', '\n'.join(lines)).strip()
+
+
+def _is_heading(line):
+    if line.lower() in KNOWN_HEADINGS:
+        return True
+    # Other ALL-CAPS lines of real words ("CORE COMPETENCIES"), but not acronyms like "MIT MBA"
+    words = line.split()
+    return len(line) <= 40 and line.isupper() and len(words) >= 2 and all(len(w) >= 4 for w in words)
+
+
+def split_sections(text):
+    sections = [{"title": "Profile", "content": []}]
+    for line in text.split('\n'):
+        if _is_heading(line):
+            sections.append({"title": line.title() if line.isupper() else line, "content": []})
+        else:
+            sections[-1]["content"].append(line)
+    return [
+        {"title": s["title"], "content": '\n'.join(s["content"]).strip()}
+        for s in sections if '\n'.join(s["content"]).strip()
+    ]
+
+
+def parse_pdf(file):
+    """Return ``(text, sections, page_count)`` for a PDF file object."""
+    from pypdf import PdfReader
+
+    file.seek(0)
+    reader = PdfReader(file)
+    raw = '\n'.join(page.extract_text() or '' for page in reader.pages)
+    text = normalize(raw)
+    return text, split_sections(text), len(reader.pages)
+
+
+def extract(profile_text):
+    connection = Connection.objects.filter(profile_pdf_sha256=profile_text.content_hash).exclude(profile_pdf='').first()
+    try:
+        if connection is None:
+            raise FileNotFoundError("No connection holds this PDF any more.")
+        with connection.profile_pdf.open('rb') as file:
+            text, sections, page_count = parse_pdf(file)
+    except Exception as e:
+        ProfileText.objects.filter(pk=profile_text.pk).update(status='failed', error=str(e), extracted_at=timezone.now())
+        return False
+    ProfileText.objects.filter(pk=profile_text.pk).update(
+        status='ready', text=text, sections=sections, page_count=page_count, error='', extracted_at=timezone.now()
+    )
+    return True
+
+
+def extract_pending(limit=10):
+    """Parse up to ``limit`` pending PDFs; returns how many were handled."""
+    handled = 0
+    for profile_text in ProfileText.objects.filter(status='pending').order_by('id')[:limit]:
+        # Claim it so a second worker skips it
+        if ProfileText.objects.filter(pk=profile_text.pk, status='pending').update(
+            status='processing', started_at=timezone.now()
+        ):
+            extract(profile_text)
+            handled += 1
+    return handled
+
+
+def requeue_stale(older_than):
+    """Put PDFs left 'processing' by a worker that died back to 'pending'."""
+    cutoff = timezone.now() - timedelta(seconds=older_than)
+    # Rows claimed before started_at existed have none; they are long dead too
+    stale = Q(started_at__lt=cutoff) | Q(started_at__isnull=True)
+    return ProfileText.objects.filter(stale, status='processing').update(status='pending')
+
+
+def register_upload(connection):
+    """Queue extraction for the connection's PDF unless that exact file was seen before."""
+    if connection.profile_pdf_sha256:
+        ProfileText.objects.get_or_create(content_hash=connection.profile_pdf_sha256)
+
+
+async def afor_connection(connection):
+    if not connection.profile_pdf_sha256:
+        return None
+    return await ProfileText.objects.filter(content_hash=connection.profile_pdf_sha256).afirst()
@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.db.models.signals import post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from lead_management.models import Connection
+from .profile_text import hash_file, register_upload
+from .token_ledger import fold_user_usage
+
+
+@receiver(pre_save, sender=Connection)
+def hash_profile_pdf(sender, instance, **kwargs):
+    # A new upload is still uncommitted here; hash it before storage takes it
+    if not instance.profile_pdf:
+        instance.profile_pdf_sha256 = ''
+    elif not instance.profile_pdf._committed:
+        instance.profile_pdf_sha256 = hash_file(instance.profile_pdf)
+        instance._profile_pdf_uploaded = True
+
+
+@receiver(post_save, sender=Connection)
+def queue_profile_pdf_extraction(sender, instance, **kwargs):
+    if getattr(instance, '_profile_pdf_uploaded', False):
+        instance._profile_pdf_uploaded = False
+        register_upload(instance)
+
+
+@receiver(pre_delete, sender=settings.AUTH_USER_MODEL)
+def keep_deleted_users_token_usage(sender, instance, **kwargs):
+    fold_user_usage(instance)
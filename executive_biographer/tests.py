@@ -1,3 +1,864 @@
-from django.test import TestCase
+import asyncio
+import io
+import json
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import openai
+from asgiref.sync import async_to_sync, sync_to_async
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db.models import Sum
+from django.test import AsyncRequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from lead_management.models import Connection, CustomUser, OutreachLead
+from . import draft_storage, finetune_export, generation_cache, generation_jobs, llm_gateway, profile_text, token_ledger, views
+from .context_builder import build_context
+from .drafts import create_draft
+from .llm_gateway import CircuitBreaker, LLMError, LLMGateway, LLMUnavailable
+from .models import (
+    BiographyDraft, DailyTokenUsage, FineTuningSample, GenerationCacheEntry, GenerationJob, ProfileText, TokenUsage,
+)
+
+# FakeBackend, fast enough that a whole generation takes a few milliseconds
+FAKE_LLM = {
+    **llm_gateway.DEFAULTS,
+    'BACKEND': 'fake',
+    'FAKE_LATENCY': 0,
+    'FAKE_TOKENS_PER_SECOND': 10000,
+    'FAKE_WORDS': 40,
+    'MAX_RETRIES': 2,
+    'BREAKER_THRESHOLD': 3,
+    'BREAKER_RESET_SECONDS': 30,
+}
+
+
+def connection_error():
+    return openai.APIConnectionError(request=None)
+
+
+def create_connection(editor=None, name='Jane Doe'):
+    builder, _ = CustomUser.objects.get_or_create(
+        username='builder', defaults={'email': 'builder@example.com', 'role': 'community_builder'},
+    )
+    slug = name.lower().replace(' ', '-')
+    lead = OutreachLead.objects.create(linkedin_url=f'https://linkedin.com/in/{slug}', full_name=name, added_by=builder)
+    return Connection.objects.create(outreach_lead=lead, full_name=name, added_by=builder, assigned_editor=editor)
+
+
+class CircuitBreakerTests(SimpleTestCase):
+
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch.object(llm_gateway.time, 'monotonic', lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.breaker = CircuitBreaker(threshold=3, reset_seconds=30)
+
+    def fail(self, times):
+        for _ in range(times):
+            self.breaker.before_call()
+            self.breaker.record_failure()
+
+    def test_stays_closed_below_threshold(self):
+        self.fail(2)
+        self.breaker.before_call()
+
+    def test_success_resets_the_failure_count(self):
+        self.fail(2)
+        self.breaker.record_success()
+        self.fail(2)
+        self.breaker.before_call()
+
+    def test_opens_at_threshold(self):
+        self.fail(3)
+        with self.assertRaises(LLMUnavailable):
+            self.breaker.before_call()
+        self.now += 29
+        with self.assertRaises(LLMUnavailable):
+            self.breaker.before_call()
+
+    def test_half_open_lets_one_trial_through(self):
+        self.fail(3)
+        self.now += 30
+        self.breaker.before_call()
+        # Other callers wait while the trial is in flight
+        with self.assertRaises(LLMUnavailable):
+            self.breaker.before_call()
+
+    def test_failed_trial_reopens(self):
+        self.fail(3)
+        self.now += 30
+        self.fail(1)
+        self.now += 29
+        with self.assertRaises(LLMUnavailable):
+            self.breaker.before_call()
+
+    def test_successful_trial_closes(self):
+        self.fail(3)
+        self.now += 30
+        self.breaker.before_call()
+        self.breaker.record_success()
+        self.breaker.before_call()
+        self.breaker.before_call()
+
+
+class GatewayRetryTests(SimpleTestCase):
+
+    def setUp(self):
+        self.gateway = LLMGateway(FAKE_LLM)
+        # No real waiting between attempts
+        patcher = mock.patch.object(llm_gateway, '_backoff', return_value=0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def failing(self, method, failures, error=connection_error):
+        """Make the backend's ``method`` raise ``failures`` times before working."""
+        original = getattr(self.gateway.backend, method)
+        calls = []
+
+        async def flaky(*args):
+            calls.append(args)
+            if len(calls) <= failures:
+                raise error()
+            return await original(*args)
+
+        setattr(self.gateway.backend, method, flaky)
+        return calls
+
+    async def test_retries_transient_errors(self):
+        calls = self.failing('acomplete', failures=2)
+        text, usage = await self.gateway.achat("system", "prompt")
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(usage['completion_tokens'], FAKE_LLM['FAKE_WORDS'])
+        self.assertEqual(self.gateway.breaker.failures, 0)
+
+    async def test_gives_up_after_max_retries(self):
+        calls = self.failing('acomplete', failures=10)
+        with self.assertRaises(LLMError):
+            await self.gateway.achat("system", "prompt")
+        self.assertEqual(len(calls), FAKE_LLM['MAX_RETRIES'] + 1)
+
+    async def test_does_not_retry_other_errors(self):
+        calls = self.failing('acomplete', failures=1, error=ValueError)
+        with self.assertRaises(ValueError):
+            await self.gateway.achat("system", "prompt")
+        self.assertEqual(len(calls), 1)
+
+    async def test_open_breaker_stops_calls(self):
+        calls = self.failing('acomplete', failures=10)
+        with self.assertRaises(LLMError):
+            await self.gateway.achat("system", "prompt")
+        # The third failure opened the circuit: the next call never reaches the backend
+        with self.assertRaises(LLMUnavailable):
+            await self.gateway.achat("system", "prompt")
+        self.assertEqual(len(calls), 3)
+
+    async def test_other_errors_settle_a_half_open_trial(self):
+        self.gateway.breaker.failures = FAKE_LLM['BREAKER_THRESHOLD']
+        self.gateway.breaker.opened_at = llm_gateway.time.monotonic() - FAKE_LLM['BREAKER_RESET_SECONDS']
+        self.failing('acomplete', failures=1, error=ValueError)
+        with self.assertRaises(ValueError):
+            await self.gateway.achat("system", "prompt")
+        # The failed trial re-opened the circuit rather than leaving it half-open
+        self.assertEqual(self.gateway.breaker.failures, FAKE_LLM['BREAKER_THRESHOLD'] + 1)
+        with self.assertRaises(LLMUnavailable):
+            await self.gateway.achat("system", "prompt")
+
+    async def test_stream_records_other_errors(self):
+        self.failing('aopen_stream', failures=1, error=ValueError)
+        with self.assertRaises(ValueError):
+            async for _ in self.gateway.astream("system", "prompt"):
+                pass
+        self.assertEqual(self.gateway.breaker.failures, 1)
+
+    async def test_stream_retries_opening(self):
+        calls = self.failing('aopen_stream', failures=1)
+        kinds = [kind async for kind, _ in self.gateway.astream("system", "prompt")]
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(kinds.count('token'), FAKE_LLM['FAKE_WORDS'])
+        self.assertEqual(kinds[-1], 'usage')
+
+
+class TokenLedgerTests(TestCase):
+    USAGE = {'prompt_tokens': 300, 'completion_tokens': 700, 'total_tokens': 1000}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.editor = CustomUser.objects.create_user('editor', 'editor@example.com', 'pw', role='editor')
+        cls.other = CustomUser.objects.create_user('other', 'other@example.com', 'pw', role='editor')
+
+    def record(self, user, cached=False):
+        async_to_sync(token_ledger.arecord)(user, None, None, 'interactive', 'gpt-4', self.USAGE, cached=cached)
+
+    def check_quota(self, user, tokens, **quotas):
+        with override_settings(BIOGRAPHER_TOKEN_BUDGET=quotas):
+            async_to_sync(token_ledger.acheck_quota)(user, tokens)
+
+    def test_record_rolls_up_per_user_and_day(self):
+        self.record(self.editor)
+        self.record(self.editor, cached=True)
+        daily = DailyTokenUsage.objects.get(user=self.editor)
+        self.assertEqual((daily.calls, daily.tokens_spent, daily.cache_hits, daily.tokens_saved), (2, 1000, 1, 1000))
+        self.assertEqual(TokenUsage.objects.filter(user=self.editor).count(), 2)
+
+    def test_editor_quota(self):
+        self.record(self.editor)
+        self.check_quota(self.editor, 1000, EDITOR_DAILY_QUOTA=2000)
+        with self.assertRaises(token_ledger.QuotaExceeded):
+            self.check_quota(self.editor, 1001, EDITOR_DAILY_QUOTA=2000)
+        # Someone else's spending doesn't count against this editor
+        self.check_quota(self.other, 2000, EDITOR_DAILY_QUOTA=2000)
+
+    def test_org_quota_counts_everyone(self):
+        self.record(self.editor)
+        self.record(None)
+        with self.assertRaises(token_ledger.QuotaExceeded):
+            self.check_quota(self.other, 1, ORG_DAILY_QUOTA=2000)
+
+    def test_deleting_a_user_keeps_their_usage_in_the_org_total(self):
+        self.record(self.editor)
+        self.record(self.other)
+        self.record(None)
+        self.editor.delete()
+        no_user = DailyTokenUsage.objects.get(user=None)
+        self.assertEqual((no_user.calls, no_user.tokens_spent), (2, 2000))
+        self.assertEqual(DailyTokenUsage.objects.aggregate(spent=Sum('tokens_spent'))['spent'], 3000)
+        # Without an existing no-user row one is created
+        self.other.delete()
+        self.assertEqual(list(DailyTokenUsage.objects.values_list('user', 'tokens_spent')), [(None, 3000)])
+
+    def test_estimate_is_roughly_four_characters_per_token(self):
+        self.assertAlmostEqual(token_ledger.estimate_tokens("word " * 400), 400, delta=100)
+
+
+@override_settings(BIOGRAPHER_LLM=FAKE_LLM, BIOGRAPHER_MAX_CONCURRENT_GENERATIONS=1,
+                   BIOGRAPHER_GENERATION_QUEUE_TIMEOUT=0.2)
+class StreamBiographyTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.editor = CustomUser.objects.create_user('editor', 'editor@example.com', 'pw', role='editor')
+        cls.connection = create_connection(editor=cls.editor)
+
+    def setUp(self):
+        llm_gateway.reset_gateway()
+        self.addCleanup(llm_gateway.reset_gateway)
+        # A fresh semaphore for this test's event loop
+        views._generation_slots = None
+        self.addCleanup(setattr, views, '_generation_slots', None)
+
+    async def post(self, prompt, user=None, force_fresh=True):
+        data = {'prompt': prompt, 'force_fresh': '1'} if force_fresh else {'prompt': prompt}
+        request = AsyncRequestFactory().post(f'/biographer/{self.connection.id}/stream/', data)
+
+        async def auser():
+            return user or self.editor
+
+        request.auser = auser
+        return await views.stream_biography(request, self.connection.id)
+
+    async def start_stream(self, prompt, **kwargs):
+        response = await self.post(prompt, **kwargs)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        return response
+
+    async def read_events(self, response):
+        return [chunk.decode() async for chunk in response.streaming_content]
+
+    async def test_stream_saves_draft(self):
+        events = await self.read_events(await self.start_stream("GO full stream"))
+        self.assertTrue(events[0].startswith('event: token'))
+        self.assertTrue(events[-1].startswith('event: done'))
+        self.assertEqual(await BiographyDraft.objects.filter(connection=self.connection).acount(), 1)
+        self.assertFalse(views._get_generation_slots().locked())
+
+    async def test_disconnect_releases_slot_and_saves_nothing(self):
+        response = await self.start_stream("GO disconnect")
+        received = []
+
+        async def client():
+            async for chunk in response.streaming_content:
+                received.append(chunk)
+
+        # Django cancels the response task when the client goes away
+        task = asyncio.ensure_future(client())
+        while len(received) < 3:
+            await asyncio.sleep(0)
+        self.assertTrue(views._get_generation_slots().locked())
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+
+        self.assertFalse(views._get_generation_slots().locked())
+        self.assertEqual(await BiographyDraft.objects.filter(connection=self.connection).acount(), 0)
+        # The breaker only counts provider failures, not a client leaving
+        self.assertEqual(llm_gateway.get_gateway().breaker.failures, 0)
+        # With one slot, the next stream only runs if the first one gave its slot back
+        events = await self.read_events(await self.start_stream("GO after disconnect"))
+        self.assertTrue(events[-1].startswith('event: done'))
+
+    async def test_busy_slot_answers_with_error_event(self):
+        await views._get_generation_slots().acquire()
+        events = await self.read_events(await self.start_stream("GO busy"))
+        self.assertEqual(len(events), 1)
+        self.assertIn('busy', events[0])
+        views._get_generation_slots().release()
+
+    async def test_other_editor_gets_404(self):
+        other = await sync_to_async(CustomUser.objects.create_user)(
+            'other', 'other@example.com', 'pw', role='editor',
+        )
+        with self.assertRaises(views.Http404):
+            await self.post("GO", user=other)
+
+    async def test_only_the_connections_own_builder_may_stream(self):
+        other = await sync_to_async(CustomUser.objects.create_user)(
+            'other', 'other@example.com', 'pw', role='community_builder',
+        )
+        with self.assertRaises(views.Http404):
+            await self.post("GO", user=other)
+        builder = await CustomUser.objects.aget(username='builder')
+        events = await self.read_events(await self.start_stream("GO builder", user=builder))
+        self.assertTrue(events[-1].startswith('event: done'))
+
+    async def test_anonymous_users_and_gets_are_refused(self):
+        url = reverse('stream_biography', args=[self.connection.id])
+        response = await self.async_client.post(url, {'prompt': "GO"})
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response['Location'].startswith(reverse('login')))
+        await self.async_client.aforce_login(self.editor)
+        self.assertEqual((await self.async_client.get(url)).status_code, 405)
+        self.assertEqual(await BiographyDraft.objects.acount(), 0)
+
+    async def test_missing_prompt_is_a_400(self):
+        response = await self.post("")
+        self.assertEqual(response.status_code, 400)
+
+    async def test_cached_generation_is_replayed_as_one_token(self):
+        first = await self.read_events(await self.start_stream("GO cached"))
+        replay = await self.read_events(await self.start_stream("GO cached", force_fresh=False))
+        self.assertEqual(len(replay), 2)
+        text = "".join(json.loads(event.split('data: ', 1)[1])['text'] for event in first[:-1])
+        self.assertEqual(json.loads(replay[0].split('data: ', 1)[1]), {'text': text})
+        self.assertTrue(json.loads(replay[1].split('data: ', 1)[1])['cached'])
+        self.assertEqual(await BiographyDraft.objects.filter(connection=self.connection).acount(), 2)
+
+    async def test_exhausted_quota_answers_with_error_event(self):
+        with override_settings(BIOGRAPHER_TOKEN_BUDGET={'EDITOR_DAILY_QUOTA': 10}):
+            events = await self.read_events(await self.start_stream("GO over quota"))
+        self.assertEqual(len(events), 1)
+        self.assertTrue(events[0].startswith('event: error'))
+        self.assertIn('quota', events[0])
+        self.assertEqual(await BiographyDraft.objects.acount(), 0)
+
+    async def test_provider_failure_answers_with_error_event(self):
+        async def unreachable(*args, **kwargs):
+            raise connection_error()
+
+        with mock.patch.object(llm_gateway.FakeBackend, 'aopen_stream', unreachable), \
+                mock.patch.object(llm_gateway, '_backoff', return_value=0):
+            events = await self.read_events(await self.start_stream("GO failing"))
+        self.assertEqual(len(events), 1)
+        self.assertTrue(events[0].startswith('event: error'))
+        self.assertEqual(await BiographyDraft.objects.acount(), 0)
+        self.assertFalse(views._get_generation_slots().locked())
+
+
+class GenerationCacheTests(TestCase):
+    PARAMS = {'model': 'gpt-4', 'temperature': 0.8, 'max_tokens': 2048}
+    USAGE = {'prompt_tokens': 30, 'completion_tokens': 70, 'total_tokens': 100}
+
+    def key(self, prompt, **params):
+        return generation_cache.cache_key('system', prompt, **{**self.PARAMS, **params})
+
+    async def store(self, prompt):
+        await generation_cache.astore(self.key(prompt), 'gpt-4', f'text for {prompt}', self.USAGE)
+
+    def test_key_covers_every_generation_parameter(self):
+        keys = {
+            self.key('prompt'), self.key('prompt '), self.key('prompt', model='gpt-4o'),
+            self.key('prompt', temperature=0.2), self.key('prompt', max_tokens=512),
+            generation_cache.cache_key('other system', 'prompt', **self.PARAMS),
+        }
+        self.assertEqual(len(keys), 6)
+        self.assertEqual(self.key('prompt'), self.key('prompt'))
+
+    async def test_hits_are_counted(self):
+        self.assertIsNone(await generation_cache.aget_cached(self.key('a')))
+        await self.store('a')
+        entry = await generation_cache.aget_cached(self.key('a'))
+        self.assertEqual((entry.generated_text, entry.total_tokens), ('text for a', 100))
+        await generation_cache.aget_cached(self.key('a'))
+        self.assertEqual((await GenerationCacheEntry.objects.aget()).hit_count, 2)
+
+    async def test_entries_past_the_max_age_are_misses_and_pruned(self):
+        await self.store('old')
+        old = timezone.now() - timedelta(days=31)
+        await GenerationCacheEntry.objects.aupdate(created_at=old, last_used_at=old)
+        self.assertIsNone(await generation_cache.aget_cached(self.key('old')))
+        await self.store('new')
+        self.assertEqual([entry.key async for entry in GenerationCacheEntry.objects.all()], [self.key('new')])
+
+    @override_settings(BIOGRAPHER_CACHE_MAX_ENTRIES=2)
+    async def test_least_recently_used_entries_are_evicted(self):
+        for prompt in ('a', 'b'):
+            await self.store(prompt)
+        await generation_cache.aget_cached(self.key('a'))
+        await self.store('c')
+        keys = {entry.key async for entry in GenerationCacheEntry.objects.all()}
+        self.assertEqual(keys, {self.key('a'), self.key('c')})
+
+
+class DraftVersionTests(TestCase):
+
+    def setUp(self):
+        self.connection = create_connection()
+
+    def test_versions_are_sequential_per_connection(self):
+        other = create_connection(name='John Roe')
+        versions = [create_draft(self.connection, generated_text=f"text {i}").version for i in range(3)]
+        self.assertEqual(versions, [1, 2, 3])
+        self.assertEqual(create_draft(other, generated_text="other").version, 1)
+        self.connection.refresh_from_db()
+        self.assertEqual(self.connection.last_draft_version, 3)
+
+    def test_counter_lives_in_the_database(self):
+        # A stale copy of the connection still gets the next number, not a duplicate
+        stale = Connection.objects.get(pk=self.connection.pk)
+        create_draft(self.connection, generated_text="first")
+        self.assertEqual(create_draft(stale, generated_text="second").version, 2)
+
+    def test_versions_are_not_reused_after_a_delete(self):
+        create_draft(self.connection, generated_text="first")
+        latest = create_draft(self.connection, generated_text="second")
+        latest.delete()
+        self.assertEqual(create_draft(self.connection, generated_text="third").version, 3)
+
+    def test_publish_moves_the_pointer(self):
+        first = create_draft(self.connection, publish=True, generated_text="first")
+        second = create_draft(self.connection, publish=True, generated_text="second")
+        self.connection.refresh_from_db()
+        self.assertEqual(self.connection.published_draft_id, second.pk)
+        self.assertEqual(
+            list(BiographyDraft.objects.filter(is_published=True).values_list('pk', flat=True)), [second.pk],
+        )
+        first.refresh_from_db()
+        self.assertFalse(first.is_published)
+
+
+class DraftStorageTests(SimpleTestCase):
+
+    def test_delta_round_trip_keeps_whitespace(self):
+        old = "First line.\n\nSecond  line with  double spaces.\t"
+        new = "First line, edited.\n\nSecond  line with  double spaces.\t And more."
+        self.assertEqual(draft_storage.decode(draft_storage.encode_delta(old, new), old), new)
+
+    def test_encode_picks_the_smaller_form(self):
+        old = "word " * 200
+        self.assertFalse(draft_storage.is_full(draft_storage.encode(old, old + "tail")))
+        self.assertTrue(draft_storage.is_full(draft_storage.encode(old, "entirely different")))
+        self.assertTrue(draft_storage.is_full(draft_storage.encode(None, old)))
+
+    def test_delta_needs_the_previous_text(self):
+        with self.assertRaises(ValueError):
+            draft_storage.decode(draft_storage.encode_delta("a b", "a c"))
+
+
+@override_settings(BIOGRAPHER_DRAFT_SNAPSHOT_INTERVAL=5)
+class DraftDeltaChainTests(TestCase):
+
+    def setUp(self):
+        self.connection = create_connection()
+        self.addCleanup(cache.clear)
+
+    def create_versions(self, count):
+        expected = {}
+        text = "Jane Doe leads a global team.\n\nShe started as an engineer."
+        for i in range(1, count + 1):
+            # Mostly small edits, so deltas win; every seventh one is a rewrite
+            text = f"Rewrite {i}: a different story." if i % 7 == 0 else f"{text} Milestone {i}."
+            prompt = f"GO\nVersion {i}"
+            create_draft(self.connection, prompt=prompt, generated_text=text)
+            expected[i] = (prompt, text)
+        return expected
+
+    def test_every_version_rebuilds_exactly(self):
+        expected = self.create_versions(25)
+        cache.clear()
+        drafts = BiographyDraft.objects.filter(connection=self.connection).order_by('version')
+        self.assertEqual({draft.version: draft.read_texts(use_cache=False) for draft in drafts}, expected)
+        # Through the cached properties as well, in reverse so no ancestor is cached first
+        cache.clear()
+        for draft in BiographyDraft.objects.filter(connection=self.connection).order_by('-version'):
+            self.assertEqual((draft.prompt, draft.generated_text), expected[draft.version])
+
+    def test_chains_restart_at_the_snapshot_interval(self):
+        self.create_versions(12)
+        rows = BiographyDraft.objects.filter(connection=self.connection).order_by('version')
+        self.assertEqual([draft.chain_length for draft in rows], [0, 1, 2, 3, 4] * 2 + [0, 1])
+        for draft in rows:
+            if draft.chain_length == 0:
+                self.assertIsNone(draft.base_id)
+                self.assertTrue(draft_storage.is_full(draft.text_data))
+            else:
+                self.assertEqual(draft.base.version, draft.version - 1)
+
+    def test_small_edits_are_stored_as_deltas(self):
+        self.create_versions(4)
+        rows = BiographyDraft.objects.filter(connection=self.connection, chain_length__gt=0)
+        self.assertTrue(all(not draft_storage.is_full(draft.text_data) for draft in rows))
+
+
+    def test_deleting_a_base_resnapshots_its_dependent(self):
+        expected = self.create_versions(4)
+        BiographyDraft.objects.get(connection=self.connection, version=2).delete()
+        cache.clear()
+        dependent = BiographyDraft.objects.get(connection=self.connection, version=3)
+        self.assertIsNone(dependent.base_id)
+        self.assertTrue(draft_storage.is_full(dependent.text_data))
+        for draft in BiographyDraft.objects.filter(connection=self.connection):
+            self.assertEqual(draft.read_texts(use_cache=False), expected[draft.version])
+
+    def test_bulk_delete_keeps_the_survivors_readable(self):
+        expected = self.create_versions(6)
+        BiographyDraft.objects.filter(connection=self.connection, version__in=[1, 3, 4]).delete()
+        cache.clear()
+        survivors = BiographyDraft.objects.filter(connection=self.connection).order_by('version')
+        self.assertEqual([draft.version for draft in survivors], [2, 5, 6])
+        for draft in survivors:
+            self.assertEqual(draft.read_texts(use_cache=False), expected[draft.version])
+
+    def test_deleting_the_connection_deletes_whole_chains(self):
+        self.create_versions(4)
+        self.connection.delete()
+        self.assertFalse(BiographyDraft.objects.exists())
+
+
+@override_settings(BIOGRAPHER_DRAFT_SNAPSHOT_INTERVAL=5)
+class FinetuneExportTests(TestCase):
+
+    def setUp(self):
+        self.connection = create_connection()
+        self.addCleanup(cache.clear)
+
+    def create_versions(self, connection, count, ready=True):
+        texts = []
+        text = f"{connection.full_name} leads a global team."
+        for i in range(1, count + 1):
+            text = f"{text} Milestone {i}."
+            create_draft(connection, prompt=f"GO {i}", generated_text=text, is_finetune_ready=ready)
+            texts.append(text)
+        return texts
+
+    def export(self, since=None, until=None, **kwargs):
+        since = since or {'draft': 0, 'sample': 0}
+        lines = finetune_export.iter_jsonl(since, until or finetune_export.current_watermark(), **kwargs)
+        return [json.loads(line)['messages'][2]['content'] for _, line in lines]
+
+    def test_rebuilds_every_ready_draft_in_constant_queries(self):
+        expected = self.create_versions(self.connection, 12) + self.create_versions(create_connection(name='John Roe'), 7)
+        cache.clear()
+        until = finetune_export.current_watermark()
+        # Ready drafts, their chains, and the samples: independent of how many rows there are
+        with self.assertNumQueries(3):
+            exported = self.export(until=until)
+        self.assertEqual(sorted(exported), sorted(expected))
+
+    def test_rebuilds_drafts_whose_ancestors_are_not_ready(self):
+        texts = self.create_versions(self.connection, 4, ready=False)
+        texts += self.create_versions(self.connection, 1)
+        # Version 5 is a delta on version 4, which is left out of the export
+        self.assertEqual(BiographyDraft.objects.get(version=5).chain_length, 4)
+        self.assertEqual(self.export(), [texts[-1]])
+
+    def test_since_last_exports_only_new_rows(self):
+        first = self.create_versions(self.connection, 3)
+        FineTuningSample.objects.create(connection=self.connection, input_data_json="GO", final_output="Sample one.")
+        self.assertEqual(self.export(), first + ["Sample one."])
+        finetune_export.record_export(None, finetune_export.current_watermark(), 4)
+
+        more = self.create_versions(self.connection, 2)
+        FineTuningSample.objects.create(connection=self.connection, input_data_json="GO", final_output="Sample two.")
+        self.assertEqual(self.export(finetune_export.last_watermark()), more + ["Sample two."])
+
+    def test_watermark_round_trips(self):
+        watermark = {'draft': 12, 'sample': 3}
+        self.assertEqual(finetune_export.parse_watermark(finetune_export.format_watermark(watermark)), watermark)
+        self.assertEqual(finetune_export.parse_watermark(""), {'draft': 0, 'sample': 0})
+        with self.assertRaises(ValueError):
+            finetune_export.parse_watermark("bogus=1")
+
+    def test_dedup_covers_one_export(self):
+        for _ in range(2):
+            FineTuningSample.objects.create(connection=self.connection, input_data_json="GO", final_output="Same.")
+        self.assertEqual(self.export(), ["Same."])
+        self.assertEqual(self.export(dedupe=False), ["Same.", "Same."])
+
+    async def test_download_is_staff_only(self):
+        await sync_to_async(self.create_versions)(self.connection, 2)
+        url = reverse('export_finetune_data')
+        editor = await sync_to_async(CustomUser.objects.create_user)('editor', 'editor@example.com', 'pw', role='editor')
+        await self.async_client.aforce_login(editor)
+        self.assertEqual((await self.async_client.get(url)).status_code, 403)
+
+        editor.is_staff = True
+        await editor.asave()
+        response = await self.async_client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Export-Watermark'], finetune_export.format_watermark(
+            await sync_to_async(finetune_export.current_watermark)()
+        ))
+        lines = b''.join([chunk async for chunk in response.streaming_content]).splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertEqual((await self.async_client.get(url, {'since': 'bogus=1'})).status_code, 400)
+
+        await self.async_client.alogout()
+        self.assertEqual((await self.async_client.get(url)).status_code, 302)
+
+
+class DraftHistoryAccessTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.editor = CustomUser.objects.create_user('editor', 'editor@example.com', 'pw', role='editor')
+        cls.outsider = CustomUser.objects.create_user('outsider', 'outsider@example.com', 'pw', role='editor')
+        cls.connection = create_connection(editor=cls.editor)
+        create_draft(cls.connection, prompt="GO", generated_text="Jane leads a team.")
+        create_draft(cls.connection, prompt="GO again", generated_text="Jane leads a global team.")
+
+    def setUp(self):
+        self.addCleanup(cache.clear)
+
+    def urls(self):
+        connection_id = self.connection.id
+        return [
+            reverse('draft_history', args=[connection_id]),
+            reverse('draft_version', args=[connection_id, 2]),
+            reverse('draft_diff', args=[connection_id, 1, 2]),
+        ]
+
+    def test_assigned_editor_reads_history(self):
+        self.client.force_login(self.editor)
+        for url in self.urls():
+            self.assertEqual(self.client.get(url).status_code, 200, url)
+        history = self.client.get(reverse('draft_history', args=[self.connection.id])).json()
+        self.assertEqual([v['version'] for v in history['versions']], [2, 1])
+        diff = self.client.get(reverse('draft_diff', args=[self.connection.id, 1, 2])).json()
+        self.assertIn(['insert', 'global '], diff['segments'])
+
+    def test_other_editor_gets_404(self):
+        self.client.force_login(self.outsider)
+        for url in self.urls():
+            self.assertEqual(self.client.get(url).status_code, 404, url)
+
+    def test_diff_is_not_cached_for_an_outsider(self):
+        self.client.force_login(self.outsider)
+        self.client.get(reverse('draft_diff', args=[self.connection.id, 1, 2]))
+        self.assertIsNone(cache.get(f"biographer:draft-diff:{self.connection.id}:1:2"))
+
+    def test_anonymous_is_redirected_to_login(self):
+        for url in self.urls():
+            self.assertEqual(self.client.get(url).status_code, 302, url)
+
+
+class ConnectionContextTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.editor = CustomUser.objects.create_user('editor', 'editor@example.com', 'pw', role='editor')
+        cls.connection = create_connection(editor=cls.editor)
+
+    def setUp(self):
+        self.addCleanup(cache.clear)
+
+    def titles(self):
+        return [section['title'] for section in build_context(self.connection.id)['sections']]
+
+    def test_assigned_editor_gets_context(self):
+        self.client.force_login(self.editor)
+        response = self.client.get(reverse('connection_context', args=[self.connection.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['sections'][0]['title'], 'Profile')
+
+    def test_other_editor_gets_404(self):
+        outsider = CustomUser.objects.create_user('outsider', 'outsider@example.com', 'pw', role='editor')
+        self.client.force_login(outsider)
+        response = self.client.get(reverse('connection_context', args=[self.connection.id]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_resume_appears_once_extraction_finishes(self):
+        digest = 'a' * 64
+        Connection.objects.filter(pk=self.connection.pk).update(profile_pdf_sha256=digest)
+        extraction = ProfileText.objects.create(content_hash=digest, status='processing')
+        self.assertEqual(self.titles(), ['Profile'])
+
+        extraction.status = 'ready'
+        extraction.sections = [{'title': 'Experience', 'content': 'Chief executive since 2019.'}]
+        extraction.extracted_at = timezone.now()
+        extraction.save()
+        self.assertEqual(self.titles(), ['Profile', 'Resume – Experience'])
+
+
+@override_settings(BIOGRAPHER_LLM=FAKE_LLM)
+class GenerationJobTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.editor = CustomUser.objects.create_user('editor', 'editor@example.com', 'pw', role='editor')
+        cls.manager = CustomUser.objects.create_user('manager', 'manager@example.com', 'pw', role='project_manager')
+        cls.first = create_connection(editor=cls.editor)
+        cls.second = create_connection(editor=cls.editor, name='John Roe')
+
+    def setUp(self):
+        llm_gateway.reset_gateway()
+        self.addCleanup(llm_gateway.reset_gateway)
+        self.addCleanup(cache.clear)
+
+    def enqueue(self, user, editor_id=None):
+        self.client.force_login(user)
+        return self.client.post(reverse('enqueue_editor_drafts', args=[editor_id or self.editor.id]))
+
+    def job(self, connection, **fields):
+        return GenerationJob.objects.create(connection=connection, requested_by=self.manager, editor=self.editor, **fields)
+
+    def run_job(self, job):
+        worker = generation_jobs.GenerationWorker(concurrency=1, tokens_per_minute=10 ** 6)
+        async_to_sync(worker.run_job)(generation_jobs.claim_jobs(1)[0])
+        job.refresh_from_db()
+
+    def test_only_managers_may_enqueue(self):
+        builder = CustomUser.objects.get(username='builder')
+        for user in (self.editor, builder):
+            self.assertEqual(self.enqueue(user).status_code, 403)
+        self.assertFalse(GenerationJob.objects.exists())
+        self.assertEqual(self.enqueue(self.manager, editor_id=builder.id).status_code, 404)
+        self.assertEqual(self.client.get(reverse('enqueue_editor_drafts', args=[self.editor.id])).status_code, 405)
+
+        admin = CustomUser.objects.create_user('admin', 'admin@example.com', 'pw', role='super_admin')
+        self.assertEqual(self.enqueue(admin).json(), {'queued': 2})
+
+    def test_enqueue_skips_drafted_and_already_queued_connections(self):
+        create_draft(self.first, author=self.editor, title='Draft', prompt='p', generated_text='text')
+        self.assertEqual(self.enqueue(self.manager).json(), {'queued': 1})
+        self.assertEqual(self.enqueue(self.manager).json(), {'queued': 0})
+        self.assertEqual(list(GenerationJob.objects.values_list('connection', 'status')), [(self.second.id, 'queued')])
+
+    def test_claim_takes_due_jobs_once(self):
+        due = self.job(self.first)
+        self.job(self.second, run_after=timezone.now() + timedelta(minutes=5))
+        self.assertEqual([job.pk for job in generation_jobs.claim_jobs(5)], [due.pk])
+        self.assertEqual(generation_jobs.claim_jobs(5), [])
+        due.refresh_from_db()
+        self.assertEqual(due.status, 'running')
+
+    def test_requeue_stale_settles_jobs_that_wrote_their_draft(self):
+        long_ago = timezone.now() - timedelta(hours=1)
+        draft = create_draft(self.first, author=self.editor, title='Draft', prompt='p', generated_text='text')
+        drafted = self.job(self.first, status='running', started_at=long_ago, draft=draft)
+        lost = self.job(self.second, status='running', started_at=long_ago)
+        third = create_connection(editor=self.editor, name='Jim Poe')
+        kept = self.job(third, status='running', started_at=long_ago)
+
+        self.assertEqual(generation_jobs.requeue_stale(60, exclude_ids=[kept.pk]), 1)
+        statuses = dict(GenerationJob.objects.values_list('pk', 'status'))
+        self.assertEqual(statuses, {drafted.pk: 'succeeded', lost.pk: 'queued', kept.pk: 'running'})
+        self.assertEqual(generation_jobs.requeue_stale(60 * 60 * 2), 0)
+
+    def test_worker_writes_the_draft_and_records_usage(self):
+        job = self.job(self.first)
+        self.run_job(job)
+        self.assertEqual((job.status, job.attempts, job.last_error), ('succeeded', 1, ''))
+        self.assertEqual(job.draft.connection, self.first)
+        self.assertIn('GO', job.prompt)
+        usage = TokenUsage.objects.get()
+        self.assertEqual((usage.source, usage.user, usage.draft), ('batch', self.editor, job.draft))
+
+    def test_transient_failures_are_retried_then_fail(self):
+        job = self.job(self.first, max_attempts=2)
+        with mock.patch.object(llm_gateway, 'achat', side_effect=LLMError('provider down')):
+            self.run_job(job)
+            self.assertEqual((job.status, job.attempts), ('queued', 1))
+            self.assertGreater(job.run_after, job.started_at)
+            GenerationJob.objects.filter(pk=job.pk).update(run_after=timezone.now())
+            self.run_job(job)
+        self.assertEqual((job.status, job.attempts, job.last_error), ('failed', 2, 'provider down'))
+        self.assertFalse(BiographyDraft.objects.exists())
+
+    def test_exhausted_quota_postpones_to_tomorrow(self):
+        job = self.job(self.first)
+        with override_settings(BIOGRAPHER_TOKEN_BUDGET={'EDITOR_DAILY_QUOTA': 10}):
+            self.run_job(job)
+        self.assertEqual((job.status, job.attempts), ('queued', 0))
+        self.assertEqual(timezone.localtime(job.run_after).date(), timezone.localdate() + timedelta(days=1))
+        self.assertIn('quota', job.last_error)
+
+
+class ProfileTextTests(TestCase):
+
+    def create(self, status, started_minutes_ago=None, digest='a'):
+        started_at = timezone.now() - timedelta(minutes=started_minutes_ago) if started_minutes_ago is not None else None
+        return ProfileText.objects.create(content_hash=digest * 64, status=status, started_at=started_at)
+
+    def test_requeues_only_stale_processing_rows(self):
+        stale = self.create('processing', started_minutes_ago=60, digest='a')
+        legacy = self.create('processing', digest='b')
+        fresh = self.create('processing', started_minutes_ago=1, digest='c')
+        ready = self.create('ready', started_minutes_ago=60, digest='d')
+        self.assertEqual(profile_text.requeue_stale(10 * 60), 2)
+        statuses = dict(ProfileText.objects.values_list('pk', 'status'))
+        self.assertEqual(
+            [statuses[row.pk] for row in (stale, legacy, fresh, ready)], ['pending', 'pending', 'processing', 'ready'],
+        )
+
+    def test_claim_records_the_start_and_settles_the_row(self):
+        row = self.create('pending')
+        # No connection holds the PDF, so extraction fails rather than hanging in 'processing'
+        self.assertEqual(profile_text.extract_pending(), 1)
+        row.refresh_from_db()
+        self.assertEqual(row.status, 'failed')
+        self.assertIsNotNone(row.started_at)
+        self.assertEqual(profile_text.extract_pending(), 0)
+
+    def test_sections_split_on_headings(self):
+        text = profile_text.normalize("Jane Doe\nPage 1 of 2\nExperience\nChief exec-\nutive officer\nEducation\nMIT")
+        self.assertEqual(profile_text.split_sections(text), [
+            {'title': 'Profile', 'content': 'Jane Doe'},
+            {'title': 'Experience', 'content': 'Chief executive officer'},
+            {'title': 'Education', 'content': 'MIT'},
+        ])
+
+
+class LoadTestCommandTests(TransactionTestCase):
+    # The command runs its own event loop, so the views see only committed rows
+
+    def setUp(self):
+        self.editor = CustomUser.objects.create_user('editor', 'editor@example.com', 'pw', role='editor')
+        self.connection = create_connection(editor=self.editor)
+        self.addCleanup(llm_gateway.reset_gateway)
+        self.addCleanup(cache.clear)
+
+    def run_command(self, *args):
+        out = io.StringIO()
+        with override_settings(BIOGRAPHER_LLM=FAKE_LLM):
+            call_command(
+                'loadtest_generation', self.connection.id, '--generations=2', '--fake',
+                '--fake-latency=0', '--probe-interval=0.5', *args, stdout=out,
+            )
+        return out.getvalue()
+
+    def test_generates_as_the_assigned_editor(self):
+        self.assertIn("statuses {200: 2}", self.run_command())
+        self.assertEqual(BiographyDraft.objects.filter(connection=self.connection, author=self.editor).count(), 2)
+
+    def test_user_without_access_is_refused(self):
+        CustomUser.objects.create_user('outsider', 'outsider@example.com', 'pw', role='editor')
+        with self.assertRaisesMessage(CommandError, "no access"):
+            self.run_command('--user=outsider')
+
+    def test_non_200_responses_fail_the_run(self):
+        with mock.patch.object(views, 'acheck_quota', side_effect=views.QuotaExceeded("quota")):
+            with self.assertRaisesMessage(CommandError, "2 of 2 generations did not return 200"):
+                self.run_command()
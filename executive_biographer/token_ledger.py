@@ -0,0 +1,155 @@
+#
+# File: token_ledger.py
+# Purpose: Estimate a prompt's size locally before calling the model, enforce daily
+#          per-editor and org-wide token quotas, and record what each generation spent.
+#
+
+from django.conf import settings
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import DailyTokenUsage, TokenUsage
+
+try:
+    import tiktoken
+except ImportError:  # optional: fall back to the ~4 characters per token rule of thumb
+    tiktoken = None
+
+DEFAULTS = {
+    'CONTEXT_WINDOW': 8192,          # model context in tokens (prompt + completion)
+    'OVERSIZED_PROMPTS': 'trim',     # 'trim' to fit the context window, or 'reject'
+    'EDITOR_DAILY_QUOTA': None,      # tokens per editor per day; None = unlimited (soft, see acheck_quota)
+    'ORG_DAILY_QUOTA': None,         # tokens across all editors per day; None = unlimited (soft, see acheck_quota)
+}
+
+MESSAGE_OVERHEAD = 12  # chat formatting tokens around the system and user messages
+TRIM_NOTE = "\n\n[...content trimmed to fit...]\n\n"
+
+
+class QuotaExceeded(Exception):
+    pass
+
+
+class PromptTooLarge(Exception):
+    pass
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'BIOGRAPHER_TOKEN_BUDGET', {})}
+
+
+# -------------------- Pre-flight estimation --------------------
+
+def _encoding(model):
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding('cl100k_base')
+
+
+def estimate_tokens(text, model="gpt-4"):
+    if tiktoken is None:
+        return (len(text) + 3) // 4
+    return len(_encoding(model).encode(text))
+
+
+def _truncate(text, tokens, model):
+    if tiktoken is None:
+        return text[:tokens * 4]
+    encoding = _encoding(model)
+    return encoding.decode(encoding.encode(text)[:tokens])
+
+
+def fit_prompt(system_prompt, prompt, model, max_tokens):
+    """
+    Return ``(prompt, estimated_prompt_tokens, trimmed)`` with the prompt sized so that
+    it plus ``max_tokens`` of completion fits the context window.
+
+    Oversized prompts lose the end of their content but keep the final line (the
+    "GO" instruction); with OVERSIZED_PROMPTS = 'reject' they raise PromptTooLarge.
+    """
+    config = get_config()
+    budget = config['CONTEXT_WINDOW'] - max_tokens - MESSAGE_OVERHEAD - estimate_tokens(system_prompt, model)
+    used = estimate_tokens(prompt, model)
+    if used <= budget:
+        return prompt, used + MESSAGE_OVERHEAD + estimate_tokens(system_prompt, model), False
+
+    body, _, last_line = prompt.rstrip().rpartition("\n")
+    room = budget - estimate_tokens(TRIM_NOTE + last_line, model)
+    if config['OVERSIZED_PROMPTS'] == 'reject' or room <= 0:
+        raise PromptTooLarge(
+            f"The prompt is about {used} tokens; at most {budget} fit alongside a {max_tokens}-token biography."
+        )
+    trimmed = _truncate(body, room, model) + TRIM_NOTE + last_line
+    return trimmed, budget + MESSAGE_OVERHEAD + estimate_tokens(system_prompt, model), True
+
+
+# -------------------- Quotas --------------------
+
+async def acheck_quota(user, estimated_tokens):
+    """
+    Raise QuotaExceeded if spending ``estimated_tokens`` now would pass a daily quota.
+
+    Estimates come from tiktoken (see requirements.txt); without it estimate_tokens falls
+    back to about four characters per token.
+
+    The quotas are soft: this reads what has been recorded so far and reserves nothing,
+    so generations already in flight aren't counted. Concurrent calls can each pass and
+    together overshoot by up to one call's worth per generation slot (web and worker).
+    """
+    config = get_config()
+    today = timezone.localdate()
+
+    if config['EDITOR_DAILY_QUOTA'] is not None and user is not None:
+        spent = await DailyTokenUsage.objects.filter(date=today, user=user).values_list(
+            'tokens_spent', flat=True
+        ).afirst() or 0
+        if spent + estimated_tokens > config['EDITOR_DAILY_QUOTA']:
+            raise QuotaExceeded(
+                f"Your daily token quota is used up ({spent} of {config['EDITOR_DAILY_QUOTA']}). It resets at midnight."
+            )
+
+    if config['ORG_DAILY_QUOTA'] is not None:
+        totals = await DailyTokenUsage.objects.filter(date=today).aaggregate(spent=Sum('tokens_spent'))
+        spent = totals['spent'] or 0
+        if spent + estimated_tokens > config['ORG_DAILY_QUOTA']:
+            raise QuotaExceeded("The team's daily token quota is used up. It resets at midnight.")
+
+
+# -------------------- Recording --------------------
+
+async def arecord(user, connection, draft, source, model, usage, cached=False):
+    """Append a ledger entry and fold it into today's roll-up for ``user``."""
+    total = usage.get("total_tokens", 0)
+    await TokenUsage.objects.acreate(
+        user=user, connection=connection, draft=draft, source=source, model=model,
+        input_tokens=usage.get("prompt_tokens", 0),
+        output_tokens=usage.get("completion_tokens", 0),
+        total_tokens=total,
+        is_cached=cached,
+    )
+
+    daily, _ = await DailyTokenUsage.objects.aget_or_create(date=timezone.localdate(), user=user)
+    if cached:
+        changes = {'cache_hits': F('cache_hits') + 1, 'tokens_saved': F('tokens_saved') + total}
+    else:
+        changes = {
+            'input_tokens': F('input_tokens') + usage.get("prompt_tokens", 0),
+            'output_tokens': F('output_tokens') + usage.get("completion_tokens", 0),
+            'tokens_spent': F('tokens_spent') + total,
+        }
+    await DailyTokenUsage.objects.filter(pk=daily.pk).aupdate(calls=F('calls') + 1, **changes)
+
+
+def fold_user_usage(user):
+    """
+    Move ``user``'s daily roll-ups into each day's no-user row before the user is deleted,
+    so org-wide totals keep counting them. Setting the rows' user to NULL instead would
+    collide with that row (unique_daily_token_usage_no_user).
+    """
+    for row in DailyTokenUsage.objects.filter(user=user):
+        keeper, _ = DailyTokenUsage.objects.get_or_create(date=row.date, user=None)
+        DailyTokenUsage.objects.filter(pk=keeper.pk).update(
+            **{field: F(field) + getattr(row, field) for field in DailyTokenUsage.COUNTERS}
+        )
+        row.delete()
@@ -4,6 +4,13 @@ from . import views
 urlpatterns = [
     path('', views.biographer_dashboard, name='biographer_dashboard'),                     # Optional dashboard homepage
     path('<int:connection_id>/', views.generate_biography, name='generate_biography'),      # Biography editor
+    path('<int:connection_id>/stream/', views.stream_biography, name='stream_biography'),  # Token stream (SSE)
+    path('<int:connection_id>/context/', views.connection_context, name='connection_context'),  # Prompt context
+    path('<int:connection_id>/history/', views.draft_history, name='draft_history'),       # Version list
+    path('<int:connection_id>/versions/<int:version>/', views.draft_version, name='draft_version'),
+    path('<int:connection_id>/diff/<int:from_version>/<int:to_version>/', views.draft_diff, name='draft_diff'),
     path('insights/', views.editor_insights, name='editor_insights'),                       # Editor performance chart
+    path('jobs/enqueue/<int:editor_id>/', views.enqueue_editor_drafts, name='enqueue_editor_drafts'),  # Batch drafts
+    path('finetune/export/', views.export_finetune_data, name='export_finetune_data'),     # Training JSONL (staff)
     path('test-api-key/', views.test_openai_key, name='test_openai_key'),                  # API Key test
 ]
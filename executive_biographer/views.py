@@ -1,13 +1,29 @@
 
 from django.shortcuts import render, get_object_or_404
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, Http404, StreamingHttpResponse
+from django.views.decorators.http import require_POST
 from django.conf import settings
+from django.core.cache import cache
 from django.contrib.auth.decorators import login_required
-from django.db.models import Count, Avg
+from django.db.models import Count, Max, Sum
 from django.contrib.auth import get_user_model
+from django.utils import timezone
+from config.db_router import use_replica
+from lead_management.media_access import connection_access_q
 from lead_management.models import Connection
-from .models import BiographyDraft
-import openai
+from .models import BiographyDraft, DailyTokenUsage, GenerationJob
+from . import draft_storage, finetune_export, llm_gateway
+from .generation_cache import cache_key, aget_cached, astore
+from .context_builder import build_context
+from .drafts import acreate_draft
+from .generation_jobs import enqueue_for_editor
+from .profile_text import afor_connection
+from .token_ledger import get_config as get_token_budget, fit_prompt, acheck_quota, arecord, PromptTooLarge, QuotaExceeded
+from asgiref.sync import sync_to_async
+from contextlib import aclosing
+from difflib import SequenceMatcher
+import asyncio
+import json
 
 # ✅ System Prompt for the Executive Biographer
 EXECUTIVE_BIOGRAPHER_PROMPT = """You are an executive biographer for Executives Diary Magazine. Your job is to write compelling, professional biographies based on executive resumes, LinkedIn content, and quotes. Use a polished, narrative-driven U.S. English style.
@@ -26,32 +42,64 @@ Use bold italics (***) for quotes, and avoid clichés or exaggerated phrasing. B
 
 If the user asks who you are or what platform you’re running on, never reveal that you are ChatGPT, OpenAI, or a language model. Instead, say: “I am the Executive Biographer assistant, designed and developed by the Executives Diary editorial team to help craft professional biographies.”"""
 
+# ✅ Model settings for biography generation (part of the response cache key)
+GENERATION_PARAMS = {"model": "gpt-4", "temperature": 0.8, "max_tokens": 2048}
+
 def test_openai_key(request):
     return HttpResponse(f"API KEY: {settings.OPENAI_API_KEY}")
 
 @login_required
 def biographer_dashboard(request):
-    connections = Connection.objects.filter(assigned_editor=request.user)
+    # Status comes from the counter and published pointer on Connection, not a per-row draft query
+    connections = Connection.objects.filter(assigned_editor=request.user).annotate(
+        last_updated=Max('biography_drafts__created_at')
+    )
     connection_list = []
     for conn in connections:
-        latest_draft = conn.biography_drafts.order_by('-created_at').first()
         status = "Not Started"
-        if latest_draft:
-            status = "Finalized" if latest_draft.is_published else "Drafted"
+        if conn.last_draft_version:
+            status = "Finalized" if conn.published_draft_id else "Drafted"
         connection_list.append({
             "id": conn.id,
             "name": conn.full_name,
             "location": conn.location,
             "status": status,
-            "last_updated": latest_draft.created_at if latest_draft else None,
+            "last_updated": conn.last_updated,
         })
     return render(request, "executive_biographer/dashboard.html", {
         "connections": connection_list
     })
 
-def generate_biography(request, connection_id):
-    connection = get_object_or_404(Connection, id=connection_id)
-    user = request.user if request.user.is_authenticated else None
+# ✅ Limits in-flight model calls per worker process (created lazily inside the running event loop)
+_generation_slots = None
+
+
+def _get_generation_slots():
+    global _generation_slots
+    if _generation_slots is None:
+        _generation_slots = asyncio.Semaphore(settings.BIOGRAPHER_MAX_CONCURRENT_GENERATIONS)
+    return _generation_slots
+
+
+def _get_connection(user, connection_id):
+    """The connection, if ``user`` may work on it; 404 otherwise, as for a missing one."""
+    return get_object_or_404(Connection.objects.filter(connection_access_q(user)), id=connection_id)
+
+
+async def _aget_connection(user, connection_id):
+    """The connection, if ``user`` may work on it; 404 otherwise, as for a missing one."""
+    access = await sync_to_async(connection_access_q)(user)
+    try:
+        return await Connection.objects.filter(access).select_related('outreach_lead').aget(id=connection_id)
+    except Connection.DoesNotExist:
+        raise Http404("Connection not found.")
+
+
+@login_required
+async def generate_biography(request, connection_id):
+    # Resolve the user here so templates reading request.user don't query from the event loop
+    request.user = user = await request.auser()
+    connection = await _aget_connection(user, connection_id)
     if request.method == "POST":
         prompt = request.POST.get("prompt")
         content = request.POST.get("content")
@@ -59,82 +107,237 @@ def generate_biography(request, connection_id):
         mark_final = request.POST.get("mark_final")
 
         if save_only == '1' and content:
-            BiographyDraft.objects.create(
-                connection=connection,
+            await acreate_draft(
+                connection,
                 author=user,
                 title="Manual Draft",
                 prompt=prompt or "N/A",
-                generated_text=content,
-                version=BiographyDraft.objects.filter(connection=connection).count() + 1
+                generated_text=content
             )
             return JsonResponse({"message": "Draft saved successfully."})
 
         if mark_final == '1' and content:
-            BiographyDraft.objects.filter(connection=connection).update(is_published=False)
-            BiographyDraft.objects.create(
-                connection=connection,
+            await acreate_draft(
+                connection,
+                publish=True,
                 author=user,
                 title="Final Biography",
                 prompt=prompt or "N/A",
                 generated_text=content,
-                is_published=True,
-                is_finetune_ready=True,
-                version=BiographyDraft.objects.filter(connection=connection).count() + 1
+                is_finetune_ready=True
             )
             return JsonResponse({"message": "Final version saved and marked for publishing."})
 
         if not prompt:
             return JsonResponse({"error": "No prompt provided."}, status=400)
 
+        # Size the prompt locally so an oversized one never costs a round trip
         try:
-            response = openai.ChatCompletion.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": EXECUTIVE_BIOGRAPHER_PROMPT},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=2048,
-                temperature=0.8
-            )
-            generated_text = response['choices'][0]['message']['content']
-            usage = response.get("usage", {})
-            BiographyDraft.objects.create(
-                connection=connection,
+            prompt, estimate, trimmed = _fit_prompt(prompt)
+        except PromptTooLarge as e:
+            return JsonResponse({"error": str(e)}, status=413)
+
+        # Identical requests are answered from the response cache unless a fresh take is asked for
+        key = cache_key(EXECUTIVE_BIOGRAPHER_PROMPT, prompt, **GENERATION_PARAMS)
+        cached = None if request.POST.get("force_fresh") == '1' else await aget_cached(key)
+        if cached is not None:
+            await _acreate_cached_draft(connection, user, prompt, cached, source='interactive')
+            return JsonResponse({"generated_text": cached.generated_text, "cached": True, "trimmed": trimmed})
+
+        try:
+            await acheck_quota(user, estimate + GENERATION_PARAMS["max_tokens"])
+        except QuotaExceeded as e:
+            return JsonResponse({"error": str(e)}, status=429)
+
+        slots = _get_generation_slots()
+        try:
+            await asyncio.wait_for(slots.acquire(), timeout=settings.BIOGRAPHER_GENERATION_QUEUE_TIMEOUT)
+        except asyncio.TimeoutError:
+            return JsonResponse({"error": "The biographer is busy, please try again shortly."}, status=429)
+
+        try:
+            generated_text, usage = await llm_gateway.achat(EXECUTIVE_BIOGRAPHER_PROMPT, prompt, **GENERATION_PARAMS)
+            await astore(key, GENERATION_PARAMS["model"], generated_text, usage)
+            draft = await acreate_draft(
+                connection,
                 author=user,
                 title="Untitled Draft",
                 prompt=prompt,
                 generated_text=generated_text,
                 input_tokens=usage.get("prompt_tokens", 0),
                 output_tokens=usage.get("completion_tokens", 0),
-                total_tokens=usage.get("total_tokens", 0),
-                version=BiographyDraft.objects.filter(connection=connection).count() + 1
+                total_tokens=usage.get("total_tokens", 0)
             )
-            return JsonResponse({"generated_text": generated_text})
+            await arecord(user, connection, draft, 'interactive', GENERATION_PARAMS["model"], usage)
+            return JsonResponse({"generated_text": generated_text, "trimmed": trimmed})
+        except llm_gateway.LLMUnavailable as e:
+            return JsonResponse({"error": str(e)}, status=503)
         except Exception as e:
             return JsonResponse({"error": str(e)}, status=500)
-    return render(request, "executive_biographer/generate.html", {"connection": connection})
+        finally:
+            slots.release()
+    return render(request, "executive_biographer/generate.html", {
+        "connection": connection,
+        "profile_text": await afor_connection(connection),  # parsed once per distinct PDF
+    })
+
+def _fit_prompt(prompt):
+    return fit_prompt(
+        EXECUTIVE_BIOGRAPHER_PROMPT, prompt, GENERATION_PARAMS["model"], GENERATION_PARAMS["max_tokens"]
+    )
+
+async def _acreate_cached_draft(connection, user, prompt, entry, source):
+    draft = await acreate_draft(
+        connection,
+        author=user,
+        title="Untitled Draft",
+        prompt=prompt,
+        generated_text=entry.generated_text,
+        input_tokens=entry.input_tokens,
+        output_tokens=entry.output_tokens,
+        total_tokens=entry.total_tokens,
+        is_cached=True
+    )
+    await arecord(user, connection, draft, source, entry.model, {
+        "prompt_tokens": entry.input_tokens,
+        "completion_tokens": entry.output_tokens,
+        "total_tokens": entry.total_tokens,
+    }, cached=True)
+    return draft
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
 
+@require_POST
 @login_required
+async def stream_biography(request, connection_id):
+    """Relay model tokens to the browser as Server-Sent Events, then save the finished draft."""
+    user = await request.auser()
+    connection = await _aget_connection(user, connection_id)
+    prompt = request.POST.get("prompt")
+    if not prompt:
+        return JsonResponse({"error": "No prompt provided."}, status=400)
+    try:
+        prompt, estimate, trimmed = _fit_prompt(prompt)
+    except PromptTooLarge as e:
+        return JsonResponse({"error": str(e)}, status=413)
+    key = cache_key(EXECUTIVE_BIOGRAPHER_PROMPT, prompt, **GENERATION_PARAMS)
+    force_fresh = request.POST.get("force_fresh") == '1'
+
+    async def events():
+        cached = None if force_fresh else await aget_cached(key)
+        if cached is not None:
+            draft = await _acreate_cached_draft(connection, user, prompt, cached, source='stream')
+            yield _sse("token", {"text": cached.generated_text})
+            yield _sse("done", {"draft_id": draft.id, "version": draft.version, "cached": True,
+                                "trimmed": trimmed, "usage": {"total_tokens": cached.total_tokens}})
+            return
+
+        try:
+            await acheck_quota(user, estimate + GENERATION_PARAMS["max_tokens"])
+        except QuotaExceeded as e:
+            yield _sse("error", {"error": str(e)})
+            return
+
+        # The slot is taken inside the generator so a stream that never starts cannot leak it.
+        # On client disconnect Django cancels this generator; closing the model stream
+        # in the gateway stops the upstream generation with it.
+        slots = _get_generation_slots()
+        try:
+            await asyncio.wait_for(slots.acquire(), timeout=settings.BIOGRAPHER_GENERATION_QUEUE_TIMEOUT)
+        except asyncio.TimeoutError:
+            yield _sse("error", {"error": "The biographer is busy, please try again shortly."})
+            return
+
+        parts = []
+        try:
+            async with aclosing(llm_gateway.astream(EXECUTIVE_BIOGRAPHER_PROMPT, prompt, **GENERATION_PARAMS)) as chunks:
+                async for kind, value in chunks:
+                    if kind == "token":
+                        parts.append(value)
+                        yield _sse("token", {"text": value})
+                    else:
+                        usage = value
+            await astore(key, GENERATION_PARAMS["model"], "".join(parts), usage)
+            draft = await acreate_draft(
+                connection,
+                author=user,
+                title="Untitled Draft",
+                prompt=prompt,
+                generated_text="".join(parts),
+                input_tokens=usage.get("prompt_tokens", 0),
+                output_tokens=usage.get("completion_tokens", 0),
+                total_tokens=usage.get("total_tokens", 0)
+            )
+            await arecord(user, connection, draft, 'stream', GENERATION_PARAMS["model"], usage)
+            yield _sse("done", {"draft_id": draft.id, "version": draft.version, "cached": False,
+                                "trimmed": trimmed, "usage": usage})
+        except Exception as e:
+            yield _sse("error", {"error": str(e)})
+        finally:
+            slots.release()
+
+    response = StreamingHttpResponse(events(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # don't let nginx buffer the stream
+    return response
+
+@login_required
+@use_replica()
 def editor_insights(request):
     User = get_user_model()
     editors = User.objects.filter(role='editor')
     insights = []
+    queued_jobs = dict(
+        GenerationJob.objects.filter(status__in=['queued', 'running'])
+        .values_list('editor').annotate(n=Count('id'))
+    )
+
+    # 🧾 Token and cost figures come from the daily roll-up, one row per editor per day
+    usage_by_editor = {
+        row['user']: row for row in DailyTokenUsage.objects.values('user').annotate(
+            calls=Sum('calls'), cache_hits=Sum('cache_hits'),
+            tokens_spent=Sum('tokens_spent'), tokens_saved=Sum('tokens_saved'),
+        )
+    }
+    spent_today = dict(
+        DailyTokenUsage.objects.filter(date=timezone.localdate()).values_list('user', 'tokens_spent')
+    )
+    no_usage = {"calls": 0, "cache_hits": 0, "tokens_spent": 0, "tokens_saved": 0}
 
     for editor in editors:
         drafts = BiographyDraft.objects.filter(author=editor)
         final_count = drafts.filter(is_published=True).count()
         total_drafts = drafts.count()
         fine_tune_count = drafts.filter(is_finetune_ready=True).count()
-        avg_tokens = drafts.aggregate(avg=Avg('total_tokens'))['avg']
-        avg_tokens = int(avg_tokens) if avg_tokens else 0
+        usage = usage_by_editor.get(editor.id, no_usage)
+        avg_tokens = (usage["tokens_spent"] + usage["tokens_saved"]) // usage["calls"] if usage["calls"] else 0
         insights.append({
             "editor": editor,
             "total_drafts": total_drafts,
             "final_count": final_count,
             "fine_tune_count": fine_tune_count,
             "avg_tokens": avg_tokens,
+            "cache_hits": usage["cache_hits"],
+            "tokens_spent": usage["tokens_spent"],
+            "tokens_saved": usage["tokens_saved"],
+            "tokens_today": spent_today.get(editor.id, 0),
+            "queued_jobs": queued_jobs.get(editor.id, 0),
         })
 
+    # ✅ Response cache effectiveness and spend across the whole team
+    cache_summary = DailyTokenUsage.objects.aggregate(
+        generations=Sum('calls'), cache_hits=Sum('cache_hits'),
+        tokens_spent=Sum('tokens_spent'), tokens_saved=Sum('tokens_saved'),
+    )
+    cache_summary = {name: value or 0 for name, value in cache_summary.items()}
+    cache_summary["hit_rate"] = (
+        round(100 * cache_summary["cache_hits"] / cache_summary["generations"], 1)
+        if cache_summary["generations"] else 0
+    )
+    cache_summary["tokens_today"] = sum(spent_today.values())
+
     chart_data = {
         "labels": [i["editor"].get_full_name() for i in insights],
         "total_drafts": [i["total_drafts"] for i in insights],
@@ -145,5 +348,116 @@ def editor_insights(request):
 
     return render(request, "executive_biographer/editor_insights.html", {
         "insights": insights,
-        "chart_data": chart_data
+        "chart_data": chart_data,
+        "cache_summary": cache_summary,
+        "quotas": get_token_budget(),
+        "can_queue_drafts": request.user.role in ('project_manager', 'super_admin'),
+    })
+
+@require_POST
+@login_required
+def enqueue_editor_drafts(request, editor_id):
+    """Queue first drafts for every connection assigned to an editor that has none yet."""
+    if request.user.role not in ('project_manager', 'super_admin'):
+        return JsonResponse({"error": "Only project managers can queue batch drafts."}, status=403)
+
+    editor = get_object_or_404(get_user_model(), id=editor_id, role='editor')
+    return JsonResponse({"queued": enqueue_for_editor(editor, request.user)})
+
+# 🕘 Version history: metadata only, so the compressed text is never touched
+@login_required
+@use_replica()
+def draft_history(request, connection_id):
+    connection = _get_connection(request.user, connection_id)
+    versions = connection.biography_drafts.order_by('-version').values(
+        'id', 'version', 'title', 'is_published', 'is_cached', 'total_tokens', 'created_at',
+        'author__first_name', 'author__last_name',
+    )
+    return JsonResponse({"versions": [
+        {
+            "id": v["id"],
+            "version": v["version"],
+            "title": v["title"],
+            "is_published": v["is_published"],
+            "is_cached": v["is_cached"],
+            "total_tokens": v["total_tokens"],
+            "created_at": v["created_at"].isoformat(),
+            "author": f'{v["author__first_name"]} {v["author__last_name"]}'.strip(),
+        }
+        for v in versions
+    ]})
+
+@login_required
+@use_replica()
+def draft_version(request, connection_id, version):
+    connection = _get_connection(request.user, connection_id)
+    draft = get_object_or_404(BiographyDraft, connection=connection, version=version)
+    return JsonResponse({
+        "version": draft.version,
+        "title": draft.title,
+        "prompt": draft.prompt,
+        "generated_text": draft.generated_text,
     })
+
+@login_required
+@use_replica()
+def draft_diff(request, connection_id, from_version, to_version):
+    """Word-level diff between two versions; drafts are immutable, so the result is cached."""
+    connection = _get_connection(request.user, connection_id)
+    key = f"biographer:draft-diff:{connection.id}:{from_version}:{to_version}"
+    segments = cache.get(key)
+    if segments is None:
+        old = get_object_or_404(BiographyDraft, connection=connection, version=from_version)
+        new = get_object_or_404(BiographyDraft, connection=connection, version=to_version)
+        old_tokens = draft_storage.tokenize(old.generated_text)
+        new_tokens = draft_storage.tokenize(new.generated_text)
+        segments = []
+        for tag, i1, i2, j1, j2 in SequenceMatcher(None, old_tokens, new_tokens, autojunk=False).get_opcodes():
+            if tag == 'equal':
+                segments.append(["equal", "".join(old_tokens[i1:i2])])
+                continue
+            if i2 > i1:
+                segments.append(["delete", "".join(old_tokens[i1:i2])])
+            if j2 > j1:
+                segments.append(["insert", "".join(new_tokens[j1:j2])])
+        cache.set(key, segments, settings.BIOGRAPHER_DRAFT_TEXT_CACHE_SECONDS)
+    return JsonResponse({"from": from_version, "to": to_version, "segments": segments})
+
+# 📤 Fine-tune dataset download for staff, streamed in batches of rows
+@login_required
+def export_finetune_data(request):
+    if not request.user.is_staff:
+        return JsonResponse({"error": "Only staff can export training data."}, status=403)
+
+    split = request.GET.get("split", "train")
+    try:
+        validation_percent = int(request.GET.get("validation_percent", 0))
+    except ValueError:
+        validation_percent = -1
+    if split not in ("train", "validation") or not 0 <= validation_percent < 100:
+        return JsonResponse({"error": "Invalid split or validation_percent."}, status=400)
+
+    # Pass the X-Export-Watermark of a previous download as ?since= to get only newer samples
+    try:
+        since = finetune_export.parse_watermark(request.GET.get("since", ""))
+    except ValueError:
+        return JsonResponse({"error": "Invalid since watermark."}, status=400)
+    until = finetune_export.current_watermark()
+
+    lines = (
+        line for line_split, line in finetune_export.iter_jsonl(since, until, validation_percent)
+        if line_split == split
+    )
+    response = StreamingHttpResponse(
+        finetune_export.aiter_in_batches(lines), content_type="application/x-ndjson"
+    )
+    response["Content-Disposition"] = f'attachment; filename="biographies-{split}.jsonl"'
+    response["X-Export-Watermark"] = finetune_export.format_watermark(until)
+    return response
+
+# 🧩 Connection context for the prompt, ranked and trimmed to the token budget
+@login_required
+@use_replica()
+def connection_context(request, connection_id):
+    connection = _get_connection(request.user, connection_id)
+    return JsonResponse(build_context(connection.id))
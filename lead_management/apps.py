@@ -5,5 +5,6 @@ class LeadManagementConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'lead_management'
 
-def ready(self):
-    import lead_management.signals
+    def ready(self):
+        import lead_management.checks
+        import lead_management.signals
@@ -0,0 +1,15 @@
+from asgiref.sync import sync_to_async
+from django.contrib.auth.backends import ModelBackend
+
+from .user_cache import get_cached_user
+
+
+# ✅ ModelBackend that resolves the session user (and profile) from the cache
+class CachedModelBackend(ModelBackend):
+    def get_user(self, user_id):
+        user = get_cached_user(user_id)
+        return user if self.user_can_authenticate(user) else None
+
+    # request.auser() in async views goes through here, not get_user
+    async def aget_user(self, user_id):
+        return await sync_to_async(self.get_user)(user_id)
@@ -0,0 +1,202 @@
+#
+# File: blob_storage.py
+# Purpose: Content-addressed media storage for chat screenshots and profile PDFs. Each
+#          distinct file is stored once as <upload_to>/<ab>/<sha256><ext>, tracked by a
+#          StoredBlob row whose ref_count follows the connections using it; unreferenced
+#          blobs are removed by `manage.py collect_media_garbage`.
+#
+
+import hashlib
+import posixpath
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.core.files.base import File
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+GC_GRACE_PERIOD = timedelta(days=1)  # an upload may sit this long between storage and its row
+
+
+def hash_content(content):
+    """sha256 of a file, taken from the upload handler when it already hashed it."""
+    known = getattr(content, 'sha256', None) or getattr(getattr(content, 'file', None), 'sha256', None)
+    if known:
+        return known
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+def blob_name(name, digest):
+    directory = posixpath.dirname(name)
+    extension = posixpath.splitext(name)[1].lower()
+    return posixpath.join(directory, digest[:2], digest + extension)
+
+
+def is_blob_name(name):
+    stem = posixpath.splitext(posixpath.basename(name or ''))[0]
+    return len(stem) == 64 and posixpath.basename(posixpath.dirname(name)) == stem[:2]
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Saving content that is already stored returns the existing name and writes nothing.
+
+    The StoredBlob row is touched before the file is looked for: collect_garbage deletes
+    the row before the file, so a save racing it either keeps the row (too recent to
+    collect) or waits for the collection to commit and then finds no file and writes one.
+    """
+
+    def save(self, name, content, max_length=None):
+        from .models import StoredBlob
+
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        digest = hash_content(content)
+        name = blob_name(name, digest)
+
+        now = timezone.now()
+        StoredBlob.objects.update_or_create(
+            name=name,
+            defaults={'last_referenced_at': now},
+            create_defaults={'sha256': digest, 'size': content.size, 'last_referenced_at': now},
+        )
+        if not self.exists(name):
+            stored = super().save(name, content, max_length=max_length)
+            if stored != name:
+                # A concurrent upload of the same bytes got there first
+                self.delete(stored)
+        return name
+
+
+content_addressed_storage = ContentAddressedStorage()
+
+
+def blob_storage():
+    # A callable keeps the storage instance out of migrations
+    return content_addressed_storage
+
+
+def add_refs(names, count=1):
+    from .models import StoredBlob
+
+    names = [name for name in names if name]
+    if names:
+        StoredBlob.objects.filter(name__in=names).update(
+            ref_count=F('ref_count') + count, last_referenced_at=timezone.now()
+        )
+
+
+def release_refs(names, count=1):
+    from .models import StoredBlob
+
+    names = [name for name in names if name]
+    if names:
+        StoredBlob.objects.filter(name__in=names).update(ref_count=F('ref_count') - count)
+
+
+def recount_refs():
+    """Recompute every ref_count from the rows that actually use the blob."""
+    from .models import Connection, StoredBlob
+
+    counts = {}
+    for name in Connection.objects.exclude(profile_pdf='').exclude(profile_pdf=None).values_list('profile_pdf', flat=True):
+        counts[name] = counts.get(name, 0) + 1
+    links = Connection.chat_screenshots.through.objects.values_list('chatscreenshot__image', flat=True)
+    for name in links:
+        counts[name] = counts.get(name, 0) + 1
+
+    changed = []
+    for blob in StoredBlob.objects.only('id', 'name', 'ref_count').iterator():
+        if blob.ref_count != counts.get(blob.name, 0):
+            blob.ref_count = counts.get(blob.name, 0)
+            changed.append(blob)
+    StoredBlob.objects.bulk_update(changed, ['ref_count'], batch_size=500)
+    return len(changed)
+
+
+def _delete_with_renditions(name):
+    from .renditions import FORMATS, WIDTHS, ready_key, rendition_name
+
+    renditions = [(width, fmt) for width in WIDTHS for fmt in FORMATS]
+    default_storage.delete(name)
+    for width, fmt in renditions:
+        default_storage.delete(rendition_name(name, width, fmt))
+    cache.delete_many([ready_key(name, width, fmt) for width, fmt in renditions])
+
+
+def collect_garbage(grace=GC_GRACE_PERIOD, dry_run=False):
+    """
+    Delete screenshots no connection links to, then every blob left unreferenced for
+    longer than ``grace``, with its renditions. Returns ``(screenshots, blobs, bytes)``.
+    """
+    from .models import ChatScreenshot, StoredBlob
+
+    cutoff = timezone.now() - grace
+    orphans = ChatScreenshot.objects.filter(connections__isnull=True, uploaded_at__lt=cutoff)
+    orphan_count = orphans.count() if dry_run else orphans.delete()[1].get(ChatScreenshot._meta.label, 0)
+
+    blobs, freed = 0, 0
+    candidates = StoredBlob.objects.filter(ref_count__lte=0, last_referenced_at__lt=cutoff)
+    for blob in candidates.iterator():
+        if dry_run:
+            blobs, freed = blobs + 1, freed + blob.size
+            continue
+        # Re-checked in the DELETE so a blob reused since the query survives. The deleted
+        # row stays locked until the files are gone, so a concurrent save() of the same
+        # bytes waits for this and then writes the file again (see ContentAddressedStorage).
+        with transaction.atomic():
+            if not StoredBlob.objects.filter(pk=blob.pk, ref_count__lte=0, last_referenced_at__lt=cutoff).delete()[0]:
+                continue
+            _delete_with_renditions(blob.name)
+        blobs, freed = blobs + 1, freed + blob.size
+    return orphan_count, blobs, freed
+
+
+def adopt_legacy_files():
+    """
+    Move files uploaded before content addressing into blob storage, merging screenshots
+    that turn out to be the same image. Returns ``(screenshots, pdfs)`` adopted.
+    """
+    from .models import ChatScreenshot, Connection
+
+    Link = Connection.chat_screenshots.through
+    screenshots = 0
+    for shot in ChatScreenshot.objects.filter(sha256='').exclude(image='').iterator():
+        legacy = shot.image.name
+        if not content_addressed_storage.exists(legacy):
+            continue
+        with content_addressed_storage.open(legacy, 'rb') as file:
+            shot.sha256 = hash_content(file)
+            name = content_addressed_storage.save(legacy, file)
+        keeper = ChatScreenshot.objects.filter(sha256=shot.sha256).first()
+        if keeper is None:
+            shot.image = name
+            shot.save(update_fields=['image', 'sha256'])
+        else:
+            connection_ids = Link.objects.filter(chatscreenshot_id=shot.pk).values_list('connection_id', flat=True)
+            Link.objects.bulk_create(
+                [Link(connection_id=cid, chatscreenshot_id=keeper.pk) for cid in connection_ids], ignore_conflicts=True
+            )
+            shot.delete()
+        _delete_with_renditions(legacy)
+        screenshots += 1
+
+    pdfs = 0
+    for connection in Connection.objects.exclude(profile_pdf='').exclude(profile_pdf=None).only('id', 'profile_pdf').iterator():
+        legacy = connection.profile_pdf.name
+        if is_blob_name(legacy) or not content_addressed_storage.exists(legacy):
+            continue
+        with content_addressed_storage.open(legacy, 'rb') as file:
+            name = content_addressed_storage.save(legacy, file)
+        Connection.objects.filter(pk=connection.pk).update(profile_pdf=name)
+        _delete_with_renditions(legacy)
+        pdfs += 1
+    return screenshots, pdfs
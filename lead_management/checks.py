@@ -0,0 +1,69 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, Warning, register
+
+SENDFILE_BACKENDS = ('x-accel-redirect', 'x-sendfile')
+PROCESS_LOCAL_CACHES = ('django.core.cache.backends.locmem.LocMemCache',)
+
+
+@register()
+def check_media_sendfile_backend(app_configs, **kwargs):
+    backend = settings.MEDIA_SENDFILE_BACKEND
+    if backend is not None and backend not in SENDFILE_BACKENDS:
+        return [Error(
+            f"MEDIA_SENDFILE_BACKEND must be one of {', '.join(SENDFILE_BACKENDS)} or unset, not {backend!r}.",
+            id='lead_management.E001',
+        )]
+    return []
+
+
+@register(Tags.security, deploy=True)
+def check_media_served_by_web_server(app_configs, **kwargs):
+    if settings.MEDIA_SENDFILE_BACKEND is None:
+        return [Warning(
+            "Media files are streamed by application workers.",
+            hint="Set MEDIA_SENDFILE_BACKEND so nginx (x-accel-redirect) or Apache (x-sendfile) sends them.",
+            id='lead_management.W001',
+        )]
+    return []
+
+
+def _missing_assets_message():
+    from .vendor_assets import missing_assets
+
+    missing = missing_assets()
+    if missing:
+        return f"Vendored front-end assets are missing: {', '.join(missing)}."
+    return None
+
+
+VENDOR_HINT = "Run `python manage.py vendor_static` (and collectstatic), or commit static/vendor/."
+
+
+@register()
+def check_vendored_assets(app_configs, **kwargs):
+    message = _missing_assets_message()
+    if message is None:
+        return []
+    # Pages fall back to the CDN in DEBUG and raise outside it; see the deploy check
+    return [Warning(message, hint=VENDOR_HINT, id='lead_management.W002')]
+
+
+@register(Tags.staticfiles, deploy=True)
+def check_vendored_assets_deployed(app_configs, **kwargs):
+    message = _missing_assets_message()
+    if message is None or settings.DEBUG:
+        return []
+    return [Error(message, hint=VENDOR_HINT, id='lead_management.E002')]
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    # Cached users, comments, feed versions and access decisions are invalidated through
+    # the default cache; with one cache per process other workers keep serving stale copies
+    if settings.DEBUG or settings.CACHES['default']['BACKEND'] not in PROCESS_LOCAL_CACHES:
+        return []
+    return [Error(
+        "The default cache is local to each process, so invalidations don't reach other workers.",
+        hint="Set REDIS_URL (or configure another shared cache backend) for every web and worker process.",
+        id='lead_management.E003',
+    )]
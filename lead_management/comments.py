@@ -0,0 +1,117 @@
+#
+# File: comments.py
+# Purpose: One place to post and render connection comments. Threads come out of SQL
+#          in display order (ConnectionComment.path), root threads are paginated, long
+#          threads are collapsed until asked for, and rendered HTML is cached until the
+#          connection gets a new comment.
+#
+
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db.models import Max
+from django.template.loader import render_to_string
+
+from .models import ConnectionComment
+
+THREADS_PER_PAGE = 20
+INLINE_REPLIES = 5  # threads with more replies render collapsed and load on demand
+RENDER_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def _version_key(connection_id):
+    return f'comments:version:{connection_id}'
+
+
+def _bump(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 2, None)
+
+
+def _versions(connection_id):
+    # Author names and roles are part of the markup, so user edits also invalidate it
+    versions = cache.get_many([_version_key(connection_id), 'comments:authors-version'])
+    return f"{versions.get(_version_key(connection_id), 1)}:{versions.get('comments:authors-version', 1)}"
+
+
+async def aversion(connection_id):
+    """Changes whenever the connection's comments do; cheap enough to poll."""
+    return await cache.aget(_version_key(connection_id), 1)
+
+
+def invalidate(connection_id):
+    _bump(_version_key(connection_id))
+
+
+def invalidate_authors():
+    _bump('comments:authors-version')
+
+
+def post_comment(connection, author, text, parent_id=None):
+    # A parent from another connection is ignored rather than trusted
+    parent = ConnectionComment.objects.filter(pk=parent_id, connection=connection).first() if parent_id else None
+    return ConnectionComment.objects.create(connection=connection, author=author, comment=text, parent=parent)
+
+
+def _nest(comments):
+    """Attach path-ordered comments to their parents' ``thread_replies``; returns the tops."""
+    tops, stack = [], []
+    for comment in comments:
+        comment.thread_replies = []
+        while stack and stack[-1].depth >= comment.depth:
+            stack.pop()
+        (stack[-1].thread_replies if stack else tops).append(comment)
+        stack.append(comment)
+    return tops
+
+
+def thread_page(connection, page_number):
+    """A page of root threads; short threads come with their replies, long ones ``collapsed``."""
+    roots = ConnectionComment.objects.filter(connection=connection, parent=None).select_related('author').order_by('path')
+    paginator = Paginator(roots, THREADS_PER_PAGE)
+    page = paginator.get_page(paginator.num_pages if page_number == 'last' else page_number)
+    inline = [root.pk for root in page if 0 < root.reply_count <= INLINE_REPLIES]
+    replies = (
+        ConnectionComment.objects.filter(thread_id__in=inline).exclude(parent=None)
+        .select_related('author').order_by('path')
+    )
+    for root in page:
+        root.collapsed = root.reply_count > INLINE_REPLIES
+    return page, _nest(sorted([*page, *replies], key=lambda comment: comment.path))
+
+
+def latest_comment_id(connection):
+    return ConnectionComment.objects.filter(connection=connection).aggregate(m=Max('id'))['m'] or 0
+
+
+def render_threads(connection, page_number=None):
+    """HTML for a page of threads (the last page, with the newest threads, by default)."""
+    page_number = int(page_number) if str(page_number).isdigit() else 'last'
+    key = f"comments:html:{connection.pk}:{_versions(connection.pk)}:{page_number}"
+    html = cache.get(key)
+    if html is None:
+        page, threads = thread_page(connection, page_number)
+        html = render_to_string('lead_management/partials/comment_threads.html', {
+            'connection': connection, 'page': page, 'threads': threads, 'latest_id': latest_comment_id(connection),
+        })
+        cache.set(key, html, RENDER_CACHE_TIMEOUT)
+    return html
+
+
+def render_comment(comment):
+    """HTML for a single new comment, as pushed by the live feed."""
+    return render_to_string('lead_management/partials/comment_node.html', {
+        'comment': comment, 'is_reply': bool(comment.parent_id),
+    })
+
+
+def render_thread(root):
+    """HTML for one whole thread, for expanding a collapsed one."""
+    key = f"comments:thread:{root.pk}:{_versions(root.connection_id)}"
+    html = cache.get(key)
+    if html is None:
+        comments = ConnectionComment.objects.filter(thread=root).select_related('author').order_by('path')
+        html = render_to_string('lead_management/partials/comment_node.html', {'comment': _nest(comments)[0]})
+        cache.set(key, html, RENDER_CACHE_TIMEOUT)
+    return html
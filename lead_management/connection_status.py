@@ -0,0 +1,35 @@
+#
+# File: connection_status.py
+# Purpose: Change the status of one or many connections in a single transaction:
+#          one UPDATE for the rows that actually change, one INSERT for their status
+#          events, and one for their ColdLead rows when the new status is cold_lead.
+#
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ColdLead, Connection
+from .status_events import record
+
+MAX_BULK = 500  # connections per bulk request
+
+VALID_STATUSES = {value for value, _ in Connection.STATUS_CHOICES}
+
+
+def set_status(connections, status, changed_by=None):
+    """
+    Move ``connections`` (a queryset) to ``status``, logging each transition. Returns
+    the ids that changed; rows already in that status are left untouched.
+    """
+    if status not in VALID_STATUSES:
+        raise ValueError(f"Unknown connection status: {status!r}")
+    now = timezone.now()
+    with transaction.atomic():
+        previous = dict(connections.exclude(status=status).select_for_update().values_list('pk', 'status'))
+        if previous:
+            # updated_at is set by hand: .update() skips auto_now, and cached rows key on it
+            Connection.objects.filter(pk__in=previous).update(status=status, updated_at=now)
+            record([(pk, old, status) for pk, old in previous.items()], changed_by=changed_by, at=now)
+        if status == 'cold_lead':
+            ColdLead.objects.bulk_create([ColdLead(connection_id=pk) for pk in previous], ignore_conflicts=True)
+    return list(previous)
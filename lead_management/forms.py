@@ -85,3 +85,31 @@ class ConnectionEditForm(forms.ModelForm):
             'profile_picture',
             'profile_pdf',
         ]
+
+
+# ✅ Chat screenshots, many per request (Django's documented multiple-file pattern)
+class MultipleImageInput(forms.ClearableFileInput):
+    allow_multiple_selected = True
+
+
+class MultipleImageField(forms.ImageField):
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('widget', MultipleImageInput(attrs={'accept': 'image/*'}))
+        super().__init__(*args, **kwargs)
+
+    def clean(self, data, initial=None):
+        if isinstance(data, (list, tuple)):
+            return [super(MultipleImageField, self).clean(d, initial) for d in data]
+        return [super().clean(data, initial)]
+
+
+class ChatScreenshotUploadForm(forms.Form):
+    MAX_FILES = 30
+
+    screenshots = MultipleImageField()
+
+    def clean_screenshots(self):
+        files = self.cleaned_data['screenshots']
+        if len(files) > self.MAX_FILES:
+            raise forms.ValidationError(f"Upload at most {self.MAX_FILES} screenshots at a time.")
+        return files
@@ -0,0 +1,157 @@
+#
+# File: linkedin_urls.py
+# Purpose: Tell a builder, while they type, whether a LinkedIn profile is already in the
+#          system: as an outreach lead, a connection, or an uploaded LinkedIn row. Each
+#          process keeps a hash set of every known profile's canonical URL, so a miss is
+#          answered without the database; a hit is confirmed with an indexed lookup.
+#
+
+import hashlib
+import itertools
+import re
+import threading
+import time
+from urllib.parse import unquote, urlsplit
+
+from django.core.cache import cache
+
+REFRESH_INTERVAL = 60 * 5  # rebuild the set at least this often
+MIN_REBUILD_INTERVAL = 10  # but no more often than this when other processes add URLs
+CHECKS_PER_WINDOW = 30     # per user; the add-lead form checks as the builder types
+CHECK_WINDOW = 10          # seconds
+
+_VERSION_KEY = 'linkedin-urls:version'
+_PROFILE_PATH = re.compile(r'^/(in|pub|company)/[^/]+')
+
+
+def canonical_url(url):
+    """
+    One spelling per LinkedIn profile: ``linkedin.com/in/<slug>``, whatever the scheme,
+    subdomain (www, country, mobile), case, query string or trailing sub-page.
+    """
+    url = (url or '').strip()
+    if not url:
+        return ''
+    if '://' not in url:
+        url = f'https://{url}'
+    parts = urlsplit(url)
+    host = (parts.hostname or '').lower()
+    if host == 'linkedin.com' or host.endswith('.linkedin.com'):
+        host = 'linkedin.com'
+    path = re.sub(r'/+', '/', unquote(parts.path).lower()).rstrip('/')
+    match = _PROFILE_PATH.match(path)
+    if host == 'linkedin.com' and match:
+        path = match.group(0)
+    return f'{host}{path}'
+
+
+def _digest(key):
+    # 8 bytes keep the set small; a collision only costs one confirming query
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'big')
+
+
+class _KnownUrls:
+    """
+    Digests of every known canonical URL, rebuilt when stale or changed elsewhere. The
+    shared version is polled at most once per MIN_REBUILD_INTERVAL, so checks in between
+    cost no cache round trip.
+    """
+
+    def __init__(self):
+        self.digests = frozenset()
+        self.version = None
+        self.built_at = self.polled_at = float('-inf')
+        self.lock = threading.Lock()
+
+    def _load(self):
+        from .models import LinkedInConnection, OutreachLead
+
+        keys = OutreachLead.objects.exclude(linkedin_key='').values_list('linkedin_key', flat=True)
+        uploaded = LinkedInConnection.objects.exclude(linkedin_key='').values_list('linkedin_key', flat=True)
+        return frozenset(_digest(key) for key in itertools.chain(keys.iterator(), uploaded.iterator()))
+
+    def _stale(self):
+        now = time.monotonic()
+        if now - self.built_at > REFRESH_INTERVAL:
+            return True
+        if now - self.built_at <= MIN_REBUILD_INTERVAL or now - self.polled_at <= MIN_REBUILD_INTERVAL:
+            return False
+        self.polled_at = now
+        return cache.get(_VERSION_KEY, 1) != self.version
+
+    def __contains__(self, key):
+        built_at = self.built_at
+        if self._stale():
+            with self.lock:
+                # Another thread may have rebuilt it while this one waited
+                if self.built_at == built_at:
+                    # Read before loading, so a URL added during the load bumps past it
+                    version = cache.get(_VERSION_KEY, 1)
+                    self.digests = self._load()
+                    self.version, self.built_at = version, time.monotonic()
+                    self.polled_at = self.built_at
+        return _digest(key) in self.digests
+
+    def add(self, key):
+        # Visible in this process at once; other processes rebuild on the version bump
+        self.digests = self.digests | {_digest(key)}
+
+
+_known = _KnownUrls()
+
+
+def url_added(key):
+    """Record a new canonical URL (called from the model signals)."""
+    if key:
+        _known.add(key)
+        try:
+            cache.incr(_VERSION_KEY)
+        except ValueError:
+            cache.set(_VERSION_KEY, 2, None)
+
+
+def find_matches(url, user=None):
+    """
+    Where ``url`` already lives, as a list of dicts with ``kind`` (``lead``,
+    ``connection`` or ``uploaded``), ``builder`` and ``mine``. Empty when it's new.
+    """
+    from .models import LinkedInConnection, OutreachLead
+
+    key = canonical_url(url)
+    if not key or key not in _known:
+        return []
+
+    matches = []
+    leads = OutreachLead.objects.filter(linkedin_key=key).select_related('added_by', 'connection__added_by')
+    for lead in leads:
+        connection = getattr(lead, 'connection', None)
+        builder = connection.added_by if connection and connection.added_by_id else lead.added_by
+        matches.append({
+            'kind': 'connection' if connection else 'lead',
+            'id': connection.pk if connection else lead.pk,
+            'status': connection.get_status_display() if connection else lead.get_status_display(),
+            'builder': builder.get_full_name() or builder.username,
+            'mine': user is not None and builder.pk == user.pk,
+        })
+    uploaded = LinkedInConnection.objects.filter(linkedin_key=key).select_related('community_builder')
+    for row in uploaded:
+        builder = row.community_builder
+        matches.append({
+            'kind': 'uploaded',
+            'id': row.pk,
+            'status': 'Uploaded',
+            'builder': builder.get_full_name() or builder.username,
+            'mine': user is not None and builder.pk == user.pk,
+        })
+    return matches
+
+
+def allow_check(user):
+    """Per-user limit on duplicate checks; False once the window's budget is spent."""
+    key = f'linkedin-check:{user.pk}:{int(time.time() // CHECK_WINDOW)}'
+    if cache.add(key, 1, CHECK_WINDOW):
+        return True
+    try:
+        return cache.incr(key) <= CHECKS_PER_WINDOW
+    except ValueError:
+        return True
@@ -0,0 +1,57 @@
+import statistics
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.template.loader import render_to_string
+from django.test import RequestFactory
+from django.utils import timezone
+
+from lead_management.models import Connection, OutreachLead
+
+
+class Command(BaseCommand):
+    help = "Measure connection_list.html render time for N rows with cold vs warm fragment caches (no DB needed)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        rows, repeat = options['rows'], options['repeat']
+        statuses = [value for value, _ in Connection.STATUS_CHOICES]
+        now = timezone.now()
+
+        # Unsaved instances: enough for rendering, nothing touches the database
+        connections = []
+        for i in range(rows):
+            lead = OutreachLead(id=i + 1, linkedin_url=f"https://www.linkedin.com/in/bench-{i}")
+            connections.append(Connection(
+                id=i + 1, outreach_lead=lead, full_name=f"Bench Executive {i}",
+                linkedin_email=f"bench{i}@example.com", status=statuses[i % len(statuses)],
+                date_connected=now, updated_at=now,
+            ))
+
+        request = RequestFactory().get('/connections/')
+        request.user = AnonymousUser()
+        context = {'connections': connections, 'status_choices': Connection.STATUS_CHOICES}
+        fragments = caches['template_fragments']
+
+        def render():
+            start = time.perf_counter()
+            render_to_string('lead_management/community_builder/connection_list.html', context, request=request)
+            return (time.perf_counter() - start) * 1000
+
+        render()  # compile templates into the cached loader
+
+        cold = []
+        for _ in range(repeat):
+            fragments.clear()
+            cold.append(render())
+        warm = [render() for _ in range(repeat)]
+
+        cold_ms, warm_ms = statistics.median(cold), statistics.median(warm)
+        self.stdout.write(f"connection_list.html, {rows} rows (median of {repeat}):")
+        self.stdout.write(f"  cold fragments: {cold_ms:8.1f} ms")
+        self.stdout.write(f"  warm fragments: {warm_ms:8.1f} ms  ({cold_ms / warm_ms:.1f}x faster)")
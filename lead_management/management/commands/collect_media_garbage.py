@@ -0,0 +1,34 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from lead_management.blob_storage import GC_GRACE_PERIOD, adopt_legacy_files, collect_garbage, recount_refs
+
+
+class Command(BaseCommand):
+    help = "Reconcile StoredBlob reference counts and delete unreferenced screenshots and PDFs (run daily)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace-hours', type=float, default=GC_GRACE_PERIOD.total_seconds() / 3600,
+            help="Keep unreferenced blobs this long after their last use.",
+        )
+        parser.add_argument('--dry-run', action='store_true', help="Report what would be deleted without deleting it.")
+        parser.add_argument(
+            '--adopt-legacy', action='store_true',
+            help="First move files uploaded before content addressing into blob storage, merging duplicates.",
+        )
+
+    def handle(self, *args, **options):
+        if options['adopt_legacy'] and not options['dry_run']:
+            screenshots, pdfs = adopt_legacy_files()
+            self.stdout.write(f"📦 Adopted {screenshots} screenshots and {pdfs} PDFs")
+
+        if not options['dry_run']:
+            self.stdout.write(f"🔢 Corrected {recount_refs()} reference counts")
+
+        screenshots, blobs, freed = collect_garbage(timedelta(hours=options['grace_hours']), dry_run=options['dry_run'])
+        verb = "Would delete" if options['dry_run'] else "Deleted"
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {verb} {screenshots} orphaned screenshots and {blobs} blobs ({freed / 1024 / 1024:.1f} MB)"
+        ))
@@ -0,0 +1,36 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from lead_management.models import Connection, OutreachLead
+from lead_management.stale_leads import BATCH_SIZE, sweep
+
+
+class Command(BaseCommand):
+    help = "Mark unanswered outreach leads cold and move stalled connections to Cold Lead (run daily)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lead-days', type=int, default=OutreachLead.STALE_AFTER.days,
+            help="Outreach leads without a connection after this many days become cold.",
+        )
+        parser.add_argument(
+            '--connection-days', type=int, default=Connection.STALE_AFTER.days,
+            help="Connections still in %s after this many days without an update become cold leads."
+                 % ", ".join(Connection.STALLED_STATUSES),
+        )
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help="Rows per UPDATE.")
+        parser.add_argument('--dry-run', action='store_true', help="Report what would change without changing it.")
+
+    def handle(self, *args, **options):
+        leads, connections, cold_rows = sweep(
+            lead_age=timedelta(days=options['lead_days']),
+            connection_age=timedelta(days=options['connection_days']),
+            batch_size=options['batch_size'],
+            dry_run=options['dry_run'],
+        )
+        verb = "Would move" if options['dry_run'] else "Moved"
+        self.stdout.write(self.style.SUCCESS(
+            f"🧊 {verb} {leads} outreach leads to cold and {connections} connections to Cold Lead"
+            f" ({cold_rows} missing ColdLead rows repaired)"
+        ))
@@ -0,0 +1,60 @@
+from pathlib import Path
+from urllib.request import urlopen
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from lead_management.vendor_assets import VENDOR_ASSETS, integrity
+
+
+class Command(BaseCommand):
+    help = (
+        "Download pinned third-party front-end assets into static/vendor/ (run before collectstatic). "
+        "Every file must match the SRI digest pinned in lead_management.vendor_assets."
+    )
+    requires_system_checks = []  # lead_management.W002 warns until this has run
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Re-download assets that already exist.")
+        parser.add_argument(
+            '--print-integrity', action='store_true',
+            help="Download every asset and print its digest for review, writing nothing.",
+        )
+
+    def _download(self, name, url):
+        try:
+            with urlopen(url, timeout=30) as response:
+                return response.read()
+        except OSError as e:
+            raise CommandError(f"Could not download {name} from {url}: {e}")
+
+    def handle(self, *args, **options):
+        static_dir = Path(settings.STATICFILES_DIRS[0])
+        assets = [(name, *asset) for name, asset in VENDOR_ASSETS.items() if asset[0].startswith('vendor/')]
+
+        if options['print_integrity']:
+            for name, path, url, _ in assets:
+                self.stdout.write(f"{name}: {integrity(self._download(name, url))}")
+            return
+
+        for name, path, url, expected in assets:
+            if expected is None:
+                raise CommandError(
+                    f"{name} has no pinned digest; record one in lead_management/vendor_assets.py "
+                    f"(see `manage.py vendor_static --print-integrity`)."
+                )
+            target = static_dir / path
+            if target.exists() and not options['force']:
+                # A file already on disk (committed or from an earlier build) is checked too
+                if integrity(target.read_bytes()) != expected:
+                    raise CommandError(f"{target} does not match the pinned digest for {name}; re-run with --force.")
+                self.stdout.write(f"✔ {name} already vendored")
+                continue
+
+            body = self._download(name, url)
+            actual = integrity(body)
+            if actual != expected:
+                raise CommandError(f"{name} from {url} does not match its pinned digest: expected {expected}, got {actual}.")
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_bytes(body)
+            self.stdout.write(self.style.SUCCESS(f"✅ {name}: {len(body)} bytes, {actual}"))
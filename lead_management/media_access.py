@@ -0,0 +1,69 @@
+#
+# File: media_access.py
+# Purpose: Decide whether a user may fetch an uploaded file. Connection media follows
+#          the connection: its builder, that builder's project manager and the assigned
+#          editor; staff profile pictures are visible to any signed-in user.
+#
+
+import hashlib
+import posixpath
+import re
+
+from django.core.cache import cache
+from django.db.models import Q
+
+from .models import ChatScreenshot, Connection
+from .user_cache import get_team_builder_ids
+
+ACCESS_CACHE_TIMEOUT = 60 * 5  # revoked access can linger this long for a file already seen
+
+_RENDITION = re.compile(r'^(?P<directory>.+)/renditions/(?P<stem>[^/]+)-\d+w\.[a-z]+$')
+
+
+def connection_access_q(user):
+    """Q over Connection matching the connections ``user`` may see."""
+    if user.is_superuser or user.role == 'super_admin':
+        return Q()
+    if user.role == 'project_manager':
+        return Q(added_by_id__in=get_team_builder_ids(user))
+    if user.role == 'community_builder':
+        return Q(added_by=user)
+    if user.role == 'editor':
+        return Q(assigned_editor=user)
+    return Q(pk__in=[])
+
+
+def _name_lookup(name):
+    """Field lookup matching the stored original of ``name``, itself or a rendition of it."""
+    match = _RENDITION.match(name)
+    if match:
+        return '__startswith', f"{match['directory']}/{match['stem']}."
+    return '', name
+
+
+def _check(user, name):
+    suffix, value = _name_lookup(name)
+    top = name.split('/', 1)[0]
+    if top == 'profile_pics':
+        return True
+    if top == 'profile_photos':
+        return Connection.objects.filter(connection_access_q(user), **{f'profile_picture{suffix}': value}).exists()
+    if top == 'profile_pdfs':
+        return Connection.objects.filter(connection_access_q(user), **{f'profile_pdf{suffix}': value}).exists()
+    if top == 'chat_screenshots':
+        connections = Connection.objects.filter(connection_access_q(user))
+        return ChatScreenshot.objects.filter(connections__in=connections, **{f'image{suffix}': value}).exists()
+    return user.is_superuser
+
+
+def can_access(user, name):
+    """Whether ``user`` may read the media file stored as ``name``."""
+    if not user.is_authenticated:
+        return False
+    name = posixpath.normpath(name).lstrip('/')
+    key = f"media-access:{user.pk}:{hashlib.md5(name.encode()).hexdigest()}"
+    allowed = cache.get(key)
+    if allowed is None:
+        allowed = _check(user, name)
+        cache.set(key, allowed, ACCESS_CACHE_TIMEOUT)
+    return allowed
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-19 07:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lead_management', '0008_linkedinconnection'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='connection',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
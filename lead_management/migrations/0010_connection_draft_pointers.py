@@ -0,0 +1,25 @@
+# Generated by Django 5.2 on 2026-10-19 08:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('executive_biographer', '0005_token_ledger'),
+        ('lead_management', '0009_connection_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='connection',
+            name='last_draft_version',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='connection',
+            name='published_draft',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='executive_biographer.biographydraft'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-19 08:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lead_management', '0010_connection_draft_pointers'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='connection',
+            name='profile_pdf_sha256',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+    ]
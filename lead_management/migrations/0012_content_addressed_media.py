@@ -0,0 +1,46 @@
+# Generated by Django 5.2 on 2026-10-19 08:25
+
+import django.utils.timezone
+import lead_management.blob_storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lead_management', '0011_connection_profile_pdf_sha256'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('sha256', models.CharField(db_index=True, max_length=64)),
+                ('size', models.BigIntegerField()),
+                ('ref_count', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_referenced_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='chatscreenshot',
+            name='sha256',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AlterField(
+            model_name='chatscreenshot',
+            name='image',
+            field=models.ImageField(storage=lead_management.blob_storage.blob_storage, upload_to='chat_screenshots/'),
+        ),
+        migrations.AlterField(
+            model_name='connection',
+            name='profile_pdf',
+            field=models.FileField(blank=True, null=True, storage=lead_management.blob_storage.blob_storage, upload_to='profile_pdfs/'),
+        ),
+        migrations.AddConstraint(
+            model_name='chatscreenshot',
+            constraint=models.UniqueConstraint(condition=models.Q(('sha256', ''), _negated=True), fields=('sha256',), name='unique_screenshot_content'),
+        ),
+    ]
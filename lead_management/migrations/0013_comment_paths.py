@@ -0,0 +1,53 @@
+# Generated by Django 5.2 on 2026-10-19 08:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fill_paths(apps, schema_editor):
+    """Parents always predate their replies, so one pass in id order sees every parent first."""
+    ConnectionComment = apps.get_model('lead_management', 'ConnectionComment')
+    comments = {}
+    for comment in ConnectionComment.objects.order_by('id').only('id', 'parent_id'):
+        parent = comments.get(comment.parent_id)
+        comment.path = f"{parent.path}.{comment.id:010d}" if parent else f"{comment.id:010d}"
+        comment.thread_id = parent.thread_id if parent else comment.id
+        comment.reply_count = 0
+        if parent:
+            comments[comment.thread_id].reply_count += 1
+        comments[comment.id] = comment
+    ConnectionComment.objects.bulk_update(comments.values(), ['path', 'thread', 'reply_count'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lead_management', '0012_content_addressed_media'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='connectioncomment',
+            name='path',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='connectioncomment',
+            name='reply_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='connectioncomment',
+            name='thread',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='lead_management.connectioncomment'),
+        ),
+        migrations.RunPython(fill_paths, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='connectioncomment',
+            index=models.Index(fields=['connection', 'path'], name='comment_connection_path'),
+        ),
+        migrations.AddIndex(
+            model_name='connectioncomment',
+            index=models.Index(fields=['thread', 'path'], name='comment_thread_path'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2 on 2026-10-19 08:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lead_management', '0013_comment_paths'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='connectioncomment',
+            index=models.Index(fields=['connection', 'id'], name='comment_connection_id'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2 on 2026-10-19 08:36
+
+from django.db import migrations, models
+
+from lead_management.linkedin_urls import canonical_url
+
+
+def fill_keys(apps, schema_editor):
+    for model in ('OutreachLead', 'LinkedInConnection'):
+        Model = apps.get_model('lead_management', model)
+        rows = list(Model.objects.only('id', 'linkedin_url'))
+        for row in rows:
+            row.linkedin_key = canonical_url(row.linkedin_url)[:255]
+        Model.objects.bulk_update(rows, ['linkedin_key'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lead_management', '0014_comment_feed_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='linkedinconnection',
+            name='linkedin_key',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='outreachlead',
+            name='linkedin_key',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=255),
+        ),
+        migrations.RunPython(fill_keys, migrations.RunPython.noop),
+    ]
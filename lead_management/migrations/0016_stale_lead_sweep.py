@@ -0,0 +1,27 @@
+# Generated by Django 5.2 on 2026-10-19 08:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('executive_biographer', '0009_profiletext'),
+        ('lead_management', '0015_linkedin_url_keys'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='outreachlead',
+            name='status',
+            field=models.CharField(choices=[('connection_sent', 'Connection Sent'), ('cold', 'Cold (No Response)')], default='connection_sent', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='connection',
+            index=models.Index(fields=['status', 'updated_at'], name='connection_status_updated'),
+        ),
+        migrations.AddIndex(
+            model_name='outreachlead',
+            index=models.Index(fields=['status', 'date_added'], name='lead_status_date'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2 on 2026-10-19 08:39
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def seed_history(apps, schema_editor):
+    """
+    Earlier history was never kept: each connection starts with its creation, and one
+    move to its current status when updated_at shows it was edited since.
+    """
+    Connection = apps.get_model('lead_management', 'Connection')
+    ConnectionStatusEvent = apps.get_model('lead_management', 'ConnectionStatusEvent')
+    events = []
+    for pk, status, connected_at, updated_at in Connection.objects.values_list('pk', 'status', 'date_connected', 'updated_at').iterator():
+        events.append(ConnectionStatusEvent(connection_id=pk, from_status='', to_status='connected', changed_at=connected_at))
+        if status != 'connected':
+            events.append(ConnectionStatusEvent(connection_id=pk, from_status='connected', to_status=status, changed_at=max(updated_at, connected_at)))
+    ConnectionStatusEvent.objects.bulk_create(events, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lead_management', '0016_stale_lead_sweep'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConnectionStatusEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('from_status', models.CharField(blank=True, max_length=20)),
+                ('to_status', models.CharField(choices=[('connected', 'Connected'), ('info_shared', 'Info Shared'), ('F1', 'Follow Up 1'), ('F2', 'Follow Up 2'), ('interested', 'Interested'), ('not_interested', 'Not Interested'), ('cold_lead', 'Cold Lead')], max_length=20)),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('changed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('connection', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='status_events', to='lead_management.connection')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['connection', 'changed_at'], name='status_event_connection'), models.Index(fields=['to_status', 'changed_at'], name='status_event_status')],
+            },
+        ),
+        migrations.RunPython(seed_history, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-19 09:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lead_management', '0017_connection_status_events'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outreachlead',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
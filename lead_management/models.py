@@ -1,10 +1,13 @@
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 from django.utils import timezone
 from datetime import timedelta
 from django.views.decorators.http import require_POST
 
+from .blob_storage import blob_storage
+from .linkedin_urls import canonical_url
+
 # ✅ Custom User Model with Roles
 class CustomUser(AbstractUser):
     ROLE_CHOICES = [
@@ -51,27 +54,59 @@ class UserProfile(models.Model):
 class OutreachLead(models.Model):
     STATUS_CHOICES = [
         ('connection_sent', 'Connection Sent'),
+        ('cold', 'Cold (No Response)'),  # set by `manage.py sweep_stale_leads`
     ]
+    STALE_AFTER = timedelta(days=30)
 
     linkedin_url = models.URLField(unique=True)
+    linkedin_key = models.CharField(max_length=255, blank=True, db_index=True, editable=False)  # canonical_url()
     full_name = models.CharField(max_length=200, blank=True)
     location = models.CharField(max_length=100, blank=True)
     added_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='connection_sent')
     date_added = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)  # part of the cached connection_row fragment's key
 
     def __str__(self):
         return self.full_name or self.linkedin_url
 
+    def save(self, *args, **kwargs):
+        self.linkedin_key = canonical_url(self.linkedin_url)[:255]
+        super().save(*args, **kwargs)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'date_added'], name='lead_status_date'),  # stale-lead sweep
+        ]
+
     def is_older_than_30_days(self):
-        return timezone.now() - self.date_added > timedelta(days=30)
+        return timezone.now() - self.date_added > self.STALE_AFTER
 
 
-# ✅ Chat Screenshot Model (many-to-many with Connection)
+# 🗄️ One stored copy of an uploaded file, shared by every row that uploaded the same bytes
+class StoredBlob(models.Model):
+    name = models.CharField(max_length=255, unique=True)  # storage path, derived from sha256
+    sha256 = models.CharField(max_length=64, db_index=True)
+    size = models.BigIntegerField()
+    ref_count = models.IntegerField(default=0)  # connections using it; 0 makes it collectable
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_referenced_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return self.name
+
+
+# ✅ Chat Screenshot Model (many-to-many with Connection), one row per distinct image
 class ChatScreenshot(models.Model):
-    image = models.ImageField(upload_to='chat_screenshots/')
+    image = models.ImageField(upload_to='chat_screenshots/', storage=blob_storage)
+    sha256 = models.CharField(max_length=64, blank=True)
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['sha256'], condition=~models.Q(sha256=''), name='unique_screenshot_content'),
+        ]
+
     def __str__(self):
         return f"Screenshot {self.id}"
 
@@ -87,6 +122,8 @@ class Connection(models.Model):
         ('not_interested', 'Not Interested'),
         ('cold_lead', 'Cold Lead'),
     ]
+    STALLED_STATUSES = ['connected', 'info_shared', 'F1', 'F2']  # still waiting on the member
+    STALE_AFTER = timedelta(days=30)  # without an update, stalled connections go cold
 
     outreach_lead = models.OneToOneField(OutreachLead, on_delete=models.CASCADE)
     full_name = models.CharField(max_length=200)
@@ -96,7 +133,9 @@ class Connection(models.Model):
     outreach_email = models.EmailField(blank=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='connected')
     date_connected = models.DateTimeField(auto_now_add=True)
-    profile_pdf = models.FileField(upload_to='profile_pdfs/', blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)  # version stamp for cached row fragments
+    profile_pdf = models.FileField(upload_to='profile_pdfs/', storage=blob_storage, blank=True, null=True)
+    profile_pdf_sha256 = models.CharField(max_length=64, blank=True, db_index=True)  # key into executive_biographer.ProfileText
     profile_picture = models.ImageField(upload_to='profile_photos/', blank=True, null=True)
     chat_screenshots = models.ManyToManyField(ChatScreenshot, blank=True, related_name='connections')
 
@@ -110,21 +149,88 @@ class Connection(models.Model):
         limit_choices_to={'role': 'editor'}
     )
 
+    # 📝 Biography bookkeeping, maintained by executive_biographer.drafts
+    last_draft_version = models.IntegerField(default=0)  # per-connection version counter
+    published_draft = models.OneToOneField(
+        'executive_biographer.BiographyDraft',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'updated_at'], name='connection_status_updated'),  # stale-lead sweep
+        ]
+
     def __str__(self):
         return self.full_name
 
 
-# 📝 Comments on connection activity, with threaded replies
+# 📝 Comments on connection activity, with threaded replies.
+#    `path` is the zero-padded ids from the thread root down to the comment, so ordering
+#    by it returns a thread depth-first in display order (see lead_management.comments).
 class ConnectionComment(models.Model):
+    MAX_DEPTH = 20  # replies nested deeper are attached to the deepest allowed ancestor
+
     connection = models.ForeignKey(Connection, on_delete=models.CASCADE, related_name='comments')
     author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     comment = models.TextField()
     parent = models.ForeignKey('self', null=True, blank=True, on_delete=models.CASCADE, related_name='replies')
+    thread = models.ForeignKey('self', null=True, blank=True, on_delete=models.CASCADE, related_name='+')  # root; itself for roots
+    path = models.CharField(max_length=255, blank=True)
+    reply_count = models.IntegerField(default=0)  # on thread roots: replies at any depth
     timestamp = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['connection', 'path'], name='comment_connection_path'),
+            models.Index(fields=['thread', 'path'], name='comment_thread_path'),
+            models.Index(fields=['connection', 'id'], name='comment_connection_id'),  # live feed
+        ]
+
     def __str__(self):
         return f"{self.author.username} - {self.timestamp.strftime('%Y-%m-%d %H:%M')}"
 
+    @property
+    def depth(self):
+        return self.path.count('.')
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            return super().save(*args, **kwargs)
+
+        while self.parent_id and self.parent.depth >= self.MAX_DEPTH - 1:
+            self.parent = self.parent.parent
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            # The path needs the new id, so it is filled in right after the INSERT
+            self.path = f"{self.parent.path}.{self.pk:010d}" if self.parent_id else f"{self.pk:010d}"
+            self.thread_id = self.parent.thread_id if self.parent_id else self.pk
+            ConnectionComment.objects.filter(pk=self.pk).update(path=self.path, thread_id=self.thread_id)
+            if self.parent_id:
+                ConnectionComment.objects.filter(pk=self.thread_id).update(reply_count=models.F('reply_count') + 1)
+
+
+# 📈 Append-only history of Connection.status, one row per transition
+#    (see lead_management.status_events for writing and status_analytics for reading)
+class ConnectionStatusEvent(models.Model):
+    connection = models.ForeignKey(Connection, on_delete=models.CASCADE, related_name='status_events')
+    from_status = models.CharField(max_length=20, blank=True)  # empty for the connection's creation
+    to_status = models.CharField(max_length=20, choices=Connection.STATUS_CHOICES)
+    changed_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    changed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['connection', 'changed_at'], name='status_event_connection'),
+            models.Index(fields=['to_status', 'changed_at'], name='status_event_status'),
+        ]
+
+    def __str__(self):
+        return f"{self.connection_id}: {self.from_status or '—'} → {self.to_status}"
+
 
 # 3️⃣ ColdLead — No response after follow-up
 class ColdLead(models.Model):
@@ -160,6 +266,7 @@ class LinkedInConnection(models.Model):
     first_name = models.CharField(max_length=255)
     last_name = models.CharField(max_length=255)
     linkedin_url = models.URLField(max_length=500)
+    linkedin_key = models.CharField(max_length=255, blank=True, db_index=True, editable=False)  # canonical_url()
     email = models.EmailField(blank=True, null=True)
     company = models.CharField(max_length=255, blank=True, null=True)
     position = models.CharField(max_length=255, blank=True, null=True)
@@ -170,3 +277,7 @@ class LinkedInConnection(models.Model):
     def __str__(self):
         return f"{self.first_name} {self.last_name} - {self.company}"
 
+    def save(self, *args, **kwargs):
+        self.linkedin_key = canonical_url(self.linkedin_url)[:255]
+        super().save(*args, **kwargs)
+
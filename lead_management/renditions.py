@@ -0,0 +1,107 @@
+#
+# File: renditions.py
+# Purpose: Size-bucketed WebP/JPEG renditions of uploaded images (profile photos, chat
+#          screenshots), made lazily the first time a browser asks for one and stored
+#          next to the original so every later page links straight to the small file.
+#
+
+import io
+import posixpath
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.urls import reverse
+
+from .models import ChatScreenshot, Connection, UserProfile
+
+WIDTHS = (160, 320, 640, 1280)
+FULL_WIDTH = WIDTHS[-1]  # what the zoom viewers show instead of the original
+MAX_HEIGHT = 4000  # only width is bucketed; tall phone screenshots keep their aspect ratio
+READY_CACHE_TIMEOUT = 60 * 60 * 24 * 30
+
+# fmt -> (Pillow format, content type, save options)
+FORMATS = {
+    'webp': ('WEBP', 'image/webp', {'quality': 75, 'method': 4}),
+    'jpg': ('JPEG', 'image/jpeg', {'quality': 80, 'optimize': True, 'progressive': True}),
+}
+
+# kind (as used in URLs) -> (model, image field)
+SOURCES = {
+    'connection-photo': (Connection, 'profile_picture'),
+    'user-photo': (UserProfile, 'profile_picture'),
+    'screenshot': (ChatScreenshot, 'image'),
+}
+_KINDS = {(model, field): kind for kind, (model, field) in SOURCES.items()}
+
+
+def rendition_name(name, width, fmt):
+    """'chat_screenshots/a.png' -> 'chat_screenshots/renditions/a-320w.webp'"""
+    directory, filename = posixpath.split(name)
+    stem = posixpath.splitext(filename)[0]
+    return posixpath.join(directory, 'renditions', f"{stem}-{width}w.{fmt}")
+
+
+def ready_key(name, width, fmt):
+    return f"renditions:ready:{name}:{width}:{fmt}"
+
+
+def render(file, width, fmt):
+    """Return the encoded bytes of ``file`` scaled down to at most ``width`` pixels wide."""
+    from PIL import Image, ImageOps
+
+    pil_format, _, options = FORMATS[fmt]
+    with Image.open(file) as image:
+        # Lets the JPEG decoder skip straight to a reduced scale
+        image.draft('RGB', (width, MAX_HEIGHT))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((width, MAX_HEIGHT), Image.LANCZOS)
+        transparent = 'A' in image.getbands() or 'transparency' in image.info
+        mode = 'RGBA' if fmt == 'webp' and transparent else 'RGB'
+        if image.mode != mode:
+            image = image.convert(mode)
+        buffer = io.BytesIO()
+        image.save(buffer, pil_format, **options)
+    return buffer.getvalue()
+
+
+def ensure_rendition(fieldfile, width, fmt):
+    """Storage name of the rendition, generating and storing it if it doesn't exist yet."""
+    # Renditions always go through plain media storage, even for content-addressed originals
+    storage = default_storage
+    name = rendition_name(fieldfile.name, width, fmt)
+    key = ready_key(fieldfile.name, width, fmt)
+    if cache.get(key) or storage.exists(name):
+        cache.set(key, True, READY_CACHE_TIMEOUT)
+        return name
+
+    with fieldfile.open('rb') as file:
+        data = render(file, width, fmt)
+    saved = storage.save(name, ContentFile(data))
+    if saved != name:
+        # Another request stored the same rendition first; keep theirs
+        storage.delete(saved)
+    cache.set(key, True, READY_CACHE_TIMEOUT)
+    return name
+
+
+def kind_for(instance, field_name):
+    return _KINDS[(type(instance), field_name)]
+
+
+def rendition_urls(instance, field_name, fmt):
+    """
+    ``{width: url}`` for every bucket. Renditions already stored link straight to media
+    storage; the rest point at the view that makes them on first request.
+    """
+    fieldfile = getattr(instance, field_name)
+    ready = cache.get_many([ready_key(fieldfile.name, width, fmt) for width in WIDTHS])
+    kind = kind_for(instance, field_name)
+    return {
+        width: (
+            default_storage.url(rendition_name(fieldfile.name, width, fmt))
+            if ready.get(ready_key(fieldfile.name, width, fmt))
+            else reverse('image_rendition', args=[kind, instance.pk, width, fmt])
+        )
+        for width in WIDTHS
+    }
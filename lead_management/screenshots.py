@@ -0,0 +1,54 @@
+#
+# File: screenshots.py
+# Purpose: Attach a batch of uploaded chat screenshots to a connection. Images already
+#          stored (same sha256) reuse their ChatScreenshot row; new files go to
+#          content-addressed storage, and rows and M2M links go in with bulk INSERTs.
+#          Files stored for a batch whose INSERTs then fail are not deleted here (a
+#          concurrent upload may be reusing them); they stay unreferenced and
+#          collect_media_garbage removes them after its grace period.
+#
+
+from django.db import transaction
+
+from .blob_storage import add_refs, hash_content
+from .models import ChatScreenshot, Connection
+
+
+def attach_screenshots(connection, files):
+    """
+    Store ``files`` and link them to ``connection``. Returns ``(screenshots, new_link_ids)``:
+    one ChatScreenshot per distinct image, in upload order, and the ids that weren't
+    linked to the connection before.
+    """
+    field = ChatScreenshot._meta.get_field('image')
+    uploads = {}
+    for file in files:
+        file.sha256 = hash_content(file)
+        uploads.setdefault(file.sha256, file)
+
+    def stored(digest):
+        shot, file = ChatScreenshot(sha256=digest), uploads[digest]
+        shot.image = field.storage.save(field.generate_filename(shot, file.name), file, max_length=field.max_length)
+        return shot
+
+    known = set(ChatScreenshot.objects.filter(sha256__in=uploads).values_list('sha256', flat=True))
+    new = [stored(digest) for digest in uploads if digest not in known]
+
+    with transaction.atomic():
+        # A concurrent upload of the same image may have inserted its row meanwhile
+        ChatScreenshot.objects.bulk_create(new, ignore_conflicts=True)
+        shots = {shot.sha256: shot for shot in ChatScreenshot.objects.filter(sha256__in=uploads)}
+        lost = [stored(digest) for digest in uploads if digest not in shots]
+        if lost:
+            # collect_media_garbage removed an orphaned row found above; store those images again
+            ChatScreenshot.objects.bulk_create(lost, ignore_conflicts=True)
+            shots = {shot.sha256: shot for shot in ChatScreenshot.objects.filter(sha256__in=uploads)}
+        Link = Connection.chat_screenshots.through
+        linked = set(
+            Link.objects.filter(connection_id=connection.pk, chatscreenshot_id__in=[s.pk for s in shots.values()])
+            .values_list('chatscreenshot_id', flat=True)
+        )
+        new_links = [shot for shot in shots.values() if shot.pk not in linked]
+        Link.objects.bulk_create([Link(connection_id=connection.pk, chatscreenshot_id=shot.pk) for shot in new_links])
+        add_refs([shot.image.name for shot in new_links])
+    return [shots[digest] for digest in uploads], {shot.pk for shot in new_links}
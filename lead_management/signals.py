@@ -1,6 +1,13 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save, pre_delete
 from django.dispatch import receiver
-from .models import CustomUser, UserProfile
+from .blob_storage import add_refs, release_refs
+from .comments import invalidate as invalidate_comments, invalidate_authors
+from .linkedin_urls import url_added
+from .models import ChatScreenshot, Connection, ConnectionComment, CustomUser, LinkedInConnection, OutreachLead, UserProfile
+from .status_events import record as record_status_events
+from .user_cache import invalidate_user, invalidate_teams
 
 @receiver(post_save, sender=CustomUser)
 def create_user_profile(sender, instance, created, **kwargs):
@@ -8,5 +15,100 @@ def create_user_profile(sender, instance, created, **kwargs):
         UserProfile.objects.create(user=instance)
 
 @receiver(post_save, sender=CustomUser)
-def save_user_profile(sender, instance, **kwargs):
-    instance.userprofile.save()
+@receiver(post_delete, sender=CustomUser)
+def invalidate_cached_user(sender, instance, update_fields=None, **kwargs):
+    invalidate_user(instance.pk)
+    # A login only bumps last_login, which cannot change team membership
+    if not update_fields or set(update_fields) - {'last_login'}:
+        invalidate_teams()
+        invalidate_authors()
+
+# 💬 After commit, so a page rendered meanwhile can't be cached under the new version
+@receiver(post_save, sender=ConnectionComment)
+def invalidate_rendered_comments(sender, instance, **kwargs):
+    transaction.on_commit(lambda: invalidate_comments(instance.connection_id))
+
+@receiver(post_delete, sender=ConnectionComment)
+def forget_deleted_comment(sender, instance, **kwargs):
+    if instance.parent_id:
+        ConnectionComment.objects.filter(pk=instance.thread_id).update(reply_count=F('reply_count') - 1)
+    transaction.on_commit(lambda: invalidate_comments(instance.connection_id))
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def invalidate_cached_profile(sender, instance, **kwargs):
+    invalidate_user(instance.user_id)
+    invalidate_teams()
+
+# 🗄️ StoredBlob.ref_count — one reference per connection using a PDF or screenshot.
+#    Paths that skip signals (bulk inserts, raw SQL) are reconciled by collect_media_garbage.
+@receiver(post_init, sender=Connection)
+def remember_profile_pdf(sender, instance, **kwargs):
+    if instance.pk is None:
+        instance._stored_profile_pdf = ''
+    else:
+        # None when the field was deferred, so nothing is known to compare against
+        instance._stored_profile_pdf = (instance.__dict__.get('profile_pdf') or '') if 'profile_pdf' in instance.__dict__ else None
+    instance._stored_status = '' if instance.pk is None else instance.__dict__.get('status')
+
+# 📈 Every status a connection is saved with goes into its status history
+@receiver(post_save, sender=Connection)
+def log_status_change(sender, instance, created, **kwargs):
+    if 'status' not in instance.__dict__ or (not created and instance._stored_status is None):
+        return
+    if instance.status != instance._stored_status:
+        record_status_events([(instance.pk, instance._stored_status, instance.status)])
+        instance._stored_status = instance.status
+
+@receiver(post_save, sender=Connection)
+def count_profile_pdf(sender, instance, **kwargs):
+    if instance._stored_profile_pdf is None or 'profile_pdf' not in instance.__dict__:
+        return
+    current = instance.profile_pdf.name or ''
+    if current != instance._stored_profile_pdf:
+        add_refs([current])
+        release_refs([instance._stored_profile_pdf])
+        instance._stored_profile_pdf = current
+
+@receiver(pre_delete, sender=Connection)
+def collect_connection_blobs(sender, instance, **kwargs):
+    instance._released_blobs = [instance.profile_pdf.name] + list(
+        instance.chat_screenshots.values_list('image', flat=True)
+    )
+
+@receiver(post_delete, sender=Connection)
+def release_connection_blobs(sender, instance, **kwargs):
+    release_refs(getattr(instance, '_released_blobs', []))
+
+@receiver(pre_delete, sender=ChatScreenshot)
+def count_deleted_screenshot_links(sender, instance, **kwargs):
+    instance._link_count = instance.connections.count()
+
+@receiver(post_delete, sender=ChatScreenshot)
+def release_deleted_screenshot(sender, instance, **kwargs):
+    if instance._link_count:
+        release_refs([instance.image.name], count=instance._link_count)
+
+def _linked_screenshot_names(instance, reverse, pk_set):
+    """``(names, count)`` touched by a chat_screenshots change, from either side."""
+    if reverse:
+        return [instance.image.name], len(pk_set)
+    return list(ChatScreenshot.objects.filter(pk__in=pk_set).values_list('image', flat=True)), 1
+
+@receiver(m2m_changed, sender=Connection.chat_screenshots.through)
+def count_screenshot_links(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear':
+        related = instance.connections if reverse else instance.chat_screenshots
+        instance._cleared_links = set(related.values_list('pk', flat=True))
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        pk_set = instance.__dict__.pop('_cleared_links', set()) if action == 'post_clear' else pk_set
+        if pk_set:
+            names, count = _linked_screenshot_names(instance, reverse, pk_set)
+            (add_refs if action == 'post_add' else release_refs)(names, count=count)
+
+# 🔗 New profile URLs join the in-process duplicate-check set once committed
+@receiver(post_save, sender=OutreachLead)
+@receiver(post_save, sender=LinkedInConnection)
+def remember_linkedin_url(sender, instance, **kwargs):
+    key = instance.linkedin_key
+    transaction.on_commit(lambda: url_added(key))
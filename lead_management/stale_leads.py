@@ -0,0 +1,64 @@
+#
+# File: stale_leads.py
+# Purpose: Move aging outreach to cold. Outreach leads that never turned into a
+#          connection become `cold`; connections stalled in an early status become
+#          `cold_lead` with their ColdLead row. Rows are selected with indexed date-range
+#          queries and moved in bounded chunks of batched UPDATEs, so re-running is safe.
+#
+
+from django.utils import timezone
+
+from .connection_status import set_status
+from .models import ColdLead, Connection, OutreachLead
+
+BATCH_SIZE = 500
+
+
+def _id_chunks(queryset, batch_size):
+    """Primary keys of ``queryset`` in ascending chunks of at most ``batch_size``."""
+    last = 0
+    while True:
+        ids = list(queryset.filter(pk__gt=last).order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return
+        yield ids
+        last = ids[-1]
+
+
+def stale_leads(cutoff):
+    return OutreachLead.objects.filter(status='connection_sent', date_added__lt=cutoff, connection__isnull=True)
+
+
+def stalled_connections(cutoff):
+    return Connection.objects.filter(status__in=Connection.STALLED_STATUSES, updated_at__lt=cutoff)
+
+
+def sweep(lead_age=OutreachLead.STALE_AFTER, connection_age=Connection.STALE_AFTER, batch_size=BATCH_SIZE, dry_run=False):
+    """
+    Returns ``(leads, connections, cold_rows)``: leads marked cold, connections moved
+    to cold_lead, and missing ColdLead rows of connections that were already cold.
+    """
+    now = timezone.now()
+    leads = connections = cold_rows = 0
+
+    for ids in _id_chunks(stale_leads(now - lead_age), batch_size):
+        # The filters are repeated so a row that changed since it was selected is left alone
+        leads += len(ids) if dry_run else stale_leads(now - lead_age).filter(pk__in=ids).update(status='cold', updated_at=now)
+
+    for ids in _id_chunks(stalled_connections(now - connection_age), batch_size):
+        # set_status also logs the transitions and creates the ColdLead rows
+        connections += len(ids) if dry_run else len(
+            set_status(stalled_connections(now - connection_age).filter(pk__in=ids), 'cold_lead')
+        )
+
+    if not dry_run:
+        # Left behind by a failed run or a change made outside set_status
+        for ids in _id_chunks(Connection.objects.filter(status='cold_lead', coldlead__isnull=True), batch_size):
+            cold_rows += _create_cold_rows(Connection.objects.filter(pk__in=ids))
+    return leads, connections, cold_rows
+
+
+def _create_cold_rows(connections):
+    missing = list(connections.filter(status='cold_lead', coldlead__isnull=True).values_list('pk', flat=True))
+    ColdLead.objects.bulk_create([ColdLead(connection_id=pk) for pk in missing], ignore_conflicts=True)
+    return len(missing)
@@ -0,0 +1,123 @@
+#
+# File: status_analytics.py
+# Purpose: Funnel numbers from the ConnectionStatusEvent history: how long connections
+#          sit in each status, how many ever reach each status, how long the way from
+#          one status to another takes, and which connections have stalled. Results are
+#          cached for a few minutes per set of builders, like the other analytics pages.
+#
+
+import hashlib
+from datetime import timedelta
+from statistics import median
+
+from django.core.cache import cache
+from django.db.models import Count, F, Max, Min, Q, Window
+from django.db.models.functions import Lead
+from django.utils import timezone
+
+from .models import Connection, ConnectionStatusEvent
+
+ANALYTICS_CACHE_TIMEOUT = 60 * 10
+STALLED_AFTER = timedelta(days=7)  # in an early status without a change for this long
+STALLED_LIMIT = 50
+
+
+def _days(delta):
+    return round(delta.total_seconds() / 86400, 1)
+
+
+def _events(builder_ids, since):
+    events = ConnectionStatusEvent.objects.filter(connection__added_by_id__in=builder_ids)
+    if since is not None:
+        # A cohort of connections, so each one's history is complete
+        events = events.filter(connection__date_connected__gte=since)
+    return events
+
+
+def time_in_status(builder_ids, since=None):
+    """``{status: {'count', 'median_days', 'mean_days'}}``; a current status counts up to now."""
+    now = timezone.now()
+    spans = _events(builder_ids, since).annotate(
+        left_at=Window(Lead('changed_at'), partition_by=[F('connection_id')], order_by=[F('changed_at').asc(), F('id').asc()]),
+    ).values_list('to_status', 'changed_at', 'left_at')
+
+    durations = {}
+    for status, entered, left in spans:
+        durations.setdefault(status, []).append(((left or now) - entered).total_seconds() / 86400)
+    return {
+        status: {
+            'count': len(days),
+            'median_days': round(median(days), 1),
+            'mean_days': round(sum(days) / len(days), 1),
+        }
+        for status, days in durations.items()
+    }
+
+
+def conversion_rates(builder_ids, since=None):
+    """``{status: {'reached', 'rate'}}``: connections that were ever in each status."""
+    connections = Connection.objects.filter(added_by_id__in=builder_ids)
+    if since is not None:
+        connections = connections.filter(date_connected__gte=since)
+    total = connections.count()
+    reached = _events(builder_ids, since).aggregate(**{
+        status: Count('connection', distinct=True, filter=Q(to_status=status))
+        for status, _ in Connection.STATUS_CHOICES
+    })
+    return {
+        status: {'reached': count, 'rate': round(100 * count / total, 1) if total else 0.0}
+        for status, count in reached.items()
+    }
+
+
+def days_between(builder_ids, from_status, to_status, since=None):
+    """Median days from first reaching ``from_status`` to first reaching ``to_status`` after it."""
+    firsts = _events(builder_ids, since).values('connection_id').annotate(
+        start=Min('changed_at', filter=Q(to_status=from_status)),
+        end=Min('changed_at', filter=Q(to_status=to_status)),
+    ).filter(start__isnull=False, end__isnull=False)
+    days = [_days(row['end'] - row['start']) for row in firsts if row['end'] >= row['start']]
+    return {'count': len(days), 'median_days': median(days) if days else None}
+
+
+def stalled_connections(builder_ids, older_than=STALLED_AFTER, limit=STALLED_LIMIT):
+    """Connections still in an early status whose last status change is older than ``older_than``."""
+    cutoff = timezone.now() - older_than
+    rows = (
+        Connection.objects.filter(added_by_id__in=builder_ids, status__in=Connection.STALLED_STATUSES)
+        .annotate(status_since=Max('status_events__changed_at'))
+        .filter(status_since__lt=cutoff)
+        .order_by('status_since')
+        .values('id', 'full_name', 'status', 'status_since')[:limit]
+    )
+    labels = dict(Connection.STATUS_CHOICES)
+    now = timezone.now()
+    return [
+        {**row, 'status_label': labels.get(row['status'], row['status']), 'days': _days(now - row['status_since'])}
+        for row in rows
+    ]
+
+
+def pipeline_summary(builder_ids, since_days=None):
+    """Everything the analytics pages show, cached for ``ANALYTICS_CACHE_TIMEOUT``."""
+    builder_ids = sorted(builder_ids)
+    scope = hashlib.md5(f"{builder_ids}:{since_days}".encode()).hexdigest()
+    key = f"status-analytics:{scope}"
+    summary = cache.get(key)
+    if summary is None:
+        since = timezone.now() - timedelta(days=since_days) if since_days else None
+        labels = dict(Connection.STATUS_CHOICES)
+        durations = time_in_status(builder_ids, since)
+        rates = conversion_rates(builder_ids, since)
+        summary = {
+            'statuses': [
+                {'status': status, 'label': labels[status], **rates[status],
+                 **durations.get(status, {'count': 0, 'median_days': None, 'mean_days': None})}
+                for status in labels
+            ],
+            'connected_to_interested': days_between(builder_ids, 'connected', 'interested', since),
+            'stalled': stalled_connections(builder_ids),
+            'generated_at': timezone.now(),
+        }
+        cache.set(key, summary, ANALYTICS_CACHE_TIMEOUT)
+    return summary
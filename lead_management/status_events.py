@@ -0,0 +1,23 @@
+#
+# File: status_events.py
+# Purpose: Write ConnectionStatusEvent rows. Saves through the ORM are logged by the
+#          Connection signals; paths that change status with .update() (bulk changes,
+#          the stale-lead sweep) log their transitions here in one INSERT.
+#
+
+from django.utils import timezone
+
+from .models import ConnectionStatusEvent
+
+
+def record(transitions, changed_by=None, at=None):
+    """Log ``(connection_id, from_status, to_status)`` transitions; unchanged ones are skipped."""
+    at = at or timezone.now()
+    ConnectionStatusEvent.objects.bulk_create([
+        ConnectionStatusEvent(
+            connection_id=connection_id, from_status=from_status or '', to_status=to_status,
+            changed_by=changed_by, changed_at=at,
+        )
+        for connection_id, from_status, to_status in transitions
+        if from_status != to_status
+    ])
@@ -0,0 +1,25 @@
+from django import template
+from django.forms.utils import flatatt
+from django.utils.html import format_html
+
+from ..renditions import FULL_WIDTH, rendition_urls
+
+register = template.Library()
+
+
+def _srcset(urls):
+    return ", ".join(f"{url} {width}w" for width, url in urls.items())
+
+
+# ✅ {% responsive_image ss 'image' sizes="25vw" class="img-fluid" %} -> lazy <picture> with
+#    WebP and JPEG srcsets; data-full holds the large rendition for zoom viewers
+@register.simple_tag
+def responsive_image(instance, field_name, sizes='100vw', **attrs):
+    webp = rendition_urls(instance, field_name, 'webp')
+    jpg = rendition_urls(instance, field_name, 'jpg')
+    attrs = {'loading': 'lazy', 'decoding': 'async', **{k.replace('_', '-'): v for k, v in attrs.items()}}
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" data-full="{}"{}></picture>',
+        _srcset(webp), sizes, jpg[640], _srcset(jpg), sizes, webp[FULL_WIDTH], flatatt(attrs),
+    )
@@ -0,0 +1,11 @@
+from django import template
+
+from ..vendor_assets import vendor_url as _vendor_url
+
+register = template.Library()
+
+
+# ✅ {% vendor_url 'chart.js' %} -> self-hosted URL for a pinned third-party asset
+@register.simple_tag
+def vendor_url(name):
+    return _vendor_url(name)
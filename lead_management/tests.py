@@ -1,3 +1,989 @@
-from django.test import TestCase
+import asyncio
+import io
+import json
+import shutil
+import tempfile
+from datetime import timedelta
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import transaction
+from django.http import Http404
+from django.test import AsyncRequestFactory, Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from . import (
+    blob_storage, checks, comments, linkedin_urls, renditions, screenshots, status_analytics, user_cache, vendor_assets,
+)
+from .backends import CachedModelBackend
+from .connection_status import MAX_BULK, set_status
+from .forms import ChatScreenshotUploadForm
+from .models import (
+    ChatScreenshot, ColdLead, Connection, ConnectionComment, ConnectionStatusEvent, CustomUser, OutreachLead, StoredBlob,
+)
+from .stale_leads import sweep
+from .views import comments as comment_views
+
+
+def create_connection(builder, name='Jane Doe', **fields):
+    slug = name.lower().replace(' ', '-')
+    lead = OutreachLead.objects.create(linkedin_url=f'https://linkedin.com/in/{slug}', full_name=name, added_by=builder)
+    return Connection.objects.create(outreach_lead=lead, full_name=name, added_by=builder, **fields)
+
+
+class StatusEventTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.builder = CustomUser.objects.create_user('builder', 'builder@example.com', 'pw', role='community_builder')
+
+    def create_connection(self, name='Jane Doe', **fields):
+        return create_connection(self.builder, name, **fields)
+
+    def history(self, connection):
+        return list(connection.status_events.order_by('changed_at', 'id').values_list('from_status', 'to_status'))
+
+    def test_creation_is_logged(self):
+        connection = self.create_connection()
+        self.assertEqual(self.history(connection), [('', 'connected')])
+
+    def test_save_logs_only_real_changes(self):
+        connection = self.create_connection()
+        connection.status = 'info_shared'
+        connection.save()
+        connection.full_name = 'Jane Q. Doe'
+        connection.save()
+        connection.status = 'F1'
+        connection.save(update_fields=['status'])
+        self.assertEqual(self.history(connection), [('', 'connected'), ('connected', 'info_shared'), ('info_shared', 'F1')])
+
+    def test_reloaded_instance_compares_against_stored_status(self):
+        connection = self.create_connection()
+        Connection.objects.filter(pk=connection.pk).update(status='F2')
+        reloaded = Connection.objects.get(pk=connection.pk)
+        reloaded.status = 'interested'
+        reloaded.save()
+        self.assertEqual(self.history(connection)[-1], ('F2', 'interested'))
+
+    def test_deferred_status_is_not_logged(self):
+        connection = self.create_connection()
+        deferred = Connection.objects.only('full_name').get(pk=connection.pk)
+        deferred.full_name = 'Someone Else'
+        deferred.save()
+        self.assertEqual(len(self.history(connection)), 1)
+
+    def test_set_status_logs_each_changed_connection(self):
+        first, second = self.create_connection(), self.create_connection('John Roe', status='interested')
+        changed = set_status(Connection.objects.filter(pk__in=[first.pk, second.pk]), 'interested', changed_by=self.builder)
+        self.assertEqual(changed, [first.pk])
+        self.assertEqual(self.history(first)[-1], ('connected', 'interested'))
+        self.assertEqual(self.history(second), [('', 'interested')])
+        self.assertEqual(ConnectionStatusEvent.objects.get(connection=first, to_status='interested').changed_by, self.builder)
+
+    def test_set_status_rejects_unknown_status(self):
+        with self.assertRaises(ValueError):
+            set_status(Connection.objects.all(), 'bogus')
+
+    def test_set_status_to_cold_lead_creates_cold_rows(self):
+        connection = self.create_connection()
+        set_status(Connection.objects.filter(pk=connection.pk), 'cold_lead')
+        self.assertTrue(ColdLead.objects.filter(connection=connection).exists())
+
+    def test_sweep_logs_stalled_connections(self):
+        stalled, fresh = self.create_connection(), self.create_connection('John Roe')
+        Connection.objects.filter(pk=stalled.pk).update(updated_at=timezone.now() - Connection.STALE_AFTER - timedelta(days=1))
+        self.assertEqual(sweep(), (0, 1, 0))
+        self.assertEqual(self.history(stalled)[-1], ('connected', 'cold_lead'))
+        self.assertEqual(len(self.history(fresh)), 1)
+        # Re-running finds nothing left to do
+        self.assertEqual(sweep(), (0, 0, 0))
+
+    def test_analytics_follow_the_history(self):
+        connection = self.create_connection()
+        self.create_connection('John Roe')
+        start = timezone.now() - timedelta(days=10)
+        ConnectionStatusEvent.objects.filter(connection=connection).update(changed_at=start)
+        ConnectionStatusEvent.objects.create(
+            connection=connection, from_status='connected', to_status='interested', changed_at=start + timedelta(days=4),
+        )
+        rates = status_analytics.conversion_rates([self.builder.pk])
+        self.assertEqual(rates['connected'], {'reached': 2, 'rate': 100.0})
+        self.assertEqual(rates['interested'], {'reached': 1, 'rate': 50.0})
+        self.assertEqual(status_analytics.days_between([self.builder.pk], 'connected', 'interested'),
+                         {'count': 1, 'median_days': 4.0})
+        self.assertEqual(status_analytics.time_in_status([self.builder.pk])['interested']['count'], 1)
+
+    def test_stalled_list_and_cached_summary(self):
+        self.addCleanup(cache.clear)
+        stalled, moved_on = self.create_connection(), self.create_connection('John Roe', status='interested')
+        self.create_connection('Jim Poe')
+        other = CustomUser.objects.create_user('other', 'other@example.com', 'pw', role='community_builder')
+        theirs = create_connection(other, 'Ann Lee')
+        long_ago = timezone.now() - status_analytics.STALLED_AFTER - timedelta(days=1)
+        ConnectionStatusEvent.objects.filter(connection__in=[stalled, moved_on, theirs]).update(changed_at=long_ago)
+
+        rows = status_analytics.stalled_connections([self.builder.pk])
+        self.assertEqual([(row['id'], row['status_label'], row['days']) for row in rows], [(stalled.pk, 'Connected', 8.0)])
+
+        summary = status_analytics.pipeline_summary([self.builder.pk])
+        self.assertEqual([row['id'] for row in summary['stalled']], [stalled.pk])
+        with self.assertNumQueries(0):
+            self.assertEqual(status_analytics.pipeline_summary([self.builder.pk]), summary)
+
+
+class MediaViewTests(TestCase):
+    PHOTO = 'profile_photos/jane.jpg'
+    PICTURE = 'profile_pics/staff.png'
+    BODY = bytes(range(256)) * 40  # 10 KiB
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.media_root = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, cls.media_root)
+        for name in (cls.PHOTO, cls.PICTURE):
+            path = Path(cls.media_root, name)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(cls.BODY)
+        cls.enterClassContext(override_settings(MEDIA_ROOT=cls.media_root, MEDIA_SENDFILE_BACKEND=None))
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.builder = CustomUser.objects.create_user('builder', 'builder@example.com', 'pw', role='community_builder')
+        cls.other = CustomUser.objects.create_user('other', 'other@example.com', 'pw', role='community_builder')
+        create_connection(cls.builder, profile_picture=cls.PHOTO)
+
+    def setUp(self):
+        self.addCleanup(cache.clear)
+        self.client.force_login(self.builder)
+
+    def get(self, name, **headers):
+        return self.client.get(f'/media/{name}', headers=headers)
+
+    def test_owner_gets_the_file(self):
+        response = self.get(self.PHOTO)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.BODY)
+        self.assertEqual(response['Content-Length'], str(len(self.BODY)))
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+
+    def test_other_builder_gets_404(self):
+        self.client.force_login(self.other)
+        self.assertEqual(self.get(self.PHOTO).status_code, 404)
+        # Staff profile pictures are visible to everyone signed in
+        self.assertEqual(self.get(self.PICTURE).status_code, 200)
+
+    def test_anonymous_is_redirected(self):
+        self.client.logout()
+        self.assertEqual(self.get(self.PICTURE).status_code, 302)
+
+    def test_missing_and_escaping_paths_get_404(self):
+        self.assertEqual(self.get('profile_pics/missing.png').status_code, 404)
+        self.assertEqual(self.get('../settings.py').status_code, 404)
+
+    def test_matching_etag_gets_304(self):
+        etag = self.get(self.PICTURE)['ETag']
+        self.assertEqual(self.get(self.PICTURE, if_none_match=etag).status_code, 304)
+
+    def test_range_gets_206(self):
+        response = self.get(self.PICTURE, range='bytes=100-199')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 100-199/{len(self.BODY)}')
+        self.assertEqual(b''.join(response.streaming_content), self.BODY[100:200])
+
+    def test_suffix_range(self):
+        response = self.get(self.PICTURE, range='bytes=-10')
+        self.assertEqual(b''.join(response.streaming_content), self.BODY[-10:])
+
+    def test_unsatisfiable_range_gets_416(self):
+        response = self.get(self.PICTURE, range=f'bytes={len(self.BODY)}-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(self.BODY)}')
+
+    def test_stale_if_range_sends_the_whole_file(self):
+        response = self.get(self.PICTURE, range='bytes=0-9', if_range='"stale"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.BODY)
+
+    def test_current_if_range_keeps_the_range(self):
+        etag = self.get(self.PICTURE)['ETag']
+        self.assertEqual(self.get(self.PICTURE, range='bytes=0-9', if_range=etag).status_code, 206)
+
+
+class AsyncMediaViewTests(MediaViewTests):
+    """The same requests through the ASGI handler, which gets an async, chunked body."""
+
+    def setUp(self):
+        super().setUp()
+        self.client = self.async_client
+        self.client.force_login(self.builder)
+
+    def get(self, name, **headers):
+        response = async_to_sync(self.client.get)(f'/media/{name}', headers=headers)
+        if response.streaming:
+            self.assertTrue(response.is_async)
+            response.streaming_content = async_to_sync(self.collect)(response)
+        return response
+
+    @staticmethod
+    async def collect(response):
+        return [chunk async for chunk in response.streaming_content]
+
+    def test_large_file_is_sent_in_chunks(self):
+        from .views.media import CHUNK_SIZE
+
+        path = Path(self.media_root, 'profile_pics/large.bin')
+        path.write_bytes(b'x' * (CHUNK_SIZE * 2 + 1))
+        response = self.get('profile_pics/large.bin')
+        self.assertEqual([len(chunk) for chunk in response.streaming_content], [CHUNK_SIZE, CHUNK_SIZE, 1])
+
+
+class SharedCacheCheckTests(TestCase):
+    LOCMEM = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+    REDIS = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://cache:6379'}}
+
+    def ids(self):
+        return [message.id for message in checks.check_shared_cache(None)]
+
+    def test_process_local_cache_is_an_error_outside_debug(self):
+        with override_settings(CACHES=self.LOCMEM, DEBUG=False):
+            self.assertEqual(self.ids(), ['lead_management.E003'])
+
+    def test_process_local_cache_is_fine_in_debug(self):
+        with override_settings(CACHES=self.LOCMEM, DEBUG=True):
+            self.assertEqual(self.ids(), [])
+
+    def test_shared_cache_passes(self):
+        with override_settings(CACHES=self.REDIS, DEBUG=False):
+            self.assertEqual(self.ids(), [])
+
+
+class UserCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.manager = CustomUser.objects.create_user('manager', 'manager@example.com', 'pw', role='project_manager')
+        self.builder = CustomUser.objects.create_user('builder', 'builder@example.com', 'pw', role='community_builder')
+
+    def join_team(self, builder, manager):
+        profile = builder.userprofile
+        profile.project_manager = manager
+        profile.save()
+
+    def test_user_and_profile_come_from_the_cache(self):
+        user = user_cache.get_cached_user(self.builder.pk)
+        self.assertEqual(user.userprofile.user_id, self.builder.pk)
+        with self.assertNumQueries(0):
+            cached = CachedModelBackend().get_user(self.builder.pk)
+            self.assertEqual(cached.userprofile.job_status, 'full_time')
+        self.assertIsNone(user_cache.get_cached_user(self.builder.pk + 1000))
+
+    def test_deactivated_users_are_signed_out_at_once(self):
+        self.client.force_login(self.builder)
+        self.assertEqual(self.client.get(reverse('dashboard'))['Location'], reverse('builder_dashboard'))
+        self.builder.is_active = False
+        self.builder.save()
+        self.assertTrue(self.client.get(reverse('dashboard'))['Location'].startswith(reverse('login')))
+
+    def test_password_change_ends_other_sessions(self):
+        self.client.force_login(self.builder)
+        self.client.get(reverse('dashboard'))
+        self.builder.set_password('new password')
+        self.builder.save()
+        self.assertTrue(self.client.get(reverse('dashboard'))['Location'].startswith(reverse('login')))
+
+    def test_team_changes_reach_cached_team_lookups(self):
+        self.assertEqual(user_cache.get_team_builder_ids(self.manager), [])
+        self.join_team(self.builder, self.manager)
+        self.assertEqual(user_cache.get_team_builder_ids(self.manager), [self.builder.pk])
+        with self.assertNumQueries(0):
+            user_cache.get_team_builder_ids(self.manager)
+
+        # A role change takes the builder off the team, even though the profile is untouched
+        self.builder.role = 'editor'
+        self.builder.save()
+        self.assertEqual(user_cache.get_team_builder_ids(self.manager), [])
+
+    def test_login_keeps_team_lookups_cached(self):
+        self.join_team(self.builder, self.manager)
+        user_cache.get_team_builder_ids(self.manager)
+        self.client.force_login(self.builder)
+        with self.assertNumQueries(0):
+            self.assertEqual(user_cache.get_team_builder_ids(self.manager), [self.builder.pk])
+
+
+class VendorStaticTests(TestCase):
+    BODY = b'/* pinned */'
+    URL = 'https://cdn.example.com/pinned.js'
+
+    def setUp(self):
+        self.static_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.static_dir)
+        self.enterContext(override_settings(STATICFILES_DIRS=[self.static_dir]))
+        self.urlopen = self.enterContext(
+            mock.patch('lead_management.management.commands.vendor_static.urlopen', return_value=io.BytesIO(self.BODY))
+        )
+        self.target = Path(self.static_dir, 'vendor/pinned.js')
+
+    def vendor(self, digest, *args):
+        assets = {'pinned.js': ('vendor/pinned.js', self.URL, digest)}
+        with mock.patch('lead_management.management.commands.vendor_static.VENDOR_ASSETS', assets):
+            call_command('vendor_static', *args, stdout=io.StringIO())
+
+    def test_integrity_is_sri_sha384(self):
+        # sha384 of the empty string
+        self.assertEqual(vendor_assets.integrity(b''),
+                         'sha384-OLBgp1GsljhM2TJ+sbHjaiH9txEUvgdDTAzHv2P24donTt6/529l+9Ua0vFImLlb')
+
+    def test_matching_download_is_written(self):
+        self.vendor(vendor_assets.integrity(self.BODY))
+        self.assertEqual(self.target.read_bytes(), self.BODY)
+        self.urlopen.assert_called_once()
+
+    def test_mismatching_download_is_refused(self):
+        with self.assertRaisesMessage(CommandError, 'does not match its pinned digest'):
+            self.vendor(vendor_assets.integrity(b'something else'))
+        self.assertFalse(self.target.exists())
+
+    def test_asset_without_digest_is_refused(self):
+        with self.assertRaisesMessage(CommandError, 'has no pinned digest'):
+            self.vendor(None)
+        self.urlopen.assert_not_called()
+
+    def test_existing_file_is_verified(self):
+        self.target.parent.mkdir(parents=True)
+        self.target.write_bytes(b'tampered')
+        with self.assertRaisesMessage(CommandError, 'does not match the pinned digest'):
+            self.vendor(vendor_assets.integrity(self.BODY))
+        self.urlopen.assert_not_called()
+        self.vendor(vendor_assets.integrity(self.BODY), '--force')
+        self.assertEqual(self.target.read_bytes(), self.BODY)
+
+    def test_print_integrity_writes_nothing(self):
+        out = io.StringIO()
+        assets = {'pinned.js': ('vendor/pinned.js', self.URL, None)}
+        with mock.patch('lead_management.management.commands.vendor_static.VENDOR_ASSETS', assets):
+            call_command('vendor_static', '--print-integrity', stdout=out)
+        self.assertIn(vendor_assets.integrity(self.BODY), out.getvalue())
+        self.assertFalse(self.target.exists())
+
+    def test_missing_assets_are_an_error_only_outside_debug(self):
+        with mock.patch('lead_management.vendor_assets.missing_assets', return_value=['chart.js']):
+            self.assertEqual([m.id for m in checks.check_vendored_assets(None)], ['lead_management.W002'])
+            with override_settings(DEBUG=False):
+                self.assertEqual([m.id for m in checks.check_vendored_assets_deployed(None)], ['lead_management.E002'])
+            with override_settings(DEBUG=True):
+                self.assertEqual(checks.check_vendored_assets_deployed(None), [])
+
+
+class BlobStorageTests(TestCase):
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+        self.addCleanup(cache.clear)
+        self.builder = CustomUser.objects.create_user('builder', 'builder@example.com', 'pw', role='community_builder')
+        self.first = create_connection(self.builder)
+        self.second = create_connection(self.builder, 'John Roe')
+
+    def upload(self, connection, body=b'screenshot', name='chat.png'):
+        shots, _ = screenshots.attach_screenshots(connection, [SimpleUploadedFile(name, body)])
+        return shots[0]
+
+    def blob(self, name):
+        return StoredBlob.objects.get(name=name)
+
+    def exists(self, name):
+        return blob_storage.content_addressed_storage.exists(name)
+
+    def test_same_image_is_stored_once_and_counted_per_connection(self):
+        shot = self.upload(self.first, name='a.png')
+        self.assertEqual(self.upload(self.second, name='b.png'), shot)
+        self.assertTrue(blob_storage.is_blob_name(shot.image.name))
+        self.assertEqual(self.blob(shot.image.name).ref_count, 2)
+        # Uploading it again to the same connection adds no reference
+        self.upload(self.first)
+        self.assertEqual(self.blob(shot.image.name).ref_count, 2)
+
+    def test_deleting_a_connection_releases_its_references(self):
+        shot = self.upload(self.first)
+        self.upload(self.second)
+        self.first.delete()
+        self.assertEqual(self.blob(shot.image.name).ref_count, 1)
+
+    def test_replacing_a_profile_pdf_moves_the_reference(self):
+        self.first.profile_pdf = SimpleUploadedFile('cv.pdf', b'%PDF first')
+        self.first.save()
+        old = self.first.profile_pdf.name
+        self.first.profile_pdf = SimpleUploadedFile('cv.pdf', b'%PDF second')
+        self.first.save()
+        self.assertEqual((self.blob(old).ref_count, self.blob(self.first.profile_pdf.name).ref_count), (0, 1))
+        self.assertEqual(blob_storage.recount_refs(), 0)
+
+    def test_recount_repairs_drifted_counts(self):
+        shot = self.upload(self.first)
+        StoredBlob.objects.update(ref_count=5)
+        self.assertEqual(blob_storage.recount_refs(), 1)
+        self.assertEqual(self.blob(shot.image.name).ref_count, 1)
+
+    def test_collects_only_unreferenced_blobs_past_the_grace_period(self):
+        kept = self.upload(self.first, b'kept').image.name
+        orphan = self.upload(self.second, b'orphan').image.name
+        self.second.delete()
+        self.assertEqual(blob_storage.collect_garbage(dry_run=True), (0, 0, 0))
+        self.assertEqual(blob_storage.collect_garbage(grace=timedelta(0), dry_run=True), (1, 1, len(b'orphan')))
+        self.assertTrue(self.exists(orphan))
+
+        self.assertEqual(blob_storage.collect_garbage(grace=timedelta(0)), (1, 1, len(b'orphan')))
+        self.assertFalse(self.exists(orphan))
+        self.assertFalse(StoredBlob.objects.filter(name=orphan).exists())
+        self.assertTrue(self.exists(kept))
+
+    def test_saving_collected_content_writes_it_again(self):
+        name = self.upload(self.first).image.name
+        self.first.delete()
+        blob_storage.collect_garbage(grace=timedelta(0))
+        again = SimpleUploadedFile('again.png', b'screenshot')
+        self.assertEqual(blob_storage.content_addressed_storage.save('chat_screenshots/again.png', again), name)
+        self.assertTrue(self.exists(name))
+        self.assertEqual(self.blob(name).ref_count, 0)
+
+    def test_attach_survives_collection_of_a_reused_orphan(self):
+        name = self.upload(self.first).image.name
+        self.first.delete()
+
+        def collect_then_atomic(*args, **kwargs):
+            # The orphaned row and its file go between the lookup and the INSERTs
+            blob_storage.collect_garbage(grace=timedelta(0))
+            return transaction.atomic(*args, **kwargs)
+
+        with mock.patch.object(screenshots, 'transaction', SimpleNamespace(atomic=collect_then_atomic)):
+            shot = self.upload(self.second)
+        self.assertEqual(shot.image.name, name)
+        self.assertTrue(self.exists(name))
+        self.assertEqual(self.blob(name).ref_count, 1)
+        self.assertEqual(list(self.second.chat_screenshots.all()), [ChatScreenshot.objects.get()])
+
+
+def png(color='red', size=(8, 8)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, color).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+class ScreenshotUploadViewTests(TestCase):
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+        self.addCleanup(cache.clear)
+        self.builder = CustomUser.objects.create_user('builder', 'builder@example.com', 'pw', role='community_builder')
+        self.other = CustomUser.objects.create_user('other', 'other@example.com', 'pw', role='community_builder')
+        self.connection = create_connection(self.builder)
+        self.url = reverse('upload_chat_screenshots', args=[self.connection.pk])
+
+    def post(self, *bodies, client=None):
+        files = [SimpleUploadedFile(f'chat{i}.png', body, 'image/png') for i, body in enumerate(bodies)]
+        return (client or self.client).post(self.url, {'screenshots': files})
+
+    def test_attaches_every_distinct_image(self):
+        self.client.force_login(self.builder)
+        response = self.post(png('red'), png('blue'), png('red'))
+        self.assertEqual(response.status_code, 200)
+        shots = response.json()['screenshots']
+        self.assertEqual(len({shot['id'] for shot in shots}), 2)
+        self.assertEqual(self.connection.chat_screenshots.count(), 2)
+        self.assertTrue(all(shot['thumbnail_url'] for shot in shots))
+
+        again = self.post(png('blue')).json()['screenshots']
+        self.assertTrue(again[0]['already_attached'])
+        self.assertEqual(self.connection.chat_screenshots.count(), 2)
+
+    def test_only_the_connections_builder_may_upload(self):
+        self.client.force_login(self.other)
+        self.assertEqual(self.post(png()).status_code, 404)
+        self.client.logout()
+        self.assertEqual(self.post(png()).status_code, 302)
+        self.assertFalse(ChatScreenshot.objects.exists())
+
+    def test_requires_a_csrf_token(self):
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.builder)
+        self.assertEqual(self.post(png(), client=client).status_code, 403)
+        self.assertFalse(ChatScreenshot.objects.exists())
+
+    def test_rejects_a_batch_with_a_non_image(self):
+        self.client.force_login(self.builder)
+        response = self.post(png(), b'not an image')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('error', response.json())
+        self.assertFalse(ChatScreenshot.objects.exists())
+
+    def test_rejects_too_many_files(self):
+        self.client.force_login(self.builder)
+        with mock.patch.object(ChatScreenshotUploadForm, 'MAX_FILES', 2):
+            response = self.post(png('red'), png('green'), png('blue'))
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(ChatScreenshot.objects.exists())
+
+    def test_empty_post_is_rejected(self):
+        self.client.force_login(self.builder)
+        self.assertEqual(self.client.post(self.url).status_code, 400)
+        self.assertEqual(self.client.get(self.url).status_code, 405)
+
+
+class RenditionTests(TestCase):
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+        self.addCleanup(cache.clear)
+        self.builder = CustomUser.objects.create_user('builder', 'builder@example.com', 'pw', role='community_builder')
+        self.other = CustomUser.objects.create_user('other', 'other@example.com', 'pw', role='community_builder')
+        self.editor = CustomUser.objects.create_user('editor', 'editor@example.com', 'pw', role='editor')
+        self.connection = create_connection(self.builder, assigned_editor=self.editor)
+        self.connection.profile_picture = SimpleUploadedFile('jane.png', png(size=(2000, 1000)))
+        self.connection.save()
+        self.client.force_login(self.builder)
+
+    def get(self, width=320, fmt='webp', kind='connection-photo', pk=None):
+        return self.client.get(reverse('image_rendition', args=[kind, pk or self.connection.pk, width, fmt]))
+
+    def stored_size(self, response):
+        name = response['Location'].removeprefix(settings.MEDIA_URL)
+        with default_storage.open(name) as file, Image.open(file) as image:
+            return image.format, image.size
+
+    def test_first_request_stores_the_rendition_and_redirects_to_it(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 302)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertEqual(self.stored_size(response), ('WEBP', (320, 160)))
+        self.assertEqual(self.get(640, 'jpg')['Location'].rsplit('/', 1)[-1], 'jane-640w.jpg')
+
+    def test_stored_renditions_are_linked_directly(self):
+        view_url = reverse('image_rendition', args=['connection-photo', self.connection.pk, 160, 'webp'])
+        self.assertEqual(renditions.rendition_urls(self.connection, 'profile_picture', 'webp')[160], view_url)
+        location = self.get(160)['Location']
+        urls = renditions.rendition_urls(self.connection, 'profile_picture', 'webp')
+        self.assertEqual(urls[160], location)
+        self.assertTrue(urls[320].startswith(reverse('image_rendition', args=['connection-photo', self.connection.pk, 320, 'webp'])))
+
+    def test_small_images_are_not_enlarged(self):
+        self.connection.profile_picture = SimpleUploadedFile('small.png', png(size=(100, 50)))
+        self.connection.save()
+        self.assertEqual(self.stored_size(self.get(1280, 'jpg')), ('JPEG', (100, 50)))
+
+    def test_transparency_is_kept_in_webp_only(self):
+        buffer = io.BytesIO()
+        Image.new('RGBA', (400, 400), (255, 0, 0, 0)).save(buffer, 'PNG')
+        self.assertEqual(Image.open(io.BytesIO(renditions.render(io.BytesIO(buffer.getvalue()), 160, 'webp'))).mode, 'RGBA')
+        self.assertEqual(Image.open(io.BytesIO(renditions.render(io.BytesIO(buffer.getvalue()), 160, 'jpg'))).mode, 'RGB')
+
+    def test_only_users_with_access_to_the_original_get_renditions(self):
+        self.client.force_login(self.other)
+        self.assertEqual(self.get().status_code, 404)
+        self.client.force_login(self.editor)
+        self.assertEqual(self.get().status_code, 302)
+        self.client.logout()
+        self.assertTrue(self.get()['Location'].startswith(reverse('login')))
+
+    def test_unknown_kinds_sizes_formats_and_empty_fields_get_404(self):
+        self.assertEqual(self.get(kind='connection-pdf').status_code, 404)
+        self.assertEqual(self.get(width=300).status_code, 404)
+        self.assertEqual(self.get(fmt='gif').status_code, 404)
+        self.assertEqual(self.get(pk=self.connection.pk + 1000).status_code, 404)
+        empty = create_connection(self.builder, 'John Roe')
+        self.assertEqual(self.get(pk=empty.pk).status_code, 404)
+
+
+# static/vendor/ isn't populated in tests; in DEBUG pages fall back to the CDN URLs
+@override_settings(DEBUG=True)
+class ConnectionListTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.builder = CustomUser.objects.create_user('builder', 'builder@example.com', 'pw', role='community_builder')
+        cls.other = CustomUser.objects.create_user('other', 'other@example.com', 'pw', role='community_builder')
+        cls.connection = create_connection(cls.builder)
+
+    def setUp(self):
+        self.addCleanup(caches['template_fragments'].clear)
+        self.client.force_login(self.builder)
+
+    def page(self):
+        response = self.client.get(reverse('connection_list'))
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    def test_lead_edits_reach_the_cached_row(self):
+        self.assertIn('https://linkedin.com/in/jane-doe', self.page())
+        lead = self.connection.outreach_lead
+        lead.linkedin_url = 'https://linkedin.com/in/jane-q-doe'
+        lead.save()
+        self.assertIn('https://linkedin.com/in/jane-q-doe', self.page())
+
+    def test_status_changes_reach_the_cached_row(self):
+        self.page()
+        self.client.post(reverse('update_connection_status', args=[self.connection.id]), {'status': 'F1'})
+        self.assertRegex(self.page(), r'<option value="F1"\s+selected')
+
+    def test_lists_only_the_builders_connections(self):
+        create_connection(self.other, 'John Roe')
+        page = self.page()
+        self.assertIn('Jane Doe', page)
+        self.assertNotIn('John Roe', page)
+
+
+class LinkedInCheckTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.builder = CustomUser.objects.create_user('builder', 'builder@example.com', 'pw', role='community_builder')
+        cls.other = CustomUser.objects.create_user('other', 'other@example.com', 'pw', role='community_builder')
+
+    def setUp(self):
+        self.addCleanup(cache.clear)
+        self.now = 1000.0
+        self.enterContext(mock.patch.object(linkedin_urls.time, 'monotonic', lambda: self.now))
+        self.known = self.enterContext(mock.patch.object(linkedin_urls, '_known', linkedin_urls._KnownUrls()))
+        self.client.force_login(self.builder)
+
+    def add_lead(self, url, builder=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            return OutreachLead.objects.create(linkedin_url=url, added_by=builder or self.builder)
+
+    def check(self, url):
+        response = self.client.get(reverse('check_linkedin_url'), {'linkedin_url': url})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_canonical_url_ignores_spelling(self):
+        for url in ('https://www.linkedin.com/in/Jane-Doe/', 'http://uk.linkedin.com/in/jane-doe?trk=x',
+                    'linkedin.com/in/jane-doe/details/experience', 'https://m.linkedin.com//in/jane-doe'):
+            self.assertEqual(linkedin_urls.canonical_url(url), 'linkedin.com/in/jane-doe')
+
+    def test_finds_a_lead_under_another_spelling(self):
+        self.add_lead('https://linkedin.com/in/jane-doe', builder=self.other)
+        result = self.check('www.linkedin.com/in/Jane-Doe/')
+        self.assertTrue(result['exists'])
+        self.assertEqual([(m['kind'], m['mine']) for m in result['matches']], [('lead', False)])
+
+    def test_a_miss_needs_no_query_once_the_set_is_built(self):
+        self.add_lead('https://linkedin.com/in/jane-doe')
+        linkedin_urls.find_matches('https://linkedin.com/in/someone')
+        with self.assertNumQueries(0):
+            self.assertEqual(linkedin_urls.find_matches('https://linkedin.com/in/someone-else'), [])
+
+    def test_version_is_polled_at_most_once_per_interval(self):
+        self.assertNotIn('linkedin.com/in/jane-doe', self.known)
+        with mock.patch.object(linkedin_urls.cache, 'get', wraps=linkedin_urls.cache.get) as get:
+            for _ in range(100):
+                self.now += 0.25
+                self.assertNotIn('linkedin.com/in/someone', self.known)
+        # 25 seconds of checks: one poll after MIN_REBUILD_INTERVAL and one after the next
+        self.assertEqual(get.call_count, 2)
+
+    def test_urls_added_by_other_processes_show_up_after_a_rebuild(self):
+        self.assertNotIn('linkedin.com/in/jane-doe', self.known)
+        # Another process's insert: the row and a version bump, but not this process's set
+        with mock.patch.object(linkedin_urls, '_known', linkedin_urls._KnownUrls()):
+            self.add_lead('https://linkedin.com/in/jane-doe')
+        self.assertNotIn('linkedin.com/in/jane-doe', self.known)
+        self.now += linkedin_urls.MIN_REBUILD_INTERVAL + 1
+        self.assertIn('linkedin.com/in/jane-doe', self.known)
+
+    def test_checks_are_rate_limited_per_user(self):
+        for _ in range(linkedin_urls.CHECKS_PER_WINDOW):
+            self.assertTrue(linkedin_urls.allow_check(self.builder))
+        self.assertFalse(linkedin_urls.allow_check(self.builder))
+        self.assertTrue(linkedin_urls.allow_check(self.other))
+
+    def test_anonymous_is_redirected(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('check_linkedin_url')).status_code, 302)
+
+
+class CommentServiceTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.builder = CustomUser.objects.create_user('builder', 'builder@example.com', 'pw', role='community_builder')
+        cls.other = CustomUser.objects.create_user('other', 'other@example.com', 'pw', role='community_builder')
+        cls.connection = create_connection(cls.builder)
+
+    def setUp(self):
+        self.addCleanup(cache.clear)
+        self.addCleanup(caches['template_fragments'].clear)
+
+    def post(self, text, parent=None, connection=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            return comments.post_comment(connection or self.connection, self.builder, text, parent and parent.pk)
+
+    def texts(self, threads):
+        return [(comment.comment, [reply.comment for reply in comment.thread_replies]) for comment in threads]
+
+    def test_threads_come_out_in_display_order(self):
+        first = self.post("first")
+        second = self.post("second")
+        reply = self.post("reply", first)
+        self.post("nested", reply)
+        self.post("late reply", first)
+        _, threads = comments.thread_page(self.connection, 1)
+        self.assertEqual(self.texts(threads), [("first", ["reply", "late reply"]), ("second", [])])
+        self.assertEqual(self.texts(threads[0].thread_replies[0].thread_replies), [("nested", [])])
+        first.refresh_from_db()
+        self.assertEqual((first.reply_count, second.reply_count), (3, 0))
+
+    def test_parent_from_another_connection_is_ignored(self):
+        elsewhere = self.post("elsewhere", connection=create_connection(self.builder, 'John Roe'))
+        self.assertIsNone(self.post("reply", elsewhere).parent_id)
+
+    def test_deep_replies_attach_to_the_deepest_allowed_ancestor(self):
+        comment = self.post("root")
+        for depth in range(ConnectionComment.MAX_DEPTH + 2):
+            comment = self.post(f"depth {depth}", comment)
+        self.assertEqual(comment.depth, ConnectionComment.MAX_DEPTH - 1)
+
+    def test_deleting_a_reply_updates_the_count(self):
+        root = self.post("root")
+        self.post("reply", root).delete()
+        root.refresh_from_db()
+        self.assertEqual(root.reply_count, 0)
+
+    def test_root_threads_are_paginated_newest_last(self):
+        for i in range(comments.THREADS_PER_PAGE + 1):
+            self.post(f"thread {i}")
+        page, threads = comments.thread_page(self.connection, 'last')
+        self.assertEqual((page.number, self.texts(threads)), (2, [(f"thread {comments.THREADS_PER_PAGE}", [])]))
+
+    def test_long_threads_are_collapsed(self):
+        root = self.post("root")
+        for i in range(comments.INLINE_REPLIES + 1):
+            self.post(f"reply {i}", root)
+        _, threads = comments.thread_page(self.connection, 1)
+        self.assertTrue(threads[0].collapsed)
+        self.assertEqual(threads[0].thread_replies, [])
+        self.assertIn("reply 5", comments.render_thread(root))
+
+    def test_rendered_threads_are_cached_until_a_new_comment(self):
+        self.post("first")
+        comments.render_threads(self.connection)
+        with self.assertNumQueries(0):
+            comments.render_threads(self.connection)
+        self.post("second")
+        self.assertIn("second", comments.render_threads(self.connection))
+
+    def test_author_edits_reach_cached_threads(self):
+        self.post("hello")
+        self.assertIn("builder", comments.render_threads(self.connection))
+        self.builder.first_name, self.builder.last_name = "Bea", "Builder"
+        self.builder.save()
+        self.assertIn("Bea Builder", comments.render_threads(self.connection))
+
+    def test_thread_view_checks_access(self):
+        root = self.post("root")
+        url = reverse('comment_thread', args=[self.connection.pk, root.pk])
+        self.client.force_login(self.builder)
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.client.force_login(self.other)
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_thread_view_rejects_a_root_of_another_connection(self):
+        elsewhere = self.post("elsewhere", connection=create_connection(self.builder, 'John Roe'))
+        self.client.force_login(self.builder)
+        response = self.client.get(reverse('comment_thread', args=[self.connection.pk, elsewhere.pk]))
+        self.assertEqual(response.status_code, 404)
+
+
+class CommentFeedTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.builder = CustomUser.objects.create_user('builder', 'builder@example.com', 'pw', role='community_builder')
+        cls.other = CustomUser.objects.create_user('other', 'other@example.com', 'pw', role='community_builder')
+        cls.connection = create_connection(cls.builder)
+
+    def setUp(self):
+        self.addCleanup(cache.clear)
+        self.addCleanup(caches['template_fragments'].clear)
+        self.enterContext(mock.patch.object(comment_views, 'FEED_POLL_INTERVAL', 0))
+
+    def post(self, text):
+        with self.captureOnCommitCallbacks(execute=True):
+            return comments.post_comment(self.connection, self.builder, text)
+
+    async def open_feed(self, user, **headers):
+        request = AsyncRequestFactory().get(f'/connections/{self.connection.pk}/comments/feed/', headers=headers)
+
+        async def auser():
+            return user
+
+        request.auser = auser
+        response = await comment_views.comment_feed(request, self.connection.pk)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        return response.streaming_content
+
+    async def next_comment(self, stream):
+        async for chunk in stream:
+            if chunk.startswith(b'id: '):
+                return chunk.decode()
+        self.fail("The feed ended without a comment")
+
+    async def test_other_builder_gets_404(self):
+        with self.assertRaises(Http404):
+            await self.open_feed(self.other)
+
+    def test_anonymous_is_redirected(self):
+        response = self.client.get(reverse('comment_feed', args=[self.connection.pk]))
+        self.assertEqual(response.status_code, 302)
+
+    async def test_resumes_after_the_last_event_id(self):
+        first = await sync_to_async(self.post)("first")
+        second = await sync_to_async(self.post)("second")
+        stream = await self.open_feed(self.builder, last_event_id=str(first.pk))
+        try:
+            self.assertEqual(await anext(stream), f"retry: {comment_views.FEED_RETRY_MS}\n\n".encode())
+            event = await self.next_comment(stream)
+        finally:
+            await stream.aclose()
+        self.assertTrue(event.startswith(f"id: {second.pk}\nevent: comment\n"))
+        self.assertIn("second", event)
+
+    async def test_pushes_comments_posted_while_open(self):
+        stream = await self.open_feed(self.builder)
+        try:
+            await anext(stream)  # retry:
+            waiting = asyncio.ensure_future(self.next_comment(stream))
+            # The feed has polled and found nothing; the comment's version bump wakes it
+            await asyncio.sleep(0.05)
+            comment = await sync_to_async(self.post)("live")
+            event = await asyncio.wait_for(waiting, timeout=5)
+        finally:
+            await stream.aclose()
+        self.assertTrue(event.startswith(f"id: {comment.pk}\n"))
+
+
+class BulkStatusUpdateTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.builder = CustomUser.objects.create_user('builder', 'builder@example.com', 'pw', role='community_builder')
+        cls.other = CustomUser.objects.create_user('other', 'other@example.com', 'pw', role='community_builder')
+
+    def setUp(self):
+        self.mine = [create_connection(self.builder, name) for name in ('Jane Doe', 'John Roe')]
+        self.theirs = create_connection(self.other, 'Max Moe')
+        self.client.force_login(self.builder)
+
+    def post(self, body, **kwargs):
+        data = body if isinstance(body, str) else json.dumps(body)
+        return self.client.post(reverse('bulk_update_connection_status'), data, content_type='application/json', **kwargs)
+
+    def test_updates_only_the_builders_connections(self):
+        ids = [conn.pk for conn in self.mine] + [self.theirs.pk]
+        response = self.post({'ids': ids, 'status': 'F1'})
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(sorted(body['changed']), sorted(conn.pk for conn in self.mine))
+        self.assertEqual(body['missing'], [self.theirs.pk])
+        self.assertEqual({row['status'] for row in body['statuses']}, {'F1'})
+        self.theirs.refresh_from_db()
+        self.assertEqual(self.theirs.status, 'connected')
+        self.assertEqual(ConnectionStatusEvent.objects.filter(to_status='F1', changed_by=self.builder).count(), 2)
+
+    def test_unchanged_connections_are_not_reported_as_changed(self):
+        set_status(Connection.objects.filter(pk=self.mine[0].pk), 'F1')
+        body = self.post({'ids': [conn.pk for conn in self.mine], 'status': 'F1'}).json()
+        self.assertEqual(body['changed'], [self.mine[1].pk])
+
+    def test_rejects_bad_requests(self):
+        self.assertEqual(self.post('not json').status_code, 400)
+        self.assertEqual(self.post({'ids': ['x'], 'status': 'F1'}).status_code, 400)
+        self.assertEqual(self.post({'ids': [self.mine[0].pk], 'status': 'bogus'}).status_code, 400)
+        self.assertEqual(self.post({'ids': [], 'status': 'F1'}).status_code, 400)
+        self.assertEqual(self.post({'ids': list(range(1, MAX_BULK + 2)), 'status': 'F1'}).status_code, 400)
+
+    def test_requires_post_login_and_csrf(self):
+        self.assertEqual(self.client.get(reverse('bulk_update_connection_status')).status_code, 405)
+        csrf_client = self.client_class(enforce_csrf_checks=True)
+        csrf_client.force_login(self.builder)
+        response = csrf_client.post(
+            reverse('bulk_update_connection_status'), json.dumps({'ids': [self.mine[0].pk], 'status': 'F1'}),
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 403)
+        self.client.logout()
+        self.assertEqual(self.post({'ids': [self.mine[0].pk], 'status': 'F1'}).status_code, 302)
+
+
+class StaleLeadSweepTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.builder = CustomUser.objects.create_user('builder', 'builder@example.com', 'pw', role='community_builder')
+
+    def age(self, model, pks, days, field):
+        model.objects.filter(pk__in=pks).update(**{field: timezone.now() - timedelta(days=days)})
+
+    def create_leads(self, count, days):
+        leads = [
+            OutreachLead.objects.create(linkedin_url=f'https://linkedin.com/in/lead-{days}-{i}', added_by=self.builder)
+            for i in range(count)
+        ]
+        self.age(OutreachLead, [lead.pk for lead in leads], days, 'date_added')
+        return leads
+
+    def test_only_old_unconverted_leads_go_cold(self):
+        old = self.create_leads(3, days=40)
+        self.create_leads(2, days=5)
+        converted = create_connection(self.builder).outreach_lead
+        self.age(OutreachLead, [converted.pk], 40, 'date_added')
+        self.assertEqual(sweep(batch_size=2), (3, 0, 0))
+        self.assertEqual(
+            set(OutreachLead.objects.filter(status='cold').values_list('pk', flat=True)), {lead.pk for lead in old},
+        )
+
+    def test_only_stalled_statuses_go_cold(self):
+        stalled = create_connection(self.builder, 'Jane Doe', status='F2')
+        interested = create_connection(self.builder, 'John Roe', status='interested')
+        self.age(Connection, [stalled.pk, interested.pk], 40, 'updated_at')
+        self.assertEqual(sweep(), (0, 1, 0))
+        self.assertEqual(
+            dict(Connection.objects.values_list('full_name', 'status')), {'Jane Doe': 'cold_lead', 'John Roe': 'interested'},
+        )
+        self.assertTrue(ColdLead.objects.filter(connection=stalled).exists())
+
+    def test_dry_run_changes_nothing(self):
+        self.create_leads(2, days=40)
+        stalled = create_connection(self.builder)
+        self.age(Connection, [stalled.pk], 40, 'updated_at')
+        self.assertEqual(sweep(dry_run=True), (2, 1, 0))
+        self.assertFalse(OutreachLead.objects.filter(status='cold').exists())
+        self.assertFalse(Connection.objects.filter(status='cold_lead').exists())
+
+    def test_repairs_missing_cold_rows(self):
+        connection = create_connection(self.builder)
+        Connection.objects.filter(pk=connection.pk).update(status='cold_lead')
+        self.assertEqual(sweep(), (0, 0, 1))
+        self.assertTrue(ColdLead.objects.filter(connection=connection).exists())
+
+    def test_command_takes_custom_ages(self):
+        self.create_leads(1, days=10)
+        out = io.StringIO()
+        call_command('sweep_stale_leads', '--lead-days=7', '--dry-run', stdout=out)
+        self.assertIn("Would move 1 outreach leads", out.getvalue())
@@ -7,9 +7,9 @@ from .views.editor import pending_biographies, editor_view_connection
 # ✅ Community Builder Views
 from .views.community_builder import (
     builder_dashboard, add_lead, check_linkedin_url, outreach_lead_list,
-    add_connection, connection_list, update_connection_status,
+    add_connection, connection_list, update_connection_status, bulk_update_connection_status,
     view_analytics, filter_connections_by_status,
-    edit_connection, upload_chat_screenshot, view_connection, add_comment as builder_add_comment,
+    edit_connection, upload_chat_screenshot, upload_chat_screenshots, view_connection, add_comment as builder_add_comment,
     upload_linkedin_connections, uploaded_connections_page,
     get_uploaded_connections, convert_uploaded_connection, delete_uploaded_connection,
 )
@@ -27,6 +27,12 @@ from .views.project_manager import (
     manager_add_comment,
 )
 
+# ✅ Media
+from .views.common import image_rendition
+
+# ✅ Comments
+from .views.comments import comment_feed, comment_thread
+
 # ✅ API Views
 from .views.api_views import (
     assign_editor_ajax,
@@ -54,14 +60,18 @@ urlpatterns = [
     path('add-connection/<int:lead_id>/', add_connection, name='add_connection'),
     path('connections/', connection_list, name='connection_list'),
     path('update-connection-status/<int:connection_id>/', update_connection_status, name='update_connection_status'),
+    path('update-connection-status/bulk/', bulk_update_connection_status, name='bulk_update_connection_status'),
     path('dashboard/builder/analytics/', view_analytics, name='view_analytics'),
     path('analytics/filter/<str:status>/', filter_connections_by_status, name='filter_connections_by_status'),
 
     # 🧑‍💼 View & Edit Connection
     path('connections/<int:connection_id>/edit/', edit_connection, name='edit_connection'),
     path('connections/<int:connection_id>/upload-screenshot/', upload_chat_screenshot, name='upload_chat_screenshot'),
+    path('connections/<int:connection_id>/upload-screenshots/', upload_chat_screenshots, name='upload_chat_screenshots'),
     path('connections/<int:connection_id>/view/', view_connection, name='view_connection'),
     path('connections/<int:connection_id>/add-comment/', builder_add_comment, name='add_comment'),
+    path('connections/<int:connection_id>/comments/<int:root_id>/', comment_thread, name='comment_thread'),
+    path('connections/<int:connection_id>/comments/feed/', comment_feed, name='comment_feed'),
 
     # 🆕 LinkedIn Upload & View Uploaded Data
     path('builder/upload-connections/', upload_linkedin_connections, name='upload_linkedin_connections'),
@@ -86,6 +96,9 @@ urlpatterns = [
     path('dashboard/editor/pending/', pending_biographies, name='pending_biographies'),
     path('editor/connection/<int:connection_id>/view/', editor_view_connection, name='editor_view_connection'),
 
+    # 🖼️ Image thumbnails (made on first request)
+    path('renditions/<str:kind>/<int:pk>/<int:width>.<str:fmt>', image_rendition, name='image_rendition'),
+
     # 🌐 API (AJAX)
     path('api/assign-editor/', assign_editor_ajax, name='assign-editor-ajax'),
     path('api/manager/filters/', get_filter_data, name='manager-filter-data'),
@@ -0,0 +1,57 @@
+#
+# File: user_cache.py
+# Purpose: Cache the authenticated user (with profile) and PM team lookups so that
+#          the fixed per-request overhead is served from the cache, not the database.
+#
+
+from django.core.cache import cache
+
+from .models import CustomUser, UserProfile
+
+USER_CACHE_TIMEOUT = 60 * 15
+TEAM_CACHE_TIMEOUT = 60 * 15
+
+
+def _user_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def _team_key(manager_id):
+    return f'team:{cache.get_or_set("team:version", 1, None)}:{manager_id}'
+
+
+# ✅ User + profile loader (used by the auth backend on every request)
+def get_cached_user(user_id):
+    key = _user_key(user_id)
+    user = cache.get(key)
+    if user is None:
+        user = CustomUser.objects.select_related('userprofile').filter(pk=user_id).first()
+        if user is None:
+            return None
+        cache.set(key, user, USER_CACHE_TIMEOUT)
+    return user
+
+
+def invalidate_user(user_id):
+    cache.delete(_user_key(user_id))
+
+
+# ✅ IDs of community builders managed by a project manager
+def get_team_builder_ids(manager):
+    key = _team_key(manager.pk)
+    builder_ids = cache.get(key)
+    if builder_ids is None:
+        builder_ids = list(UserProfile.objects.filter(
+            project_manager=manager,
+            user__role='community_builder'
+        ).values_list('user_id', flat=True))
+        cache.set(key, builder_ids, TEAM_CACHE_TIMEOUT)
+    return builder_ids
+
+
+def invalidate_teams():
+    # Team membership changes rarely; bumping the version drops every team entry at once.
+    try:
+        cache.incr('team:version')
+    except ValueError:
+        cache.set('team:version', 2, None)
@@ -0,0 +1,100 @@
+#
+# File: vendor_assets.py
+# Purpose: Pinned third-party front-end assets served from our own static files.
+#          `python manage.py vendor_static` downloads them into static/vendor/ (bin/post_compile
+#          runs it on deploy) and refuses any file whose digest isn't the pinned one;
+#          collectstatic then fingerprints and pre-compresses them.
+#
+
+import base64
+import hashlib
+from functools import lru_cache
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import ImproperlyConfigured
+
+# name -> (static path, pinned upstream URL, SRI digest of that file). A digest is recorded
+# from a reviewed download with `manage.py vendor_static --print-integrity`; until then
+# vendor_static refuses the asset.
+VENDOR_ASSETS = {
+    'bootstrap.css': (
+        'vendor/bootstrap/bootstrap.min.css',
+        'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css',
+        'sha384-9ndCyUaIbzAi2FUVXJi0CjmCapSmO7SnpJef0486qhLnuZ2cdeRhO02iuK6FUUVM',
+    ),
+    'bootstrap.js': (
+        'vendor/bootstrap/bootstrap.bundle.min.js',
+        'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/js/bootstrap.bundle.min.js',
+        'sha384-geWF76RCwLtnZ8qwWowPQNguL3RmwHVBC9FhGdlKrxdiJJigb/j/68SIy3Te4Bkz',
+    ),
+    'bootstrap-icons.css': (
+        'vendor/bootstrap-icons/bootstrap-icons.css',
+        'https://cdn.jsdelivr.net/npm/bootstrap-icons@1.10.5/font/bootstrap-icons.css',
+        None,
+    ),
+    'bootstrap-icons.woff2': (
+        'vendor/bootstrap-icons/fonts/bootstrap-icons.woff2',
+        'https://cdn.jsdelivr.net/npm/bootstrap-icons@1.10.5/font/fonts/bootstrap-icons.woff2',
+        None,
+    ),
+    'bootstrap-icons.woff': (
+        'vendor/bootstrap-icons/fonts/bootstrap-icons.woff',
+        'https://cdn.jsdelivr.net/npm/bootstrap-icons@1.10.5/font/fonts/bootstrap-icons.woff',
+        None,
+    ),
+    'sweetalert2.css': (
+        'vendor/sweetalert2/sweetalert2.min.css',
+        'https://cdn.jsdelivr.net/npm/sweetalert2@11.10.5/dist/sweetalert2.min.css',
+        None,
+    ),
+    'sweetalert2.js': (
+        'vendor/sweetalert2/sweetalert2.all.min.js',
+        'https://cdn.jsdelivr.net/npm/sweetalert2@11.10.5/dist/sweetalert2.all.min.js',
+        None,
+    ),
+    'chart.js': (
+        'vendor/chart.js/chart.umd.min.js',
+        'https://cdn.jsdelivr.net/npm/chart.js@4.4.1/dist/chart.umd.min.js',
+        None,
+    ),
+    # Shipped with django.contrib.admin, so it never needs downloading
+    'jquery.js': (
+        'admin/js/vendor/jquery/jquery.min.js',
+        'https://code.jquery.com/jquery-3.7.1.min.js',
+        None,
+    ),
+}
+
+
+@lru_cache(maxsize=None)
+def _is_available(path):
+    if settings.DEBUG:
+        return finders.find(path) is not None
+    return staticfiles_storage.exists(path)
+
+
+def missing_assets():
+    """Names of vendored assets whose files aren't in the static directories."""
+    return [name for name, (path, _, _) in VENDOR_ASSETS.items() if finders.find(path) is None]
+
+
+def integrity(body):
+    """Subresource Integrity digest of ``body``, the form VENDOR_ASSETS pins."""
+    return 'sha384-' + base64.b64encode(hashlib.sha384(body).digest()).decode()
+
+
+def vendor_url(name):
+    """
+    Local (hashed) URL of a vendored asset. Only in DEBUG does a missing one fall back to
+    its pinned CDN URL; in production it is an error (see lead_management.E002).
+    """
+    path, upstream_url, _ = VENDOR_ASSETS[name]
+    if _is_available(path):
+        return staticfiles_storage.url(path)
+    if settings.DEBUG:
+        return upstream_url
+    raise ImproperlyConfigured(
+        f"Vendored asset {name!r} ({path}) is missing; run `manage.py vendor_static` and collectstatic."
+    )
@@ -9,7 +9,7 @@ from .project_manager   import (
 from .community_builder import (
     builder_dashboard, add_lead, check_linkedin_url,
     outreach_lead_list, add_connection, connection_list,
-    update_connection_status, view_analytics,
+    update_connection_status, bulk_update_connection_status, view_analytics,
     filter_connections_by_status, edit_connection,
-    upload_chat_screenshot, view_connection, add_comment
+    upload_chat_screenshot, upload_chat_screenshots, view_connection, add_comment
 )
@@ -3,12 +3,15 @@
 import json
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.gzip import gzip_page
 from django.contrib.auth import get_user_model
 from django.shortcuts import get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
 
+from config.db_router import use_replica
 from ..models import Connection, CustomUser, UserProfile
+from ..user_cache import get_team_builder_ids
 
 User = get_user_model()
 
@@ -39,6 +42,7 @@ def assign_editor_ajax(request):
 
 # ✅ Load available community builders and status options
 @login_required
+@use_replica()
 def get_filter_data(request):
     if request.user.role != 'project_manager':
         return JsonResponse({'error': 'Unauthorized'}, status=403)
@@ -63,6 +67,8 @@ def get_filter_data(request):
 
 # ✅ Filter connections (table-based pagination)
 @login_required
+@use_replica()
+@gzip_page
 def get_filtered_connections(request):
     if request.user.role != 'project_manager':
         return JsonResponse({'error': 'Unauthorized'}, status=403)
@@ -71,10 +77,7 @@ def get_filtered_connections(request):
     status_value = request.GET.get('status')
     page_number = request.GET.get('page', 1)
 
-    builder_user_ids = UserProfile.objects.filter(
-        project_manager=request.user,
-        user__role='community_builder'
-    ).values_list('user__id', flat=True)
+    builder_user_ids = get_team_builder_ids(request.user)
 
     connections = Connection.objects.filter(added_by__id__in=builder_user_ids)
 
@@ -0,0 +1,73 @@
+import asyncio
+import json
+import time
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.decorators import login_required
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+
+from ..comments import aversion, render_comment, render_thread
+from ..media_access import connection_access_q
+from ..models import Connection, ConnectionComment
+
+FEED_POLL_INTERVAL = 1  # seconds between checks of the connection's comment version
+FEED_HEARTBEAT = 15
+FEED_LIFETIME = 60 * 5  # the browser reconnects, resuming from the last event id
+FEED_BATCH = 50
+FEED_RETRY_MS = 3000  # reconnect delay the browser is told to use
+
+
+# 💬 A whole collapsed thread, loaded when its "Show replies" button is clicked
+@login_required
+def comment_thread(request, connection_id, root_id):
+    connection = get_object_or_404(Connection.objects.filter(connection_access_q(request.user)), pk=connection_id)
+    root = get_object_or_404(ConnectionComment, pk=root_id, connection=connection, parent=None)
+    return HttpResponse(render_thread(root))
+
+
+def _after(request):
+    after = request.headers.get('Last-Event-ID') or request.GET.get('after', '')
+    return int(after) if after.isdigit() else 0
+
+
+# 📡 Comments newer than the client's last one, pushed as Server-Sent Events
+@login_required
+async def comment_feed(request, connection_id):
+    user = await request.auser()
+    access = await sync_to_async(connection_access_q)(user)
+    if not await Connection.objects.filter(access, pk=connection_id).aexists():
+        raise Http404("Connection not found.")
+    after = _after(request)
+
+    async def events():
+        nonlocal after
+        yield f"retry: {FEED_RETRY_MS}\n\n"
+        started = last_sent = time.monotonic()
+        seen = None
+        while time.monotonic() - started < FEED_LIFETIME:
+            # The version is bumped on every new comment, so the table is only queried then
+            version = await aversion(connection_id)
+            if version != seen:
+                seen = version
+                new = ConnectionComment.objects.filter(
+                    connection_id=connection_id, id__gt=after
+                ).select_related('author').order_by('id')[:FEED_BATCH]
+                sent = 0
+                async for comment in new:
+                    html = await sync_to_async(render_comment)(comment)
+                    after, sent, last_sent = comment.pk, sent + 1, time.monotonic()
+                    payload = {'id': comment.pk, 'parent_id': comment.parent_id, 'html': html}
+                    yield f"id: {comment.pk}\nevent: comment\ndata: {json.dumps(payload)}\n\n"
+                if sent == FEED_BATCH:
+                    seen = None  # a full batch: there may be more waiting
+                    continue
+            if time.monotonic() - last_sent >= FEED_HEARTBEAT:
+                last_sent = time.monotonic()
+                yield ": keep-alive\n\n"
+            await asyncio.sleep(FEED_POLL_INTERVAL)
+
+    response = StreamingHttpResponse(events(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # don't let nginx buffer the stream
+    return response
@@ -1,5 +1,11 @@
-from django.shortcuts import redirect
+from django.shortcuts import get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
+from django.core.files.storage import default_storage
+from django.http import Http404
+from django.utils.cache import patch_cache_control
+
+from ..media_access import can_access
+from ..renditions import FORMATS, SOURCES, WIDTHS, ensure_rendition
 
 @login_required
 def dashboard_redirect(request):
@@ -10,3 +16,16 @@ def dashboard_redirect(request):
         'editor': 'editor_dashboard'
     }
     return redirect(role_map.get(request.user.role, 'login'))
+
+# 🖼️ First request for a thumbnail: make it, then send the browser to the stored file
+@login_required
+def image_rendition(request, kind, pk, width, fmt):
+    if kind not in SOURCES or width not in WIDTHS or fmt not in FORMATS:
+        raise Http404
+    model, field_name = SOURCES[kind]
+    fieldfile = getattr(get_object_or_404(model, pk=pk), field_name)
+    if not fieldfile or not can_access(request.user, fieldfile.name):
+        raise Http404
+    response = redirect(default_storage.url(ensure_rendition(fieldfile, width, fmt)))
+    patch_cache_control(response, private=True, max_age=60 * 60)
+    return response
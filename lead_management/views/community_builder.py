@@ -2,37 +2,31 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.http import JsonResponse
-from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
+from django.views.decorators.gzip import gzip_page
 from django.utils import timezone
 from django.core.paginator import Paginator
-from django.db.models import Count
+from django.utils.datastructures import MultiValueDict
+from django.db.models import Count, Q
 from datetime import timedelta
 import csv
 import io
+import json
 
+from config.db_router import use_replica
 
-from ..forms import OutreachLeadForm, AddConnectionForm, ConnectionEditForm
+
+from ..forms import OutreachLeadForm, AddConnectionForm, ConnectionEditForm, ChatScreenshotUploadForm
 from ..models import (
-    OutreachLead, Connection, ChatScreenshot, ConnectionComment,
-    ColdLead, LinkedInConnection
+    OutreachLead, Connection, ChatScreenshot,
+    LinkedInConnection
 )
-
-# -------------------- Utility --------------------
-
-def build_comment_tree(comments):
-    comment_lookup = {c.id: c for c in comments}
-    for comment in comments:
-        comment.thread_replies = []
-    root_comments = []
-    for comment in comments:
-        if comment.parent_id:
-            parent = comment_lookup.get(comment.parent_id)
-            if parent:
-                parent.thread_replies.append(comment)
-        else:
-            root_comments.append(comment)
-    return root_comments
+from ..comments import post_comment, render_threads
+from ..connection_status import MAX_BULK, VALID_STATUSES, set_status
+from ..linkedin_urls import allow_check, canonical_url, find_matches
+from ..renditions import rendition_urls
+from ..screenshots import attach_screenshots
+from ..status_analytics import pipeline_summary
 
 # -------------------- Dashboard --------------------
 
@@ -60,7 +54,8 @@ def add_lead(request):
     form = OutreachLeadForm(request.POST or None)
     if request.method == 'POST' and form.is_valid():
         url = form.cleaned_data['linkedin_url']
-        if OutreachLead.objects.filter(linkedin_url=url).exists():
+        # Straight to the index: the in-process set may not have another worker's newest lead yet
+        if OutreachLead.objects.filter(Q(linkedin_key=canonical_url(url)) | Q(linkedin_url=url)).exists():
             messages.error(request, "This LinkedIn profile already exists.")
         else:
             lead = form.save(commit=False)
@@ -72,10 +67,14 @@ def add_lead(request):
 
 @login_required
 def check_linkedin_url(request):
-    exists = OutreachLead.objects.filter(linkedin_url=request.GET.get('linkedin_url')).exists()
-    return JsonResponse({'exists': exists})
+    if not allow_check(request.user):
+        return JsonResponse({'error': 'Too many checks, please slow down.'}, status=429)
+    url = request.GET.get('linkedin_url', '')
+    matches = find_matches(url, request.user)
+    return JsonResponse({'exists': bool(matches), 'canonical_url': canonical_url(url), 'matches': matches})
 
 @login_required
+@gzip_page
 def outreach_lead_list(request):
     leads = OutreachLead.objects.filter(added_by=request.user).order_by('-date_added')
     return render(request, 'lead_management/community_builder/outreach_lead_list.html', {'leads': leads})
@@ -105,8 +104,9 @@ def add_connection(request, lead_id):
     })
 
 @login_required
+@gzip_page
 def connection_list(request):
-    conns = Connection.objects.filter(added_by=request.user).order_by('-date_connected')
+    conns = Connection.objects.filter(added_by=request.user).select_related('outreach_lead').order_by('-date_connected')
     return render(request, 'lead_management/community_builder/connection_list.html', {
         'connections': conns, 'status_choices': Connection.STATUS_CHOICES,
     })
@@ -116,19 +116,46 @@ def update_connection_status(request, connection_id):
     conn = get_object_or_404(Connection, id=connection_id, added_by=request.user)
     if request.method == 'POST':
         new = request.POST.get('status')
-        if new != conn.status:
-            conn.status = new
-            conn.save()
-            if new == 'cold_lead':
-                ColdLead.objects.get_or_create(connection=conn)
+        if new not in VALID_STATUSES:
+            messages.error(request, "Unknown status.")
+        elif set_status(Connection.objects.filter(pk=conn.pk), new, changed_by=request.user):
             messages.success(request, f"Status updated to '{new}'.")
         else:
             messages.info(request, "Status unchanged.")
     return redirect('connection_list')
 
+@login_required
+@require_POST
+def bulk_update_connection_status(request):
+    """JSON ``{"ids": [...], "status": "..."}``: one status for many of the builder's connections."""
+    try:
+        data = json.loads(request.body)
+        ids = [int(pk) for pk in data.get('ids', [])]
+        status = data.get('status')
+    except (ValueError, TypeError, AttributeError):
+        return JsonResponse({'success': False, 'error': 'Invalid request body.'}, status=400)
+    if status not in VALID_STATUSES:
+        return JsonResponse({'success': False, 'error': 'Unknown status.'}, status=400)
+    if not ids or len(ids) > MAX_BULK:
+        return JsonResponse({'success': False, 'error': f'Select between 1 and {MAX_BULK} connections.'}, status=400)
+
+    connections = Connection.objects.filter(pk__in=ids, added_by=request.user)
+    changed = set_status(connections, status, changed_by=request.user)
+    states = {
+        conn['id']: conn['status']
+        for conn in Connection.objects.filter(pk__in=ids, added_by=request.user).values('id', 'status')
+    }
+    return JsonResponse({
+        'success': True,
+        'changed': changed,
+        'statuses': [{'id': pk, 'status': state} for pk, state in states.items()],
+        'missing': [pk for pk in ids if pk not in states],
+    })
+
 # -------------------- Analytics --------------------
 
 @login_required
+@use_replica()
 def view_analytics(request):
     conns = Connection.objects.filter(added_by=request.user)
     chart_data = {
@@ -139,9 +166,11 @@ def view_analytics(request):
         'chart_data': chart_data,
         'total_leads': OutreachLead.objects.filter(added_by=request.user).count(),
         'total_connections': conns.count(),
+        'pipeline': pipeline_summary([request.user.pk]),
     })
 
 @login_required
+@use_replica()
 def filter_connections_by_status(request, status):
     data = Connection.objects.filter(added_by=request.user, status=status).values(
         'full_name', 'linkedin_email', 'outreach_email', 'status', 'date_connected')
@@ -161,24 +190,43 @@ def edit_connection(request, connection_id):
         'form': form, 'connection': conn, 'screenshots': conn.chat_screenshots.all(),
     })
 
+def _upload_screenshots(conn, files):
+    """JSON for each distinct uploaded image, or a 400 response."""
+    form = ChatScreenshotUploadForm(files=MultiValueDict({'screenshots': files}))
+    if not form.is_valid():
+        return None, JsonResponse({'error': form.errors['screenshots'][0]}, status=400)
+    shots, new_link_ids = attach_screenshots(conn, form.cleaned_data['screenshots'])
+    return [{
+        'id': shot.id, 'url': shot.image.url,
+        'thumbnail_url': rendition_urls(shot, 'image', 'webp')[320],
+        'already_attached': shot.id not in new_link_ids,
+    } for shot in shots], None
+
 @login_required
-@csrf_exempt
+@require_POST
 def upload_chat_screenshot(request, connection_id):
-    if request.method == 'POST' and request.FILES.get('screenshot'):
-        conn = get_object_or_404(Connection, id=connection_id, added_by=request.user)
-        shot = ChatScreenshot.objects.create(image=request.FILES['screenshot'])
-        conn.chat_screenshots.add(shot)
-        return JsonResponse({'url': shot.image.url})
-    return JsonResponse({'error': 'Invalid request'}, status=400)
+    conn = get_object_or_404(Connection, id=connection_id, added_by=request.user)
+    if not request.FILES.get('screenshot'):
+        return JsonResponse({'error': 'Invalid request'}, status=400)
+    shots, error = _upload_screenshots(conn, request.FILES.getlist('screenshot')[:1])
+    return error or JsonResponse(shots[0])
+
+# ✅ Many screenshots in one POST (field name "screenshots")
+@login_required
+@require_POST
+def upload_chat_screenshots(request, connection_id):
+    conn = get_object_or_404(Connection, id=connection_id, added_by=request.user)
+    if not request.FILES.getlist('screenshots'):
+        return JsonResponse({'error': 'Invalid request'}, status=400)
+    shots, error = _upload_screenshots(conn, request.FILES.getlist('screenshots'))
+    return error or JsonResponse({'screenshots': shots})
 
 @login_required
 def view_connection(request, connection_id):
     conn = get_object_or_404(Connection, id=connection_id, added_by=request.user)
-    comments = ConnectionComment.objects.filter(
-        connection=conn).select_related('author', 'parent').order_by('timestamp')
     return render(request, 'lead_management/community_builder/view_connection.html', {
         'connection': conn, 'screenshots': conn.chat_screenshots.all(),
-        'comments': build_comment_tree(comments),
+        'comments_html': render_threads(conn, request.GET.get('comments_page')),
     })
 
 @login_required
@@ -188,14 +236,11 @@ def add_comment(request, connection_id):
     parent_id = request.POST.get('parent_id')
     connection = get_object_or_404(Connection, id=connection_id)
     if comment_text:
-        parent_comment = ConnectionComment.objects.filter(id=parent_id).first() if parent_id else None
-        comment = ConnectionComment.objects.create(
-            connection=connection, author=request.user, comment=comment_text, parent=parent_comment
-        )
+        comment = post_comment(connection, request.user, comment_text, parent_id)
         return JsonResponse({
             'success': True, 'id': comment.id, 'author': comment.author.username,
             'timestamp': comment.timestamp.strftime('%b %d, %Y %I:%M %p'),
-            'comment': comment.comment, 'parent_id': parent_id
+            'comment': comment.comment, 'parent_id': comment.parent_id
         })
     return JsonResponse({'success': False}, status=400)
 
@@ -228,7 +273,7 @@ def upload_linkedin_connections(request):
             if not linkedin_url:
                 continue
 
-            if LinkedInConnection.objects.filter(linkedin_url=linkedin_url, community_builder=request.user).exists():
+            if LinkedInConnection.objects.filter(linkedin_key=canonical_url(linkedin_url), community_builder=request.user).exists():
                 count_skipped += 1
                 continue
 
@@ -266,6 +311,8 @@ def uploaded_connections_page(request):
     return render(request, 'lead_management/community_builder/uploaded_connection.html')
 
 @login_required
+@use_replica()
+@gzip_page
 def get_uploaded_connections(request):
     page = request.GET.get('page', 1)
     per_page = 50
@@ -1,12 +1,13 @@
 # 
 # File: editor.py
-# Purpose: All views specific to the Editor role — dashboard, pending bios, and recursive threaded comments.
+# Purpose: All views specific to the Editor role — dashboard, pending bios, and threaded comments.
 #
 
 from django.shortcuts import render, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse
-from lead_management.models import Connection, ChatScreenshot, ConnectionComment
+from lead_management.comments import render_threads
+from lead_management.models import Connection, ChatScreenshot
 from executive_biographer.models import BiographyDraft
 from django.urls import reverse
 
@@ -50,24 +51,6 @@ def pending_biographies(request):
     })
 
 
-# ✅ Utility: recursive comment tree builder
-def build_comment_tree(comments):
-    comment_lookup = {c.id: c for c in comments}
-    for comment in comments:
-        comment.thread_replies = []
-    root_comments = []
-
-    for comment in comments:
-        if comment.parent_id:
-            parent = comment_lookup.get(comment.parent_id)
-            if parent:
-                parent.thread_replies.append(comment)
-        else:
-            root_comments.append(comment)
-
-    return root_comments
-
-
 # ✅ Detailed View of Assigned Connection with Comments + Screenshots
 @login_required
 def editor_view_connection(request, connection_id):
@@ -76,17 +59,11 @@ def editor_view_connection(request, connection_id):
 
     connection = get_object_or_404(Connection, pk=connection_id, assigned_editor=request.user)
     screenshots = ChatScreenshot.objects.filter(connections=connection)
-
-    comments = ConnectionComment.objects.filter(
-        connection=connection
-    ).select_related('author', 'parent').order_by('timestamp')
-
-    comment_tree = build_comment_tree(comments)
     comment_post_url = reverse('add_comment', args=[connection.id])
 
     return render(request, 'lead_management/editor/view_connection.html', {
         'connection': connection,
         'screenshots': screenshots,
-        'comments': comment_tree,
+        'comments_html': render_threads(connection, request.GET.get('comments_page')),
         'comment_post_url': comment_post_url
     })
@@ -0,0 +1,147 @@
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from ..media_access import can_access
+
+_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+_CONTENT_ADDRESSED = re.compile(r'(^|/)[0-9a-f]{64}(-\d+w)?\.\w+$')  # blobs and their renditions
+CHUNK_SIZE = 64 * 1024
+
+
+class _RangeFile:
+    """Read at most ``length`` bytes of ``file`` from ``start`` (FileResponse streams it)."""
+
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file, self.remaining = file, length
+
+    def read(self, size=-1):
+        size = self.remaining if size < 0 else min(size, self.remaining)
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+async def _aread_chunks(path, start, length):
+    """
+    Async iterator over ``length`` bytes of ``path`` from ``start``. Under ASGI, Django
+    buffers a synchronous streaming body whole before sending it; this one is sent a
+    chunk at a time, with the reads done off the event loop.
+    """
+    read = sync_to_async(lambda file, size: file.read(size), thread_sensitive=False)
+    file = await sync_to_async(open, thread_sensitive=False)(path, 'rb')
+    try:
+        file.seek(start)
+        while length > 0:
+            chunk = await read(file, min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        file.close()
+
+
+def _file_response(request, path, start, length, content_type, status=200):
+    # WSGI servers can send a FileResponse with sendfile; ASGI ones need an async body
+    if isinstance(request, ASGIRequest):
+        response = StreamingHttpResponse(_aread_chunks(path, start, length), status=status, content_type=content_type)
+    elif status == 206:
+        response = FileResponse(_RangeFile(open(path, 'rb'), start, length), status=status, content_type=content_type)
+    else:
+        response = FileResponse(open(path, 'rb'), content_type=content_type)
+    response['Content-Length'] = length
+    return response
+
+
+def _byte_range(header, size):
+    """``(start, end)`` of a single-range header, None to send everything, False if unsatisfiable."""
+    match = _RANGE.match(header.replace(' ', ''))
+    if not match or not any(match.groups()):
+        return None  # malformed or multi-range: ignore it and send the whole file
+    first, last = match.groups()
+    if not first:
+        start, end = max(0, size - int(last)), size - 1
+    else:
+        start, end = int(first), min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def _cache_headers(response, name):
+    if _CONTENT_ADDRESSED.search(name):
+        # A content-addressed name always means the same bytes
+        patch_cache_control(response, private=True, max_age=60 * 60 * 24 * 365, immutable=True)
+    else:
+        patch_cache_control(response, private=True, no_cache=True)
+
+
+def _python_response(request, path):
+    """Serve the file from this worker, honouring conditional GETs and a single byte range."""
+    stat = os.stat(path)
+    etag = f'"{stat.st_size:x}-{int(stat.st_mtime):x}"'
+    last_modified = http_date(stat.st_mtime)
+    response = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if response is not None:
+        return response
+
+    content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    byte_range = _byte_range(request.headers.get('Range', ''), stat.st_size)
+    # A stale If-Range means the client's partial copy is outdated: send it all
+    if byte_range and request.headers.get('If-Range', etag) not in (etag, last_modified):
+        byte_range = None
+
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{stat.st_size}'
+        return response
+    if byte_range:
+        start, end = byte_range
+        response = _file_response(request, path, start, end - start + 1, content_type, status=206)
+        response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+    else:
+        response = _file_response(request, path, 0, stat.st_size, content_type)
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = last_modified
+    return response
+
+
+# 🔒 Every /media/ URL: check the user may see the file, then let the web server send it
+@login_required
+def serve_media(request, path):
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    if not os.path.isfile(full_path) or not can_access(request.user, path):
+        # Files the user may not see look the same as missing ones
+        raise Http404
+
+    backend = settings.MEDIA_SENDFILE_BACKEND
+    if backend == 'x-accel-redirect':
+        response = HttpResponse(content_type=mimetypes.guess_type(full_path)[0] or 'application/octet-stream')
+        response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_REDIRECT_PREFIX + quote(path)
+    elif backend == 'x-sendfile':
+        response = HttpResponse(content_type=mimetypes.guess_type(full_path)[0] or 'application/octet-stream')
+        response['X-Sendfile'] = full_path
+    else:
+        response = _python_response(request, full_path)
+    _cache_headers(response, path)
+    return response
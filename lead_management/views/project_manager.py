@@ -1,6 +1,6 @@
 # 
 # File: project_manager.py
-# Purpose: Views for the Project Manager role — dashboard, connections, and threaded comments (with recursive replies)
+# Purpose: Views for the Project Manager role — dashboard, connections, and threaded comments
 #
 
 from django.shortcuts import render, get_object_or_404, redirect
@@ -11,10 +11,13 @@ from django.contrib.auth import get_user_model
 from django.urls import reverse
 from django.http import JsonResponse
 from django.views.decorators.http import require_POST
+from django.views.decorators.gzip import gzip_page
 from django.utils import timezone
 from datetime import timedelta
 
-from ..models import Connection, CustomUser, UserProfile, ConnectionComment, OutreachLead
+from ..comments import post_comment, render_threads
+from ..models import Connection, CustomUser, UserProfile, OutreachLead
+from ..user_cache import get_team_builder_ids
 
 
 # ✅ Utility: check if the user is a project manager
@@ -65,13 +68,7 @@ def view_team(request):
 @login_required
 @user_passes_test(is_project_manager)
 def view_builder_dashboard(request, builder_id):
-    assigned = UserProfile.objects.filter(
-        user_id=builder_id,
-        project_manager=request.user,
-        user__role='community_builder'
-    ).exists()
-
-    if not assigned:
+    if builder_id not in get_team_builder_ids(request.user):
         return render(request, '403.html')
 
     today = timezone.now()
@@ -106,14 +103,12 @@ def view_builder_dashboard(request, builder_id):
 
 # ✅ View all connections from team (with pagination)
 @login_required
+@gzip_page
 def view_team_connections(request):
     if not is_project_manager(request.user):
         return render(request, '403.html')
 
-    builder_user_ids = UserProfile.objects.filter(
-        project_manager=request.user,
-        user__role='community_builder'
-    ).values_list('user__id', flat=True)
+    builder_user_ids = get_team_builder_ids(request.user)
 
     connections = Connection.objects.filter(
         added_by_id__in=builder_user_ids
@@ -132,43 +127,18 @@ def view_team_connections(request):
     })
 
 
-# ✅ Utility function to build recursive comment tree
-def build_comment_tree(comments):
-    comment_lookup = {c.id: c for c in comments}
-    for comment in comments:
-        comment.thread_replies = []
-    root_comments = []
-
-    for comment in comments:
-        if comment.parent_id:
-            parent = comment_lookup.get(comment.parent_id)
-            if parent:
-                parent.thread_replies.append(comment)
-        else:
-            root_comments.append(comment)
-
-    return root_comments
-
-
 # ✅ View a single connection record with comments and screenshots
 @login_required
 @user_passes_test(is_project_manager)
 def manager_view_connection(request, connection_id):
     connection = get_object_or_404(Connection, pk=connection_id)
-
-    comments = ConnectionComment.objects.filter(
-        connection=connection
-    ).select_related('author', 'parent').order_by('timestamp')
-
-    comment_tree = build_comment_tree(comments)
-
     screenshots = connection.chat_screenshots.all()
     editors = get_user_model().objects.filter(role='editor')
     comment_post_url = reverse('manager_add_comment', args=[connection.id])
 
     return render(request, 'lead_management/project_managers/view_connection.html', {
         'connection': connection,
-        'comments': comment_tree,
+        'comments_html': render_threads(connection, request.GET.get('comments_page')),
         'screenshots': screenshots,
         'available_editors': editors,
         'comment_post_url': comment_post_url,
@@ -204,12 +174,6 @@ def manager_add_comment(request, connection_id):
     connection = get_object_or_404(Connection, id=connection_id)
 
     if comment_text:
-        parent_comment = ConnectionComment.objects.filter(id=parent_id).first() if parent_id else None
-        comment = ConnectionComment.objects.create(
-            connection=connection,
-            author=request.user,
-            comment=comment_text,
-            parent=parent_comment
-        )
+        post_comment(connection, request.user, comment_text, parent_id)
         return JsonResponse({'success': True})
     return JsonResponse({'success': False, 'error': 'Empty comment'}, status=400)